@@ -0,0 +1,40 @@
+"""Callback throughput: ingestion by the PUT endpoint, then micro-batch application by the inbox consumer."""
+import pytest
+from django.utils import timezone
+
+from apps.bulk.inbox import process_inbox
+from apps.bulk.models import CallbackInbox
+from conftest import record_throughput, rounds_for
+
+FULFILMENT = {'currentState': 'COMPLETED', 'fulfilment': 'bench-fulfilment'}
+
+
+@pytest.mark.benchmark(group='callback_ingest')
+def bench_callback_ingest(benchmark, rows, make_bulk, api_client):
+    def setup():
+        bulk = make_bulk(rows, dispatched_at=timezone.now())
+        return (list(bulk.individuals.values_list('transfer_id', flat=True)),), {}
+
+    def receive(transfer_ids):
+        for transfer_id in transfer_ids:
+            response = api_client.put(f"/api/transfers/{transfer_id}", FULFILMENT, content_type='application/json')
+        return response
+
+    response = benchmark.pedantic(receive, setup=setup, rounds=rounds_for(rows), iterations=1)
+    assert response.status_code == 202, response.content
+    record_throughput(benchmark, rows)
+
+
+@pytest.mark.benchmark(group='callback_apply')
+def bench_callback_apply(benchmark, rows, make_bulk):
+    def setup():
+        bulk = make_bulk(rows, dispatched_at=timezone.now())
+        CallbackInbox.objects.bulk_create([
+            CallbackInbox(transfer_id=transfer_id, payload=FULFILMENT)
+            for transfer_id in bulk.individuals.values_list('transfer_id', flat=True)
+        ], batch_size=1000)
+        return (), {}
+
+    processed = benchmark.pedantic(process_inbox, setup=setup, rounds=rounds_for(rows), iterations=1)
+    assert processed == rows
+    record_throughput(benchmark, rows)
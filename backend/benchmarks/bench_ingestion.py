@@ -0,0 +1,32 @@
+"""CSV parsing and the upload endpoint, end to end (parse, validate, insert, reserve, outbox)."""
+import io
+
+import pytest
+
+from apps.bulk.models import BulkTransfer
+from apps.bulk.views import parse_csv_file
+from conftest import record_throughput, rounds_for
+
+
+@pytest.mark.benchmark(group='parse_csv_file')
+def bench_parse_csv_file(benchmark, rows, make_payroll):
+    data = make_payroll(rows)
+    parsed = benchmark(parse_csv_file, data)
+    assert len(parsed) == rows
+    record_throughput(benchmark, rows)
+
+
+@pytest.mark.benchmark(group='create_bulk_transfers')
+def bench_create_bulk_transfers(benchmark, rows, make_payroll, api_client, payer):
+    def setup():
+        upload = io.BytesIO(make_payroll(rows))
+        upload.name = 'payroll.csv'
+        return (upload,), {}
+
+    def create(upload):
+        return api_client.post('/api/bulk-transfers', {'file': upload, 'payer_account': payer.account_id})
+
+    response = benchmark.pedantic(create, setup=setup, rounds=rounds_for(rows), iterations=1)
+    assert response.status_code == 200, response.content
+    assert BulkTransfer.objects.get(bulk_id=response.json()['bulkTransferId']).transfers_count == rows
+    record_throughput(benchmark, rows)
@@ -0,0 +1,56 @@
+"""
+Regression guard: under ASGI, a long-poll waits on the event loop. Every
+middleware of the stack must be async-capable; a sync-only one makes Django
+run it in a thread that stays blocked in async_to_sync for the whole wait,
+and concurrent long-polls then wait one after the other.
+"""
+import asyncio
+import sys
+import time
+
+from asgiref.sync import AsyncToSync
+from django.test import AsyncClient
+
+WAITERS = 5
+WAIT_SECONDS = 1
+
+
+def blocked_threads():
+    """Threads currently blocked in async_to_sync, waiting for async code to finish."""
+    blocked = 0
+    for frame in sys._current_frames().values():
+        while frame is not None:
+            if isinstance(frame.f_locals.get('self'), AsyncToSync):
+                blocked += 1
+                break
+            frame = frame.f_back
+    return blocked
+
+
+def bench_long_poll_holds_no_thread(transactional_db, make_bulk, gestionnaire):
+    from rest_framework_simplejwt.tokens import AccessToken
+    from apps.accounts.authentication import cache_principal
+
+    bulk = make_bulk(1)
+    cache_principal(gestionnaire)
+    headers = {'Authorization': f"Bearer {AccessToken.for_user(gestionnaire)}"}
+    client = AsyncClient()
+
+    async def wait_concurrently():
+        waiters = [
+            asyncio.create_task(client.get(
+                f"/api/bulk-transfers/{bulk.bulk_id}/wait", {'timeout': WAIT_SECONDS}, headers=headers
+            ))
+            for _ in range(WAITERS)
+        ]
+        await asyncio.sleep(WAIT_SECONDS / 2)
+        blocked = blocked_threads()
+        return blocked, await asyncio.gather(*waiters)
+
+    started = time.perf_counter()
+    blocked, responses = asyncio.run(wait_concurrently())
+    elapsed = time.perf_counter() - started
+    # The bulk never completes: every waiter times out
+    assert [r.status_code for r in responses] == [408] * WAITERS
+    assert blocked == 0, f"{blocked} threads held by {WAITERS} pending long-polls"
+    assert elapsed < 2 * WAIT_SECONDS, f"{WAITERS} concurrent long-polls of {WAIT_SECONDS}s took {elapsed:.1f}s"
@@ -0,0 +1,15 @@
+"""orchestrate_bulk against an in-process stub adapter (every transfer accepted, settled by callback)."""
+import pytest
+
+from apps.bulk.tasks import orchestrate_bulk
+from conftest import record_throughput, rounds_for
+
+
+@pytest.mark.benchmark(group='orchestrate_bulk')
+def bench_orchestrate_bulk(benchmark, rows, make_bulk, stub_adapter):
+    def setup():
+        return (make_bulk(rows).bulk_id,), {}
+
+    result = benchmark.pedantic(orchestrate_bulk, setup=setup, rounds=rounds_for(rows), iterations=1)
+    assert result['success_count'] == rows, result
+    record_throughput(benchmark, rows)
@@ -0,0 +1,94 @@
+"""
+Query-count regression guard: every endpoint with a declared query_budget
+is called on a representative data volume and must stay within its budget
+(see apps/monitoring/queries.py). A per-row query (N+1) fails here long
+before it shows up in the timings.
+"""
+import pytest
+from django.utils import timezone
+
+from apps.bulk.models import Account, DeadLetter
+from apps.monitoring.queries import assert_query_budget
+from bench_status import settle_share
+
+BUDGET_ROWS = 500
+HISTORY_BULKS = 50
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def admin_client(organization):
+    from django.test import Client
+    from rest_framework_simplejwt.tokens import AccessToken
+    from apps.accounts.authentication import cache_principal
+    from apps.accounts.models import User
+
+    admin = User.objects.create_user(
+        username='bench-admin', email='admin@example.com', password='bench',
+        organization=organization, role='SUPERVISEUR', is_staff=True
+    )
+    cache_principal(admin)
+    return Client(headers={'Authorization': f"Bearer {AccessToken.for_user(admin)}"})
+
+
+@pytest.fixture
+def settled_bulk(make_bulk):
+    """A bulk of BUDGET_ROWS transfers, partly settled, each linked to its own payee account."""
+    bulk = make_bulk(BUDGET_ROWS, dispatched_at=timezone.now())
+    settle_share(bulk)
+    for it in bulk.individuals.all():
+        it.payee_account = Account.objects.create(
+            party_id_type=it.payee_party_id_type, party_identifier=it.payee_party_identifier,
+            account_id=f"PAYEE-{it.transfer_id}"
+        )
+        it.save(update_fields=['payee_account'])
+    return bulk
+
+
+def bench_budget_bulk_status(settled_bulk, api_client):
+    response = assert_query_budget(api_client, 'get', f"/api/bulk-transfers/{settled_bulk.bulk_id}/status")
+    assert response.status_code == 200, response.content
+    assert len(response.json()['individualTransfers']) == BUDGET_ROWS
+
+
+def bench_budget_bulk_details(settled_bulk, api_client):
+    response = assert_query_budget(api_client, 'get', f"/api/bulk-transfers/{settled_bulk.bulk_id}/details")
+    assert response.status_code == 200, response.content
+    assert response.json()['statistics']['total'] == BUDGET_ROWS
+
+
+def bench_budget_bulk_performance(settled_bulk, api_client):
+    response = assert_query_budget(api_client, 'get', f"/api/bulk-transfers/{settled_bulk.bulk_id}/performance")
+    assert response.status_code == 200, response.content
+    assert response.json()['transfers'] == BUDGET_ROWS
+
+
+def bench_budget_list_bulk_transfers(make_bulk, api_client):
+    for _ in range(HISTORY_BULKS):
+        settle_share(make_bulk(BUDGET_ROWS // HISTORY_BULKS))
+
+    response = assert_query_budget(api_client, 'get', '/api/bulk-transfers/history', data={'limit': HISTORY_BULKS})
+    assert response.status_code == 200, response.content
+    assert response.json()['count'] == HISTORY_BULKS
+
+
+def bench_budget_transfer_callback(make_bulk, api_client):
+    transfer_id = make_bulk(1, dispatched_at=timezone.now()).individuals.get().transfer_id
+
+    response = assert_query_budget(
+        api_client, 'put', f"/api/transfers/{transfer_id}",
+        data={'currentState': 'COMPLETED', 'fulfilment': 'bench-fulfilment'}, content_type='application/json'
+    )
+    assert response.status_code == 202, response.content
+
+
+def bench_budget_dead_letters(make_bulk, admin_client):
+    bulk = make_bulk(BUDGET_ROWS)
+    DeadLetter.objects.bulk_create([
+        DeadLetter(transfer=it, reason='bench', attempts=5) for it in bulk.individuals.all()
+    ])
+
+    response = assert_query_budget(admin_client, 'get', '/api/admin/dead-letters', data={'limit': BUDGET_ROWS})
+    assert response.status_code == 200, response.content
+    assert response.json()['count'] == BUDGET_ROWS
@@ -0,0 +1,46 @@
+"""Status reads at scale: one large bulk, and the organization's history page."""
+import pytest
+
+from apps.bulk.models import BulkTransfer, IndividualTransfer
+from conftest import rounds_for
+
+HISTORY_BULKS = 200
+
+
+def settle_share(bulk, completed=0.7, failed=0.1):
+    """Mark a share of the bulk's transfers COMPLETED / FAILED, and its counters accordingly."""
+    pks = list(bulk.individuals.order_by('pk').values_list('pk', flat=True))
+    done, lost = int(len(pks) * completed), int(len(pks) * failed)
+    IndividualTransfer.objects.filter(pk__in=pks[:done]).update(status='COMPLETED')
+    IndividualTransfer.objects.filter(pk__in=pks[done:done + lost]).update(status='FAILED')
+    BulkTransfer.objects.filter(pk=bulk.pk).update(state='IN_PROGRESS', completed_count=done, failed_count=lost)
+
+
+@pytest.mark.benchmark(group='bulk_status')
+def bench_bulk_status(benchmark, rows, make_bulk, api_client):
+    bulk = make_bulk(rows)
+    settle_share(bulk)
+
+    response = benchmark.pedantic(
+        api_client.get, args=(f"/api/bulk-transfers/{bulk.bulk_id}/status",),
+        rounds=rounds_for(rows), iterations=1
+    )
+    assert response.status_code == 200, response.content
+    assert response.json()['total'] == rows
+    benchmark.extra_info['rows'] = rows
+
+
+@pytest.mark.benchmark(group='list_bulk_transfers')
+def bench_list_bulk_transfers(benchmark, rows, make_bulk, api_client):
+    # `rows` transfers spread over a full history page of bulks
+    for _ in range(HISTORY_BULKS):
+        settle_share(make_bulk(max(1, rows // HISTORY_BULKS)))
+
+    response = benchmark.pedantic(
+        api_client.get, args=('/api/bulk-transfers/history',), kwargs={'data': {'limit': HISTORY_BULKS}},
+        rounds=rounds_for(rows), iterations=1
+    )
+    assert response.status_code == 200, response.content
+    assert response.json()['count'] == HISTORY_BULKS
+    benchmark.extra_info['rows'] = rows
+    benchmark.extra_info['bulks'] = HISTORY_BULKS
@@ -0,0 +1,189 @@
+"""
+Shared fixtures of the benchmark suite: synthetic payrolls, an organization
+with a funded payer account and a gestionnaire, a stub scheme adapter, and
+the Redis used by the write paths.
+
+Payroll sizes default to 1k and 10k rows; pass --payroll-sizes=1000,10000,100000
+for the full matrix. The database is SQLite unless USE_SQLITE=False and the
+POSTGRES_* variables point to a local Postgres.
+"""
+import io
+import os
+import uuid
+
+import pytest
+
+DEFAULT_PAYROLL_SIZES = '1000,10000'
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--payroll-sizes', default=os.environ.get('BENCH_PAYROLL_SIZES', DEFAULT_PAYROLL_SIZES),
+        help='Comma-separated payroll sizes (rows) to benchmark'
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if 'rows' in metafunc.fixturenames:
+        sizes = [int(s) for s in metafunc.config.getoption('--payroll-sizes').split(',') if s.strip()]
+        metafunc.parametrize('rows', sizes, ids=[f"{s}rows" for s in sizes])
+
+
+@pytest.fixture(scope='session', autouse=True)
+def events_redis():
+    """
+    The write paths publish progress events to Redis. A reachable Redis
+    (EVENTS_REDIS_URL, default: database 15 of a local Redis) is required;
+    BENCH_FAKE_REDIS=1 runs against an in-process fakeredis instead, which
+    leaves Redis latency out of the numbers (the async client included).
+    """
+    import redis
+    from django.conf import settings
+    from apps.bulk import events
+
+    if 'EVENTS_REDIS_URL' not in os.environ:
+        settings.EVENTS_REDIS_URL = 'redis://localhost:6379/15'
+
+    if os.environ.get('BENCH_FAKE_REDIS') == '1':
+        import fakeredis
+
+        server = fakeredis.FakeServer()
+        events._client = fakeredis.FakeRedis(server=server)
+        # The async views (long-poll, SSE) subscribe through the same in-process server
+        events.get_async_redis = lambda: fakeredis.FakeAsyncRedis(server=server)
+        return events._client
+    client = events.get_redis()
+    try:
+        client.ping()
+    except redis.RedisError as e:
+        pytest.exit(f"Redis unreachable at EVENTS_REDIS_URL ({e}); start one or set BENCH_FAKE_REDIS=1", returncode=2)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def no_broker(monkeypatch):
+    """Tasks are never published to a broker: orchestration is benchmarked by calling it directly."""
+    from apps.bulk import inbox, tasks
+
+    monkeypatch.setattr(inbox, 'nudge_consumer', lambda: None)
+    monkeypatch.setattr(tasks.orchestrate_bulk, 'apply_async', lambda *a, **k: None)
+    monkeypatch.setattr(tasks.retry_transfer, 'apply_async', lambda *a, **k: None)
+
+
+def rounds_for(rows):
+    """Fewer rounds on large payrolls: each round of a 100k-row benchmark takes minutes."""
+    return 5 if rows <= 1000 else 3 if rows <= 10000 else 1
+
+
+def record_throughput(benchmark, rows):
+    """Store the rows per second (from the median round) with the benchmark results."""
+    benchmark.extra_info['rows'] = rows
+    if benchmark.disabled or benchmark.stats is None:
+        # --benchmark-disable: a single unmeasured run, no timing to record
+        return
+    benchmark.extra_info['rows_per_second'] = round(rows / benchmark.stats.stats.median, 1)
+
+
+def payroll_csv(rows, prefix=None):
+    """A synthetic payroll CSV (transferId,amount,currency,partyIdType,partyIdentifier)."""
+    prefix = prefix or uuid.uuid4().hex[:8]
+    out = io.StringIO()
+    out.write('transferId,amount,currency,partyIdType,partyIdentifier\n')
+    for i in range(rows):
+        out.write(f"{prefix}-{i},{1000 + i % 5000},XOF,MSISDN,22507{i:08d}\n")
+    return out.getvalue().encode()
+
+
+@pytest.fixture
+def make_payroll():
+    return payroll_csv
+
+
+@pytest.fixture
+def organization(db):
+    from apps.accounts.models import Organization
+
+    return Organization.objects.create(name='Bench', code='BENCH')
+
+
+@pytest.fixture
+def payer(organization):
+    from apps.bulk.models import Account
+
+    return Account.objects.create(
+        party_id_type='MSISDN', party_identifier='22500000000', account_id='BENCH-PAYER',
+        balance=10 ** 15, organization=organization
+    )
+
+
+@pytest.fixture
+def gestionnaire(organization):
+    from apps.accounts.models import User
+
+    return User.objects.create_user(
+        username='bench', email='bench@example.com', password='bench',
+        organization=organization, role='GESTIONNAIRE'
+    )
+
+
+@pytest.fixture
+def api_client(gestionnaire):
+    """Client authenticated as the gestionnaire, whose JWT principal is already cached (steady state)."""
+    from django.test import Client
+    from rest_framework_simplejwt.tokens import AccessToken
+    from apps.accounts.authentication import cache_principal
+
+    cache_principal(gestionnaire)
+    return Client(headers={'Authorization': f"Bearer {AccessToken.for_user(gestionnaire)}"})
+
+
+@pytest.fixture
+def make_bulk(payer):
+    """Create a bulk of n PENDING transfers directly (no HTTP, no reservation)."""
+    from apps.bulk.models import BulkTransfer, IndividualTransfer
+
+    def make(rows, **transfer_fields):
+        prefix = uuid.uuid4().hex[:8]
+        bulk = BulkTransfer.objects.create(
+            bulk_id=f"bulk-{prefix}", payer_account=payer, total_amount=rows * 1000,
+            currency='XOF', transfers_count=rows
+        )
+        IndividualTransfer.objects.bulk_create([
+            IndividualTransfer(
+                transfer_id=f"{prefix}-{i}", bulk=bulk, payee_party_id_type='MSISDN',
+                payee_party_identifier=f"22507{i:08d}", amount=1000, currency='XOF',
+                **transfer_fields
+            )
+            for i in range(rows)
+        ], batch_size=1000)
+        return bulk
+
+    return make
+
+
+class StubResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self._body = body
+        self.text = ''
+
+    def json(self):
+        return self._body
+
+
+@pytest.fixture
+def stub_adapter(monkeypatch):
+    """
+    In-process scheme adapter: every POST /transfers is accepted (202, the
+    callback settles it later), with no network round trip.
+    """
+    from apps.sdk_adapter import client
+
+    calls = []
+
+    def request(method, url, **kwargs):
+        calls.append(url)
+        return StubResponse(202, {'currentState': 'WAITING_FOR_QUOTE_ACCEPTANCE'})
+
+    monkeypatch.setattr(client.requests, 'request', request)
+    return calls
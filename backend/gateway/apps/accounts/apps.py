@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class AccountsConfig(AppConfig):
+    name = 'apps.accounts'
+
+    def ready(self):
+        # Invalidation du cache des principaux JWT
+        from . import signals  # noqa: F401
@@ -0,0 +1,197 @@
+"""
+Authentification des requêtes : résolution du principal JWT depuis un cache
+Redis, et authentification des vues asynchrones (ASGI).
+
+CachedJWTAuthentication remplace la lecture de l'utilisateur (et de son
+organisation) à chaque requête par une entrée Redis de courte durée
+(AUTH_USER_CACHE_SECONDS). L'entrée est supprimée dès que l'utilisateur ou son
+organisation est modifié (voir signals.py) ; la durée de vie borne seulement
+le décalage en cas de modification hors ORM (QuerySet.update, SQL direct).
+
+Une requête qui a lu l'utilisateur en base juste avant une modification peut
+écrire l'ancienne version après l'invalidation. Chaque invalidation change donc
+la génération de l'utilisateur (jeton aléatoire dans Redis) ; une entrée porte
+la génération lue avant sa lecture en base, et n'est servie que si celle-ci est
+toujours la génération courante.
+Le mot de passe n'est jamais mis en cache : sur l'instance reconstruite il est
+différé, chargé à la demande, et un save() n'écrit que les champs chargés.
+"""
+import json
+import logging
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from apps.bulk.events import get_redis
+
+from .models import Organization, User
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_KEY = 'auth:user:{user_id}'
+GENERATION_KEY = 'auth:user:{user_id}:generation'
+
+# Champs mis en cache (sans le mot de passe) ; les dates sont sérialisées en ISO 8601
+USER_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser',
+    'role', 'phone_number', 'last_login', 'last_login_ip', 'date_joined', 'organization_id',
+)
+ORGANIZATION_FIELDS = ('id', 'name', 'code', 'is_active', 'created_at')
+DATETIME_FIELDS = ('last_login', 'date_joined', 'created_at')
+
+
+def _dump(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+def _load(model, data, fields):
+    """Instance « lue en base » des champs fournis, les autres champs restant différés."""
+    # from_db attend les valeurs dans l'ordre des champs du modèle
+    names = [f.attname for f in model._meta.concrete_fields if f.attname in fields]
+    values = [parse_datetime(data[f]) if f in DATETIME_FIELDS and data[f] else data[f] for f in names]
+    return model.from_db(User.objects.db, names, values)
+
+
+def principal_key(user_id):
+    """Clé Redis du principal d'un utilisateur (USER_ID_FIELD, l'identifiant porté par le token)."""
+    return PRINCIPAL_KEY.format(user_id=user_id)
+
+
+def generation_key(user_id):
+    """Clé Redis de la génération du principal d'un utilisateur, changée à chaque invalidation."""
+    return GENERATION_KEY.format(user_id=user_id)
+
+
+def _generation(raw):
+    return raw.decode() if raw else ''
+
+
+def cache_principal(user, generation=None):
+    """
+    Met en cache l'utilisateur et son organisation (sans effet si Redis est
+    indisponible).
+
+    Args:
+        user: Utilisateur, organisation chargée
+        generation: Génération lue avant de lire l'utilisateur en base (voir
+            cached_principal) ; par défaut la génération courante
+    """
+    user_id = getattr(user, jwt_settings.USER_ID_FIELD)
+    try:
+        redis = get_redis()
+        if generation is None:
+            generation = _generation(redis.get(generation_key(user_id)))
+        data = {'generation': generation, 'user': _dump(user, USER_FIELDS)}
+        if user.organization_id:
+            data['organization'] = _dump(user.organization, ORGANIZATION_FIELDS)
+        redis.set(principal_key(user_id), json.dumps(data, cls=DjangoJSONEncoder), ex=settings.AUTH_USER_CACHE_SECONDS)
+    except Exception as e:
+        logger.debug(f"Principal de {user.username} non mis en cache: {e}")
+
+
+def cached_principal(user_id):
+    """
+    Utilisateur (organisation préchargée) mis en cache, s'il est de la
+    génération courante.
+
+    Returns:
+        tuple: (utilisateur ou None, génération courante à passer à
+            cache_principal, None si Redis est indisponible)
+    """
+    try:
+        raw, generation = get_redis().mget(principal_key(user_id), generation_key(user_id))
+    except Exception as e:
+        logger.debug(f"Cache des principaux indisponible: {e}")
+        return None, None
+    generation = _generation(generation)
+    if raw is None:
+        return None, generation
+    data = json.loads(raw)
+    if data.get('generation') != generation:
+        # Écrite avec une version lue avant une modification
+        return None, generation
+    user = _load(User, data['user'], USER_FIELDS)
+    organization = data.get('organization')
+    # Préremplit le cache de la relation : user.organization ne fait pas de requête
+    User.organization.field.set_cached_value(
+        user, _load(Organization, organization, ORGANIZATION_FIELDS) if organization else None
+    )
+    return user, generation
+
+
+def invalidate_principals(user_ids):
+    """
+    Supprime les principaux en cache des utilisateurs donnés et change leur
+    génération. La génération survit aux entrées écrites avant elle
+    (2 x AUTH_USER_CACHE_SECONDS).
+    """
+    if not user_ids:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.set(generation_key(user_id), uuid.uuid4().hex, ex=2 * settings.AUTH_USER_CACHE_SECONDS)
+            pipe.delete(principal_key(user_id))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Invalidation des principaux {user_ids} impossible: {e}")
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication dont l'utilisateur est lu dans le cache des principaux.
+    En cas d'absence, il est lu en base par JWTAuthentication puis mis en cache
+    avec son organisation. Les contrôles de JWTAuthentication (utilisateur
+    actif, révocation par changement de mot de passe) s'appliquent aussi aux
+    utilisateurs lus dans le cache.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        user, generation = cached_principal(user_id) if user_id is not None else (None, None)
+        if user is None:
+            user = super().get_user(validated_token)
+            if generation is not None:
+                cache_principal(user, generation)
+            return user
+
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        if jwt_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            jwt_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+        return user
+
+
+def _authenticate(request):
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(request)
+        except AuthenticationFailed:
+            return None
+        if result is not None:
+            user, _ = result
+            # Charger l'organisation tant que l'on est dans le thread synchrone
+            user.organization
+            return user
+    return None
+
+
+async def authenticate_async(request):
+    """
+    Authentifie une requête Django avec les backends DRF configurés
+    (JWT par défaut), hors boucle d'événements.
+
+    Returns:
+        L'utilisateur authentifié, ou None si le token est absent ou invalide.
+    """
+    return await sync_to_async(_authenticate)(request)
@@ -1,44 +1,305 @@
 """
 Utilitaires pour l'envoi d'emails dans l'application accounts.
+
+Les emails ne sont pas envoyés pendant la requête : queue_email les place dans
+une file Redis et réveille la tâche Celery send_queued_emails, qui les envoie
+par lots de EMAIL_BATCH_SIZE sur une même connexion SMTP. Un email en échec
+est réessayé avec un délai croissant (EMAIL_RETRY_BASE_SECONDS, doublé à
+chaque tentative) jusqu'à EMAIL_MAX_ATTEMPTS tentatives ; un destinataire
+refusé par le serveur ne l'est pas.
+
+La file est fiable : un envoi déplace (LMOVE) chaque email de la file vers sa
+propre liste « en cours », et ne l'en retire qu'une fois l'email envoyé,
+abandonné ou planifié pour un réessai. Un envoi interrompu (worker tué) cesse
+de renouveler son bail (EMAIL_SENDER_LEASE_SECONDS) ; l'envoi suivant remet
+alors ses emails en cours dans la file. Un email peut ainsi partir deux fois,
+jamais être perdu.
+
+Aucun secret n'est placé dans la file : l'email de bienvenue n'y est qu'une
+référence à l'utilisateur, rendue au moment de l'envoi, sans le mot de passe
+temporaire (remis à l'administrateur qui a créé le compte).
 """
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.conf import settings
+import json
+import logging
+import smtplib
+import time
+import uuid
+from collections import Counter
 from datetime import datetime
 
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+from redis.exceptions import WatchError
+
+from apps.bulk.events import get_redis
+from apps.monitoring.metrics import EMAILS
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = 'emails:queue'
+RETRY_KEY = 'emails:retry'
+NUDGE_KEY = 'emails:nudge'
+SENDERS_KEY = 'emails:senders'
+PROCESSING_KEY = 'emails:processing:{sender}'
+LEASE_KEY = 'emails:sender:{sender}'
 
-def send_welcome_email(user, temp_password):
+WELCOME = 'welcome'
+
+
+def _label(email):
+    """Description d'un email de la file, pour les journaux."""
+    if email.get('kind') == WELCOME:
+        return f"email de bienvenue de l'utilisateur {email['user_id']}"
+    return f"email « {email['subject']} » à {', '.join(email['to'])}"
+
+
+def _message(email):
+    """Message à envoyer pour un email de la file, ou None si son utilisateur n'existe plus."""
+    if email.get('kind') == WELCOME:
+        from .models import User
+
+        user = User.objects.select_related('organization').filter(pk=email['user_id']).first()
+        return _welcome_message(user) if user is not None else None
+    message = EmailMultiAlternatives(
+        subject=email['subject'], body=email['body'], from_email=email['from_email'], to=email['to']
+    )
+    if email.get('html'):
+        message.attach_alternative(email['html'], 'text/html')
+    return message
+
+
+def _enqueue(email):
     """
-    Envoie un email de bienvenue au nouvel utilisateur avec son mot de passe temporaire.
-    
+    Place un email dans la file d'envoi. Si Redis est indisponible, l'email
+    est envoyé directement.
+
+    Returns:
+        bool: True si l'email a été placé dans la file (ou envoyé), False sinon
+    """
+    try:
+        get_redis().rpush(QUEUE_KEY, json.dumps(email))
+    except Exception as e:
+        logger.warning(f"File d'envoi des emails indisponible, envoi direct ({_label(email)}): {e}")
+        try:
+            message = _message(email)
+            if message is None:
+                return False
+            message.send(fail_silently=False)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'envoi ({_label(email)}): {e}")
+            EMAILS.labels(outcome='failed').inc()
+            return False
+        EMAILS.labels(outcome='sent').inc()
+        return True
+    EMAILS.labels(outcome='queued').inc()
+    nudge_sender()
+    return True
+
+
+def queue_email(subject, body, to, html_message=None, from_email=None):
+    """
+    Place un email dans la file d'envoi. Si Redis est indisponible, l'email
+    est envoyé directement. Le contenu est conservé dans Redis jusqu'à
+    l'envoi : il ne doit pas contenir de secret.
+
     Args:
-        user: Instance du modèle User
-        temp_password: Mot de passe temporaire généré
-    
+        subject: Objet
+        body: Version texte
+        to: Liste des destinataires
+        html_message: Version HTML (optionnelle)
+        from_email: Expéditeur (DEFAULT_FROM_EMAIL par défaut)
+
     Returns:
-        bool: True si l'email a été envoyé avec succès, False sinon
+        bool: True si l'email a été placé dans la file (ou envoyé), False sinon
+    """
+    return _enqueue({
+        'id': uuid.uuid4().hex,
+        'subject': subject,
+        'body': body,
+        'from_email': from_email or settings.DEFAULT_FROM_EMAIL,
+        'to': list(to),
+        'html': html_message,
+        'attempt': 0,
+    })
+
+
+def nudge_sender():
+    """
+    Planifie l'envoi de la file, au plus une fois par EMAIL_NUDGE_SECONDS :
+    les emails placés entre-temps partent dans le même lot. La tâche
+    périodique (celery beat) rattrape les réveils perdus et les réessais.
+    """
+    try:
+        if get_redis().set(NUDGE_KEY, 1, nx=True, ex=settings.EMAIL_NUDGE_SECONDS):
+            from .tasks import send_queued_emails
+            send_queued_emails.apply_async(countdown=settings.EMAIL_NUDGE_SECONDS)
+    except Exception as e:
+        logger.warning(f"Réveil de l'envoi des emails impossible: {e}")
+
+
+def _requeue_due_retries(redis):
+    """Remet dans la file les emails dont le délai avant réessai est écoulé."""
+    with redis.pipeline() as pipe:
+        try:
+            # Retrait et remise en file dans une même transaction : ni perte ni doublon
+            pipe.watch(RETRY_KEY)
+            due = pipe.zrangebyscore(RETRY_KEY, 0, time.time())
+            if not due:
+                return
+            pipe.multi()
+            pipe.zrem(RETRY_KEY, *due)
+            pipe.rpush(QUEUE_KEY, *due)
+            pipe.execute()
+        except WatchError:
+            # Ensemble modifié entre-temps : repris au prochain passage
+            pass
+
+
+def _requeue_processing(redis, processing):
+    """Remet en tête de file, dans leur ordre, les emails d'une liste en cours ; retourne leur nombre."""
+    moved = 0
+    while redis.lmove(processing, QUEUE_KEY, 'RIGHT', 'LEFT') is not None:
+        moved += 1
+    return moved
+
+
+def _recover_abandoned(redis):
+    """Remet dans la file les emails en cours des envois dont le bail a expiré (worker tué)."""
+    for sender in redis.smembers(SENDERS_KEY):
+        sender = sender.decode()
+        if redis.exists(LEASE_KEY.format(sender=sender)):
+            continue
+        moved = _requeue_processing(redis, PROCESSING_KEY.format(sender=sender))
+        redis.srem(SENDERS_KEY, sender)
+        if moved:
+            logger.warning(f"{moved} emails d'un envoi interrompu remis dans la file")
+
+
+def _claim_batch(redis, processing, batch_size):
+    """Déplace jusqu'à batch_size emails de la file vers la liste en cours de l'envoi."""
+    pipe = redis.pipeline(transaction=False)
+    for _ in range(batch_size):
+        pipe.lmove(QUEUE_KEY, processing, 'LEFT', 'RIGHT')
+    return [raw for raw in pipe.execute() if raw is not None]
+
+
+def _retry_later(pipe, email, error):
+    """Planifie (dans pipe) le réessai d'un email, ou l'abandonne après EMAIL_MAX_ATTEMPTS tentatives."""
+    email['attempt'] += 1
+    if email['attempt'] >= settings.EMAIL_MAX_ATTEMPTS:
+        logger.error(f"{_label(email)} abandonné après {email['attempt']} tentatives: {error}")
+        EMAILS.labels(outcome='failed').inc()
+        return 'failed'
+    delay = settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (email['attempt'] - 1)
+    pipe.zadd(RETRY_KEY, {json.dumps(email): time.time() + delay})
+    logger.warning(f"{_label(email)} réessayé dans {delay} s: {error}")
+    EMAILS.labels(outcome='retried').inc()
+    return 'retried'
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception as e:
+        logger.debug(f"Fermeture de la connexion SMTP: {e}")
+
+
+def _deliver(pipe, connection, email):
+    message = _message(email)
+    if message is None:
+        logger.warning(f"{_label(email)} abandonné : utilisateur supprimé")
+        EMAILS.labels(outcome='failed').inc()
+        return 'failed'
+    try:
+        # Sans effet si la connexion est déjà ouverte ; la rouvre après une erreur
+        connection.open()
+        connection.send_messages([message])
+    except smtplib.SMTPRecipientsRefused as e:
+        logger.error(f"{_label(email)} refusé: {e}")
+        EMAILS.labels(outcome='failed').inc()
+        return 'failed'
+    except Exception as e:
+        _close(connection)
+        return _retry_later(pipe, email, e)
+    EMAILS.labels(outcome='sent').inc()
+    return 'sent'
+
+
+def send_email_queue(batch_size=None):
+    """
+    Envoie les emails en attente par lots jusqu'à épuisement de la file, sur
+    une seule connexion SMTP. Si le serveur SMTP est injoignable, le lot en
+    cours est reporté et l'envoi s'arrête jusqu'au prochain passage.
+
+    Returns:
+        dict: Nombre d'emails par issue (sent, retried, failed)
     """
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    redis = get_redis()
+    _recover_abandoned(redis)
+    _requeue_due_retries(redis)
+
+    sender = uuid.uuid4().hex
+    processing = PROCESSING_KEY.format(sender=sender)
+    lease = LEASE_KEY.format(sender=sender)
+    redis.set(lease, 1, ex=settings.EMAIL_SENDER_LEASE_SECONDS)
+    redis.sadd(SENDERS_KEY, sender)
+
+    counts = Counter()
+    connection = get_connection(fail_silently=False)
     try:
-        # Contexte pour le template
-        context = {
-            'user': user,
-            'temp_password': temp_password,
-            'login_url': settings.FRONTEND_URL if hasattr(settings, 'FRONTEND_URL') else 'http://localhost:5173/login',
-            'current_year': datetime.now().year,
-        }
-        
-        # Rendu du template HTML
-        html_message = render_to_string('emails/welcome_user.html', context)
-        
-        # Version texte simple (fallback)
-        text_message = f"""
+        while True:
+            batch = _claim_batch(redis, processing, batch_size)
+            if not batch:
+                break
+            try:
+                connection.open()
+            except Exception as e:
+                logger.warning(f"Connexion SMTP impossible, {len(batch)} emails reportés: {e}")
+                pipe = redis.pipeline()
+                for raw in batch:
+                    counts[_retry_later(pipe, json.loads(raw), e)] += 1
+                    pipe.lrem(processing, 1, raw)
+                pipe.execute()
+                break
+            for raw in batch:
+                # Issue de l'email et retrait de la liste en cours dans une même transaction
+                pipe = redis.pipeline()
+                counts[_deliver(pipe, connection, json.loads(raw))] += 1
+                pipe.lrem(processing, 1, raw)
+                pipe.expire(lease, settings.EMAIL_SENDER_LEASE_SECONDS)
+                pipe.execute()
+    finally:
+        _close(connection)
+        # Après une erreur, les emails non traités retournent dans la file
+        _requeue_processing(redis, processing)
+        redis.delete(lease)
+        redis.srem(SENDERS_KEY, sender)
+    return dict(counts)
+
+
+def _welcome_message(user):
+    """Email de bienvenue d'un utilisateur, rendu au moment de l'envoi."""
+    # Contexte pour le template
+    context = {
+        'user': user,
+        'login_url': settings.FRONTEND_URL if hasattr(settings, 'FRONTEND_URL') else 'http://localhost:5173/login',
+        'current_year': datetime.now().year,
+    }
+
+    # Rendu du template HTML
+    html_message = render_to_string('emails/welcome_user.html', context)
+
+    # Version texte simple (fallback)
+    text_message = f"""
 Bonjour {user.first_name} {user.last_name},
 
 Votre compte a été créé avec succès sur PensionPay.
 
 Vos identifiants de connexion :
 - Email : {user.email}
-- Mot de passe temporaire : {temp_password}
+- Mot de passe temporaire : communiqué par votre administrateur
 - Rôle : {user.get_role_display()}
 
 ⚠️ IMPORTANT : Ce mot de passe est temporaire. Vous devez le changer lors de votre première connexion.
@@ -48,22 +309,33 @@ Organisation : {user.organization.name if user.organization else 'Non définie'}
 Cordialement,
 L'équipe PensionPay
         """
-        
-        # Envoi de l'email
-        send_mail(
-            subject='Bienvenue sur PensionPay - Vos identifiants',
-            message=text_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        
-        return True
-        
+
+    message = EmailMultiAlternatives(
+        subject='Bienvenue sur PensionPay - Votre compte',
+        body=text_message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user.email],
+    )
+    message.attach_alternative(html_message, 'text/html')
+    return message
+
+
+def send_welcome_email(user):
+    """
+    Place dans la file d'envoi un email de bienvenue au nouvel utilisateur.
+    Seul son identifiant est placé dans la file : l'email est rendu à l'envoi,
+    sans le mot de passe temporaire.
+
+    Args:
+        user: Instance du modèle User
+
+    Returns:
+        bool: True si l'email a été placé dans la file d'envoi, False sinon
+    """
+    try:
+        return _enqueue({'id': uuid.uuid4().hex, 'kind': WELCOME, 'user_id': user.pk, 'attempt': 0})
     except Exception as e:
-        # Logger l'erreur en production
-        print(f"Erreur lors de l'envoi de l'email à {user.email}: {str(e)}")
+        logger.error(f"Erreur lors de la préparation de l'email à {user.email}: {e}")
         return False
 
 
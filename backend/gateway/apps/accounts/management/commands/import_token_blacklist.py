@@ -0,0 +1,72 @@
+"""
+Reprise de la liste noire de l'ancienne application token_blacklist de Simple
+JWT : copie dans Redis les refresh tokens révoqués et non expirés (voir
+apps/accounts/tokens.py), puis, avec --drop-tables, supprime ses tables.
+"""
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils.dateparse import parse_datetime
+
+from apps.accounts.tokens import blacklist_key
+from apps.bulk.events import get_redis
+
+OUTSTANDING_TABLE = 'token_blacklist_outstandingtoken'
+BLACKLISTED_TABLE = 'token_blacklist_blacklistedtoken'
+
+
+class Command(BaseCommand):
+    help = "Copie dans Redis la liste noire des refresh tokens de token_blacklist"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--drop-tables', action='store_true',
+            help="Supprimer ensuite les tables de token_blacklist (irréversible)"
+        )
+
+    def handle(self, *args, **options):
+        tables = connection.introspection.table_names()
+        if BLACKLISTED_TABLE not in tables:
+            self.stdout.write("Pas de table token_blacklist : rien à reprendre")
+            return
+
+        revoked = self.revoked_tokens()
+        try:
+            pipe = get_redis().pipeline()
+            for jti, user_id, ttl in revoked:
+                # NX : une révocation déjà présente garde sa durée de vie
+                pipe.set(blacklist_key(jti), str(user_id or ''), ex=ttl, nx=True)
+            pipe.execute()
+        except Exception as e:
+            raise CommandError(f"Redis indisponible, tables conservées : {e}")
+        self.stdout.write(f"{len(revoked)} refresh tokens révoqués copiés dans Redis")
+
+        if options['drop_tables']:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE {BLACKLISTED_TABLE}")
+                cursor.execute(f"DROP TABLE IF EXISTS {OUTSTANDING_TABLE}")
+            self.stdout.write("Tables token_blacklist supprimées")
+
+    def revoked_tokens(self):
+        """(jti, user_id, durée de vie restante en secondes) des révocations non expirées."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT o.jti, o.user_id, o.expires_at FROM {BLACKLISTED_TABLE} b "
+                f"JOIN {OUTSTANDING_TABLE} o ON o.id = b.token_id"
+            )
+            rows = cursor.fetchall()
+
+        now = time.time()
+        revoked = []
+        for jti, user_id, expires_at in rows:
+            if isinstance(expires_at, str):
+                expires_at = parse_datetime(expires_at)
+            if expires_at.tzinfo is None:
+                # SQLite : dates stockées en UTC, sans fuseau
+                expires_at = expires_at.replace(tzinfo=datetime.timezone.utc)
+            ttl = int(expires_at.timestamp() - now) + 1
+            if ttl > 0:
+                revoked.append((jti, user_id, ttl))
+        return revoked
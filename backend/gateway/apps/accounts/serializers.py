@@ -1,7 +1,8 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.contrib.auth import authenticate
 from .models import User, Organization
+from .tokens import RefreshToken
 
 
 class OrganizationSerializer(serializers.ModelSerializer):
@@ -65,6 +66,7 @@ class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
     Permet de se connecter avec email + password.
     """
     username_field = User.USERNAME_FIELD
+    token_class = RefreshToken
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -132,6 +134,14 @@ class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Rafraîchissement JWT : le refresh token présenté est révoqué (liste noire
+    Redis) et remplacé par un nouveau. Un refresh token déjà utilisé est refusé.
+    """
+    token_class = RefreshToken
+
+
 class AdminUserCreateSerializer(serializers.ModelSerializer):
     """
     Serializer pour la création d'utilisateurs par un administrateur.
@@ -0,0 +1,27 @@
+"""
+Invalidation du cache des principaux JWT (voir authentication.py) à chaque
+modification d'un utilisateur ou d'une organisation par l'ORM.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_principals
+from .models import Organization, User
+
+
+def _invalidate(user_ids):
+    # Après validation, pour qu'une relecture en base voie la nouvelle version. Une requête
+    # qui a lu l'ancienne avant la validation peut encore l'écrire en cache, mais avec
+    # l'ancienne génération : elle n'est plus servie (voir authentication.py)
+    transaction.on_commit(lambda: invalidate_principals(user_ids))
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_principal(sender, instance, **kwargs):
+    _invalidate([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Organization)
+def invalidate_organization_principals(sender, instance, **kwargs):
+    _invalidate(list(User.objects.filter(organization_id=instance.pk).values_list('pk', flat=True)))
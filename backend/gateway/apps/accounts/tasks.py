@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .emails import send_email_queue
+
+
+@shared_task
+def send_queued_emails():
+    """Send the queued emails in batches over one SMTP connection (nudged by queue_email, and by celery beat)."""
+    return send_email_queue()
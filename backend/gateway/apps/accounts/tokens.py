@@ -0,0 +1,81 @@
+"""
+Refresh tokens révocables, avec une liste noire dans Redis.
+
+Remplace l'application token_blacklist de Simple JWT, qui enregistrait chaque
+refresh token émis (OutstandingToken) et chaque révocation (BlacklistedToken)
+en base : ces tables grossissaient sans limite et chaque rafraîchissement y
+écrivait. Ici, seule une révocation (déconnexion, rotation) écrit une clé
+Redis, dont la durée de vie est celle qui reste au jeton : un jeton expiré
+est refusé par sa date d'expiration et n'a plus besoin d'être dans la liste.
+
+La révocation est atomique (SET NX) : de deux rafraîchissements concurrents
+du même refresh token, un seul obtient un nouveau jeton.
+"""
+import logging
+import time
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+
+from apps.bulk.events import get_redis
+
+logger = logging.getLogger(__name__)
+
+BLACKLIST_KEY = 'auth:blacklist:{jti}'
+
+
+def blacklist_key(jti):
+    """Clé Redis de la révocation d'un jeton (claim jti)."""
+    return BLACKLIST_KEY.format(jti=jti)
+
+
+def is_blacklisted(jti):
+    """
+    Indique si le jeton est révoqué. Si Redis est indisponible, le jeton est
+    refusé : une révocation ne doit pas pouvoir être contournée.
+    """
+    try:
+        return bool(get_redis().exists(blacklist_key(jti)))
+    except Exception as e:
+        logger.error(f"Liste noire des jetons indisponible: {e}")
+        raise TokenError(_('Token blacklist unavailable'))
+
+
+def blacklist_token(token):
+    """
+    Révoque un jeton jusqu'à son expiration.
+
+    Returns:
+        bool: False si le jeton était déjà révoqué (ou déjà expiré)
+    """
+    ttl = int(token['exp'] - time.time()) + 1
+    if ttl <= 0:
+        return False
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    try:
+        return bool(get_redis().set(
+            blacklist_key(token[api_settings.JTI_CLAIM]), str(user_id or ''), ex=ttl, nx=True
+        ))
+    except Exception as e:
+        logger.error(f"Révocation du jeton de l'utilisateur {user_id} impossible: {e}")
+        raise TokenError(_('Token blacklist unavailable'))
+
+
+class RefreshToken(BaseRefreshToken):
+    """RefreshToken de Simple JWT dont la liste noire est dans Redis."""
+
+    def verify(self, *args, **kwargs):
+        self.check_blacklist()
+        super().verify(*args, **kwargs)
+
+    def check_blacklist(self):
+        """Lève TokenError si le jeton est révoqué."""
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        """Révoque le jeton ; lève TokenError s'il l'était déjà (jeton rejoué)."""
+        if not blacklist_token(self.payload):
+            raise TokenError(_('Token is blacklisted'))
@@ -2,13 +2,13 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from .serializers import UserProfileSerializer, EmailTokenObtainPairSerializer, AdminUserCreateSerializer, OrganizationSerializer
 from .emails import send_welcome_email
 from .models import Organization
+from .tokens import RefreshToken
 
 
 class EmailTokenObtainPairView(TokenObtainPairView):
@@ -138,7 +138,7 @@ def logout(request):
     
     **Fonctionnalités:**
     - Génère automatiquement un mot de passe temporaire sécurisé
-    - Envoie un email de bienvenue avec les identifiants
+    - Envoie un email de bienvenue avec les identifiants (en file d'envoi, hors requête)
     - Retourne les informations de l'utilisateur créé + le mot de passe temporaire
     
     **Body:**
@@ -166,7 +166,7 @@ def logout(request):
         },
         "temporary_password": "aB3$xY9!mN2@",
         "email_sent": true,
-        "message": "Utilisateur créé avec succès. Un email a été envoyé."
+        "message": "Utilisateur créé avec succès. Un email va être envoyé."
     }
     ```
     """,
@@ -204,8 +204,8 @@ def admin_create_user(request):
         # Récupérer le mot de passe temporaire (stocké dans l'instance)
         temp_password = user.temp_password
         
-        # Envoyer l'email de bienvenue
-        email_sent = send_welcome_email(user, temp_password)
+        # Placer l'email de bienvenue dans la file d'envoi (tâche Celery), sans le mot de passe
+        email_sent = send_welcome_email(user)
         
         # Préparer la réponse avec le profil complet de l'utilisateur
         from .serializers import UserProfileSerializer
@@ -215,7 +215,7 @@ def admin_create_user(request):
             'user': user_data,
             'temporary_password': temp_password,
             'email_sent': email_sent,
-            'message': 'Utilisateur créé avec succès. Un email a été envoyé.' if email_sent else 
+            'message': 'Utilisateur créé avec succès. Un email va être envoyé.' if email_sent else 
                       'Utilisateur créé avec succès. Erreur lors de l\'envoi de l\'email.'
         }, status=status.HTTP_201_CREATED)
     
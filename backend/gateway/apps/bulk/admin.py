@@ -1,6 +1,12 @@
 from django.contrib import admin
-from .models import Account, BulkTransfer, IndividualTransfer
+from .models import Account, AccountShard, BalanceSnapshot, BulkTransfer, CallbackInbox, DeadLetter, IndividualTransfer, JournalEntry, OutboxMessage
 
 admin.site.register(Account)
+admin.site.register(AccountShard)
 admin.site.register(BulkTransfer)
 admin.site.register(IndividualTransfer)
+admin.site.register(JournalEntry)
+admin.site.register(BalanceSnapshot)
+admin.site.register(CallbackInbox)
+admin.site.register(DeadLetter)
+admin.site.register(OutboxMessage)
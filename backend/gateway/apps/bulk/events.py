@@ -0,0 +1,244 @@
+"""
+Diffusion des changements d'état des bulk transfers via Redis pub/sub.
+
+Les chemins d'écriture (orchestration, callbacks) publient un événement sur le
+canal du bulk une fois la transaction validée ; les flux SSE s'abonnent à ce
+canal au lieu d'interroger la base de données en boucle.
+"""
+import asyncio
+import json
+import logging
+import weakref
+from contextlib import asynccontextmanager
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_redis():
+    """Retourne le client Redis partagé par le processus (créé à la demande)."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.EVENTS_REDIS_URL)
+    return _client
+
+
+def get_async_redis():
+    """Retourne le client Redis asynchrone partagé par la boucle d'événements courante."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = aioredis.Redis.from_url(settings.EVENTS_REDIS_URL)
+    return client
+
+
+def bulk_channel(bulk_id):
+    """Nom du canal pub/sub d'un bulk transfer."""
+    return f"bulk-events:{bulk_id}"
+
+
+def bulk_seq_key(bulk_id):
+    """Clé du compteur de séquence des événements d'un bulk."""
+    return f"bulk-events:{bulk_id}:seq"
+
+
+def bulk_log_key(bulk_id):
+    """Clé du journal borné (ring buffer) des derniers événements d'un bulk."""
+    return f"bulk-events:{bulk_id}:log"
+
+
+def organization_channel(organization_id):
+    """Nom du canal pub/sub regroupant les événements de tous les bulks d'une organisation."""
+    return f"org-events:{organization_id}"
+
+
+def publish_bulk_event(bulk_id, event_type, organization_id=None, **payload):
+    """
+    Publie un événement sur le canal du bulk après le commit de la transaction.
+    Si organization_id est fourni, l'événement est aussi publié sur le canal de
+    l'organisation (flux multiplexé).
+
+    Chaque événement reçoit un numéro de séquence propre au bulk et est conservé
+    dans un journal borné (SSE_EVENT_LOG_SIZE derniers événements, expirant après
+    SSE_EVENT_LOG_TTL secondes) pour permettre la reprise via Last-Event-ID.
+
+    Hors transaction, la publication est immédiate. Une indisponibilité de Redis
+    n'interrompt jamais le chemin d'écriture : les flux SSE se resynchronisent
+    sur la base de données.
+    """
+    def _publish():
+        try:
+            client = get_redis()
+            seq = client.incr(bulk_seq_key(bulk_id))
+            message = json.dumps({'bulkTransferId': bulk_id, 'type': event_type, 'seq': seq, **payload})
+            pipe = client.pipeline()
+            pipe.rpush(bulk_log_key(bulk_id), message)
+            pipe.ltrim(bulk_log_key(bulk_id), -settings.SSE_EVENT_LOG_SIZE, -1)
+            pipe.expire(bulk_log_key(bulk_id), settings.SSE_EVENT_LOG_TTL)
+            pipe.expire(bulk_seq_key(bulk_id), settings.SSE_EVENT_LOG_TTL)
+            pipe.publish(bulk_channel(bulk_id), message)
+            if organization_id is not None:
+                pipe.publish(organization_channel(organization_id), message)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Publication de l'événement {event_type} pour {bulk_id} impossible: {e}")
+
+    transaction.on_commit(_publish)
+
+
+async def current_bulk_seq(bulk_id):
+    """Retourne le dernier numéro de séquence publié pour le bulk (0 si inconnu)."""
+    try:
+        return int(await get_async_redis().get(bulk_seq_key(bulk_id)) or 0)
+    except redis.RedisError:
+        return 0
+
+
+async def bulk_events_since(bulk_id, after_seq):
+    """
+    Retourne les événements du bulk postérieurs à after_seq, dans l'ordre.
+
+    Retourne None si le journal ne couvre plus tous les événements manqués
+    (journal tronqué ou expiré, Redis indisponible) : l'appelant doit alors
+    repartir d'un instantané lu en base.
+    """
+    try:
+        pipe = get_async_redis().pipeline()
+        pipe.get(bulk_seq_key(bulk_id))
+        pipe.lrange(bulk_log_key(bulk_id), 0, -1)
+        current, entries = await pipe.execute()
+    except redis.RedisError:
+        return None
+
+    current = int(current or 0)
+    if current == after_seq:
+        return []
+    if current < after_seq:
+        # Séquence réinitialisée (clés expirées) : l'identifiant client est périmé
+        return None
+
+    missed = sorted(
+        (event for event in map(json.loads, entries) if event['seq'] > after_seq),
+        key=lambda event: event['seq']
+    )
+    if not missed or missed[0]['seq'] != after_seq + 1:
+        return None
+    return missed
+
+
+async def subscribe_bulk(bulk_id):
+    """
+    Ouvre un abonnement asynchrone au canal du bulk (connexion dédiée prise dans le pool).
+    Retourne None si Redis est indisponible (l'appelant repasse alors en polling).
+    """
+    try:
+        pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(bulk_channel(bulk_id))
+        return pubsub
+    except redis.RedisError as e:
+        logger.warning(f"Abonnement aux événements de {bulk_id} impossible: {e}")
+        return None
+
+
+async def close_subscription(pubsub):
+    """Ferme l'abonnement et libère sa connexion Redis."""
+    if pubsub is None:
+        return
+    try:
+        await pubsub.aclose()
+    except redis.RedisError:
+        pass
+
+
+class ChannelHub:
+    """
+    Mutualise un abonnement Redis par canal entre tous les flux SSE d'un
+    processus : chaque message reçu est redistribué aux files asyncio des
+    abonnés locaux. Le coût côté Redis croît avec le nombre de canaux écoutés
+    (organisations), pas avec le nombre de connexions navigateur.
+    """
+
+    def __init__(self):
+        self._queues = {}
+        self._readers = {}
+        self._subscribed = set()
+
+    def add(self, channel, queue):
+        self._queues.setdefault(channel, set()).add(queue)
+        if channel not in self._readers:
+            self._readers[channel] = asyncio.ensure_future(self._read(channel))
+        elif channel in self._subscribed:
+            # Abonnement déjà actif : le nouvel abonné peut lire son état initial
+            queue.put_nowait({})
+
+    def remove(self, channel, queue):
+        queues = self._queues.get(channel)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._queues[channel]
+            self._subscribed.discard(channel)
+            self._readers.pop(channel).cancel()
+
+    def _dispatch(self, channel, payload):
+        for queue in self._queues.get(channel, ()):
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # Abonné trop lent : il se resynchronisera sur la base
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({})
+
+    async def _read(self, channel):
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(channel)
+                self._subscribed.add(channel)
+                # Les abonnés lisent leur état initial (ou ce qu'ils ont manqué
+                # pendant une reconnexion) une fois l'abonnement actif
+                self._dispatch(channel, {})
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        self._dispatch(channel, json.loads(message['data']))
+            except redis.RedisError as e:
+                logger.warning(f"Abonnement au canal {channel} perdu: {e}")
+                self._subscribed.discard(channel)
+                # Redis indisponible : les abonnés repassent en polling
+                self._dispatch(channel, {})
+                await asyncio.sleep(1)
+            finally:
+                await close_subscription(pubsub)
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+@asynccontextmanager
+async def listen_channel(channel, maxsize=1000):
+    """
+    Écoute un canal via le hub du processus.
+    Produit une file asyncio recevant les payloads décodés ; un dict vide
+    signale que l'abonné doit (re)lire son état sur la base de données. Un
+    premier dict vide est toujours reçu une fois l'abonnement actif.
+    """
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = ChannelHub()
+    queue = asyncio.Queue(maxsize=maxsize)
+    hub.add(channel, queue)
+    try:
+        yield queue
+    finally:
+        hub.remove(channel, queue)
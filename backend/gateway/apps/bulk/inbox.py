@@ -0,0 +1,138 @@
+"""
+Ingestion des callbacks de transfert par micro-lots.
+
+Le endpoint PUT /transfers/<transfer_id> se contente d'insérer le callback
+dans CallbackInbox et de réveiller le consommateur. Le consommateur (tâche
+Celery) applique les callbacks en attente par lots, avec le règlement
+ensembliste de services.settle_transfers.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from opentelemetry import trace
+
+from apps.monitoring.metrics import CALLBACK_BATCH_SECONDS, CALLBACK_LAG_SECONDS, CALLBACK_OUTCOMES, observe
+from apps.monitoring.tracing import extract_context, get_tracer, inject_context, link_to, tracing_enabled
+
+from .events import get_redis
+from .models import CallbackInbox, IndividualTransfer
+from .services import settle_transfers
+
+logger = logging.getLogger(__name__)
+
+NUDGE_KEY = 'callback-inbox:nudge'
+
+
+def enqueue_callback(transfer_id, data):
+    """Insère un callback dans la file et réveille le consommateur."""
+    CallbackInbox.objects.create(transfer_id=transfer_id, payload=data, trace_context=inject_context())
+    nudge_consumer()
+
+
+def nudge_consumer():
+    """
+    Planifie le consommateur, au plus une fois par CALLBACK_NUDGE_SECONDS :
+    les callbacks arrivés entre-temps sont traités dans le même lot. La tâche
+    périodique (celery beat) rattrape les réveils perdus.
+    """
+    try:
+        if get_redis().set(NUDGE_KEY, 1, nx=True, ex=settings.CALLBACK_NUDGE_SECONDS):
+            from .tasks import process_callback_inbox
+            process_callback_inbox.apply_async(countdown=settings.CALLBACK_NUDGE_SECONDS)
+    except Exception as e:
+        logger.warning(f"Réveil du consommateur de callbacks impossible: {e}")
+
+
+def apply_callbacks(entries):
+    """
+    Applique un lot de callbacks et renseigne l'issue de chacun (sans sauvegarder
+    les entrées). Le lot est réglé dans un point de sauvegarde ; s'il échoue, ses
+    callbacks sont réappliqués un par un et ceux qui échouent encore sont marqués
+    ERROR : un callback invalide ne bloque pas la file.
+    """
+    try:
+        with transaction.atomic():
+            outcomes = settle_transfers([(entry.transfer_id, entry.payload) for entry in entries])
+    except Exception:
+        logger.exception(f"Échec du règlement d'un lot de {len(entries)} callbacks, règlement un par un")
+    else:
+        for entry, outcome in zip(entries, outcomes):
+            entry.outcome = outcome
+        return
+    for entry in entries:
+        try:
+            with transaction.atomic():
+                [entry.outcome] = settle_transfers([(entry.transfer_id, entry.payload)])
+        except Exception:
+            logger.exception(f"Callback {entry.id} du transfert {entry.transfer_id} en erreur")
+            entry.outcome = 'ERROR'
+
+
+def _ns(moment):
+    return int(moment.timestamp() * 1e9)
+
+
+def trace_callbacks(entries, started_at, finished_at):
+    """
+    Trace les callbacks d'un lot appliqué. Chaque callback donne un span
+    `transfer.callback`, enfant du span d'envoi du transfert (même trace que le
+    dépôt du CSV) et lié à la requête PUT reçue. Il couvre la réception →
+    règlement, avec un enfant `transfer.settle` pour l'application du lot :
+    l'écart entre l'envoi et la réception est le temps passé côté hub.
+    """
+    if not tracing_enabled():
+        return
+    transfers = dict(
+        IndividualTransfer.objects.filter(transfer_id__in=[entry.transfer_id for entry in entries])
+        .values_list('transfer_id', 'trace_context')
+    )
+    tracer = get_tracer()
+    for entry in entries:
+        span = tracer.start_span(
+            'transfer.callback',
+            context=extract_context(transfers.get(entry.transfer_id) or entry.trace_context),
+            links=link_to(entry.trace_context),
+            start_time=_ns(entry.received_at),
+            attributes={'transfer_id': entry.transfer_id, 'outcome': entry.outcome},
+        )
+        settle = tracer.start_span(
+            'transfer.settle', context=trace.set_span_in_context(span), start_time=_ns(started_at),
+            attributes={'transfer_id': entry.transfer_id, 'batch_size': len(entries)},
+        )
+        settle.end(end_time=_ns(finished_at))
+        span.end(end_time=_ns(finished_at))
+
+
+def process_inbox(batch_size=None):
+    """
+    Applique les callbacks en attente par lots jusqu'à épuisement de la file.
+    Plusieurs consommateurs peuvent tourner en parallèle : chaque lot est
+    réservé avec skip_locked.
+
+    Returns:
+        int: Nombre de callbacks traités
+    """
+    batch_size = batch_size or settings.CALLBACK_BATCH_SIZE
+    processed = 0
+    while True:
+        with transaction.atomic():
+            entries = list(
+                CallbackInbox.objects.select_for_update(skip_locked=True)
+                .filter(processed_at__isnull=True)
+                .order_by('id')[:batch_size]
+            )
+            if not entries:
+                return processed
+            started_at = timezone.now()
+            with observe(CALLBACK_BATCH_SECONDS):
+                apply_callbacks(entries)
+            now = timezone.now()
+            for entry in entries:
+                entry.processed_at = now
+                CALLBACK_OUTCOMES.labels(outcome=entry.outcome).inc()
+                CALLBACK_LAG_SECONDS.observe((now - entry.received_at).total_seconds())
+            CallbackInbox.objects.bulk_update(entries, ['processed_at', 'outcome'], batch_size=500)
+        trace_callbacks(entries, started_at, now)
+        processed += len(entries)
@@ -0,0 +1,243 @@
+"""
+Soldes et réservations des comptes : journal en partie double et sous-compteurs.
+
+Les règlements n'écrivent jamais sur les lignes Account :
+- chaque transfert réglé ajoute une paire DEBIT/CREDIT au journal
+  (JournalEntry, insertion seule, par lots) ; le solde d'un compte est
+  Account.balance (solde d'ouverture) + son BalanceSnapshot + les écritures
+  pas encore intégrées au snapshot, et une tâche périodique avance les
+  snapshots ;
+- les libérations de réservation sont écrites dans l'une des
+  ACCOUNT_SHARD_COUNT lignes AccountShard du compte, choisie au hasard, puis
+  reportées périodiquement sur Account (fold).
+
+Les écritures sur la ligne Account elle-même (réservation à la création d'un
+bulk, fold) sont optimistes : UPDATE conditionnel sur Account.version avec des
+expressions F(), relancé un nombre borné de fois en cas de conflit, sans
+verrou de ligne tenu entre la lecture et l'écriture.
+"""
+import random
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Account, AccountShard, BalanceSnapshot, JournalEntry
+
+
+class AccountUpdateConflict(Exception):
+    """Le compte a été modifié concurremment à chaque tentative de mise à jour."""
+
+
+def update_account(account_id, build_changes):
+    """
+    Met à jour la ligne Account par UPDATE conditionnel sur sa version.
+
+    Args:
+        account_id: Clé primaire du compte
+        build_changes: Fonction recevant le compte relu et retournant les
+            changements à appliquer (expressions F() de préférence), ou None
+            pour renoncer à la mise à jour
+
+    Returns:
+        bool: True si la mise à jour a été appliquée, False si build_changes y a renoncé
+
+    Raises:
+        AccountUpdateConflict: Après ACCOUNT_UPDATE_RETRIES conflits de version
+    """
+    for attempt in range(settings.ACCOUNT_UPDATE_RETRIES):
+        account = Account.objects.get(pk=account_id)
+        changes = build_changes(account)
+        if changes is None:
+            return False
+        updated = Account.objects.filter(pk=account_id, version=account.version).update(
+            version=F('version') + 1,
+            **changes
+        )
+        if updated:
+            return True
+        # Conflit : courte attente aléatoire pour désynchroniser les écrivains
+        time.sleep(random.uniform(0, 0.005 * (attempt + 1)))
+    raise AccountUpdateConflict(f"Compte {account_id} modifié concurremment")
+
+
+def reserve_funds(account_id, amount):
+    """
+    Réserve un montant sur un compte si le solde disponible le permet.
+    Le contrôle du disponible et la réservation sont atomiques : une réservation
+    concurrente change la version du compte et provoque une nouvelle tentative.
+
+    Returns:
+        bool: True si les fonds ont été réservés, False si le disponible est insuffisant
+    """
+    def build_changes(account):
+        if account.available() < amount:
+            return None
+        return {'reserved': F('reserved') + amount}
+
+    return update_account(account_id, build_changes)
+
+
+def adjust_reserved(account_id, amount):
+    """
+    Applique une variation au montant réservé d'un compte.
+
+    Args:
+        account_id: Clé primaire du compte
+        amount: Variation (unités mineures, négative pour libérer une réservation)
+    """
+    if not amount:
+        return
+    shard = random.randrange(settings.ACCOUNT_SHARD_COUNT)
+    change = {'reserved_delta': F('reserved_delta') + amount}
+    updated = AccountShard.objects.filter(account_id=account_id, shard=shard).update(**change)
+    if not updated:
+        # Sous-compteur créé à la première utilisation
+        AccountShard.objects.bulk_create(
+            [AccountShard(account_id=account_id, shard=shard)],
+            ignore_conflicts=True
+        )
+        AccountShard.objects.filter(account_id=account_id, shard=shard).update(**change)
+
+
+def journal_transfers(settlements):
+    """
+    Inscrit au journal la paire débit/crédit de transferts réglés (insertions par lots).
+    Un transfert déjà journalisé est ignoré.
+
+    Args:
+        settlements: Itérable de tuples (transfer_pk, payer_account_id, payee_account_id, amount)
+    """
+    entries = []
+    for transfer_pk, payer_id, payee_id, amount in settlements:
+        entries.append(JournalEntry(transfer_id=transfer_pk, account_id=payer_id, entry_type='DEBIT', amount=-amount))
+        entries.append(JournalEntry(transfer_id=transfer_pk, account_id=payee_id, entry_type='CREDIT', amount=amount))
+    JournalEntry.objects.bulk_create(entries, batch_size=500, ignore_conflicts=True)
+
+
+def account_balance(account):
+    """
+    Retourne le solde consolidé d'un compte (snapshot + queue du journal).
+    Snapshot et queue sont lus dans une seule requête : un snapshot avancé
+    entre deux lectures ne peut pas faire compter une écriture deux fois ni
+    l'omettre.
+    """
+    tail = (
+        JournalEntry.objects.filter(account_id=OuterRef('pk'), snapshotted=False)
+        .values('account_id').annotate(total=Sum('amount')).values('total')
+    )
+    totals = Account.objects.filter(pk=account.pk).values(
+        snapshot=Coalesce(Subquery(BalanceSnapshot.objects.filter(account_id=OuterRef('pk')).values('balance')[:1]), Value(0)),
+        tail=Coalesce(Subquery(tail[:1]), Value(0)),
+    ).get()
+    return account.balance + totals['snapshot'] + totals['tail']
+
+
+def account_totals(account):
+    """
+    Retourne le solde et le montant réservé consolidés d'un compte.
+
+    Returns:
+        tuple: (balance, reserved) en unités mineures
+    """
+    reserved = AccountShard.objects.filter(account_id=account.pk).aggregate(
+        total=Sum('reserved_delta')
+    )['total']
+    return account_balance(account), account.reserved + (reserved or 0)
+
+
+def fold_account(account_id):
+    """
+    Reporte les sous-compteurs d'un compte sur sa ligne Account et les remet à zéro.
+    Les sous-compteurs sont verrouillés le temps du report : les mouvements
+    concurrents attendent la fin de la transaction, aucun n'est perdu.
+    """
+    with transaction.atomic():
+        shards = list(
+            AccountShard.objects.select_for_update()
+            .filter(account_id=account_id)
+            .exclude(reserved_delta=0)
+        )
+        if not shards:
+            return
+        delta = sum(s.reserved_delta for s in shards)
+        update_account(account_id, lambda account: {'reserved': F('reserved') + delta})
+        AccountShard.objects.filter(pk__in=[s.pk for s in shards]).update(reserved_delta=0)
+
+
+def fold_all_accounts():
+    """Reporte les sous-compteurs de tous les comptes ayant des mouvements en attente."""
+    account_ids = (
+        AccountShard.objects.exclude(reserved_delta=0)
+        .values_list('account_id', flat=True)
+        .distinct()
+    )
+    folded = 0
+    for account_id in list(account_ids):
+        try:
+            fold_account(account_id)
+        except AccountUpdateConflict:
+            # Compte très sollicité : report au prochain passage
+            continue
+        folded += 1
+    return folded
+
+
+def snapshot_account(account_id, batch_size=None):
+    """
+    Intègre au snapshot d'un compte ses écritures non encore intégrées, par lots.
+
+    Le snapshot est verrouillé avant la lecture des écritures : deux passages
+    concurrents sur un même compte s'exécutent l'un après l'autre, et le second
+    ne relit que ce que le premier a laissé. Les écritures intégrées sont
+    marquées (snapshotted) dans la même transaction ; une écriture validée
+    après la lecture, même d'identifiant inférieur, reste dans la queue
+    jusqu'au passage suivant au lieu d'être dépassée.
+
+    Returns:
+        int: Nombre d'écritures intégrées
+    """
+    batch_size = batch_size or settings.BALANCE_SNAPSHOT_BATCH_SIZE
+    integrated = 0
+    while True:
+        with transaction.atomic():
+            snapshot, _ = BalanceSnapshot.objects.select_for_update().get_or_create(account_id=account_id)
+            entries = list(
+                JournalEntry.objects.filter(account_id=account_id, snapshotted=False)
+                .order_by('id').values_list('id', 'amount')[:batch_size]
+            )
+            if not entries:
+                return integrated
+            marked = JournalEntry.objects.filter(
+                pk__in=[pk for pk, _ in entries], snapshotted=False
+            ).update(snapshotted=True)
+            if marked != len(entries):
+                # Lot intégré entre-temps par un autre passage (verrou sans effet sous SQLite)
+                transaction.set_rollback(True)
+                return integrated
+            snapshot.balance += sum(amount for _, amount in entries)
+            snapshot.save(update_fields=['balance', 'taken_at'])
+        integrated += len(entries)
+        if len(entries) < batch_size:
+            return integrated
+
+
+def snapshot_balances():
+    """
+    Avance les snapshots de solde des comptes ayant des écritures non intégrées.
+
+    Returns:
+        int: Nombre de comptes dont le snapshot a avancé
+    """
+    account_ids = (
+        JournalEntry.objects.filter(snapshotted=False)
+        .values_list('account_id', flat=True)
+        .distinct()
+    )
+    advanced = 0
+    for account_id in list(account_ids):
+        if snapshot_account(account_id):
+            advanced += 1
+    return advanced
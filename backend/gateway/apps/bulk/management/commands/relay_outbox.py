@@ -0,0 +1,24 @@
+"""
+Relais de l'outbox : publie sur le broker Celery les tâches inscrites dans
+OutboxMessage (voir apps/bulk/outbox.py).
+"""
+from django.core.management.base import BaseCommand
+
+from apps.bulk.outbox import run_relay
+
+
+class Command(BaseCommand):
+    help = "Publie par lots les tâches Celery en attente dans l'outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Messages publiés par lot (défaut: OUTBOX_BATCH_SIZE)')
+        parser.add_argument('--poll', type=float, default=None, help='Attente maximale entre deux passages, en secondes (défaut: OUTBOX_POLL_SECONDS)')
+        parser.add_argument('--once', action='store_true', help="Vider la file puis s'arrêter")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Relais outbox démarré")
+        try:
+            run_relay(batch_size=options['batch_size'], poll_seconds=options['poll'], once=options['once'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write("Relais outbox arrêté")
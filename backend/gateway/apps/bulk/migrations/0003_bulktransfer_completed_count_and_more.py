@@ -0,0 +1,72 @@
+# Generated by Django 5.1.4 on 2026-10-19 06:25
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+FINAL_STATES = ('COMPLETED', 'FAILED', 'PARTIALLY_COMPLETED')
+
+
+def final_state(completed, failed):
+    if failed == 0:
+        return 'COMPLETED'
+    if completed == 0:
+        return 'FAILED'
+    return 'PARTIALLY_COMPLETED'
+
+
+def backfill_counters(apps, schema_editor):
+    """
+    Initialise les compteurs agrégés des bulks existants, ainsi que finished_at
+    des bulks déjà terminés (état final, ou plus aucun transfert en attente) :
+    sans lui, ils passeraient pour encore en cours.
+    """
+    BulkTransfer = apps.get_model('bulk', 'BulkTransfer')
+    bulks = BulkTransfer.objects.annotate(
+        n_total=Count('individuals'),
+        n_completed=Count('individuals', filter=Q(individuals__status='COMPLETED')),
+        n_failed=Count('individuals', filter=Q(individuals__status='FAILED')),
+        last_completed_at=Max('individuals__completed_at'),
+    )
+    for bulk in bulks.iterator():
+        fields = {
+            'transfers_count': bulk.n_total,
+            'completed_count': bulk.n_completed,
+            'failed_count': bulk.n_failed,
+        }
+        pending = bulk.n_total - bulk.n_completed - bulk.n_failed
+        if bulk.state in FINAL_STATES or (bulk.n_total and pending <= 0):
+            fields['finished_at'] = bulk.last_completed_at or bulk.created_at
+            if bulk.state not in FINAL_STATES:
+                fields['state'] = final_state(bulk.n_completed, bulk.n_failed)
+        BulkTransfer.objects.filter(pk=bulk.pk).update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulk', '0002_account_organization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulktransfer',
+            name='completed_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bulktransfer',
+            name='failed_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='bulktransfer',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bulktransfer',
+            name='transfers_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-19 06:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulk', '0003_bulktransfer_completed_count_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('balance_delta', models.BigIntegerField(default=0)),
+                ('reserved_delta', models.BigIntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='bulk.account')),
+            ],
+            options={
+                'unique_together': {('account', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.4 on 2026-10-19 06:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fold_balance_deltas(apps, schema_editor):
+    """Reporte sur Account les variations de solde encore portées par les sous-compteurs."""
+    Account = apps.get_model('bulk', 'Account')
+    AccountShard = apps.get_model('bulk', 'AccountShard')
+    for shard in AccountShard.objects.exclude(balance_delta=0).iterator():
+        Account.objects.filter(pk=shard.account_id).update(balance=F('balance') + shard.balance_delta)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulk', '0004_accountshard'),
+    ]
+
+    operations = [
+        migrations.RunPython(fold_balance_deltas, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='accountshard',
+            name='balance_delta',
+        ),
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.BigIntegerField(default=0)),
+                ('last_entry_id', models.BigIntegerField(default=0)),
+                ('taken_at', models.DateTimeField(auto_now=True)),
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshot', to='bulk.account')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JournalEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('DEBIT', 'Débit'), ('CREDIT', 'Crédit')], max_length=8)),
+                ('amount', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='journal_entries', to='bulk.account')),
+                ('transfer', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='journal_entries', to='bulk.individualtransfer')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'id'], name='bulk_journa_account_2e77d6_idx')],
+                'unique_together': {('transfer', 'entry_type')},
+            },
+        ),
+    ]
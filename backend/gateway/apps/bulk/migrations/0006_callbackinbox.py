@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-19 06:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulk', '0005_journalentry_balancesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallbackInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transfer_id', models.CharField(max_length=128)),
+                ('payload', models.JSONField(default=dict)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('outcome', models.CharField(blank=True, max_length=16)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['processed_at', 'id'], name='bulk_callba_process_f7a49d_idx')],
+            },
+        ),
+    ]
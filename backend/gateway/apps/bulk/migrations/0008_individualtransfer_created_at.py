@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-19 06:43
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_created_at(apps, schema_editor):
+    """Date les transferts existants à la création de leur bulk."""
+    BulkTransfer = apps.get_model('bulk', 'BulkTransfer')
+    IndividualTransfer = apps.get_model('bulk', 'IndividualTransfer')
+    IndividualTransfer.objects.filter(bulk__isnull=False).update(
+        created_at=Subquery(BulkTransfer.objects.filter(pk=OuterRef('bulk_id')).values('created_at')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulk', '0007_account_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='individualtransfer',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='individualtransfer',
+            index=models.Index(fields=['status', 'created_at'], name='bulk_indivi_status_8bff95_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 06:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulk', '0008_individualtransfer_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='individualtransfer',
+            name='dispatched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
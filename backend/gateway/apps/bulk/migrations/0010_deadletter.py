@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-19 06:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulk', '0009_individualtransfer_dispatched_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeadLetter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.TextField()),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('requeued_at', models.DateTimeField(blank=True, null=True)),
+                ('transfer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dead_letter', to='bulk.individualtransfer')),
+            ],
+        ),
+    ]
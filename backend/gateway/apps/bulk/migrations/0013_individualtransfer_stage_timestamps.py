@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-19 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulk', '0012_trace_context'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='individualtransfer',
+            name='payee_fsp',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='individualtransfer',
+            name='responded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-19 07:30
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def mark_snapshotted_entries(apps, schema_editor):
+    """Marque les écritures déjà intégrées aux snapshots (jusqu'à leur last_entry_id)."""
+    BalanceSnapshot = apps.get_model('bulk', 'BalanceSnapshot')
+    JournalEntry = apps.get_model('bulk', 'JournalEntry')
+    JournalEntry.objects.filter(
+        id__lte=Subquery(BalanceSnapshot.objects.filter(account_id=OuterRef('account_id')).values('last_entry_id')[:1])
+    ).update(snapshotted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulk', '0013_individualtransfer_stage_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journalentry',
+            name='snapshotted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_snapshotted_entries, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='balancesnapshot',
+            name='last_entry_id',
+        ),
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(condition=models.Q(('snapshotted', False)), fields=['account'], name='bulk_journal_unsnapshotted'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 07:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bulk', '0014_journalentry_snapshotted'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='individualtransfer',
+            name='dispatch_attempt',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
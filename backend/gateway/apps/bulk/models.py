@@ -12,6 +12,7 @@ class Account(models.Model):
     account_id = models.CharField(max_length=64, unique=True)
     balance = models.BigIntegerField(default=0)  # en unités mineures (centimes)
     reserved = models.BigIntegerField(default=0)  # montant réservé pour transferts en cours
+    version = models.PositiveIntegerField(default=0)  # incrémentée à chaque écriture (concurrence optimiste)
     organization = models.ForeignKey(
         'accounts.Organization',
         on_delete=models.CASCADE,
@@ -22,13 +23,36 @@ class Account(models.Model):
     )
 
     def available(self):
-        """Retourne le solde disponible après déduction des réservations."""
-        return self.balance - self.reserved
+        """
+        Retourne le solde disponible après déduction des réservations : solde
+        consolidé depuis le journal (voir ledger.py) moins les réservations,
+        sous-compteurs (AccountShard) non encore reportés compris.
+        """
+        from .ledger import account_totals
+        balance, reserved = account_totals(self)
+        return balance - reserved
 
     def __str__(self):
         return f"{self.account_id} ({self.party_id_type}:{self.party_identifier})"
 
 
+class AccountShard(models.Model):
+    """
+    Sous-compteur d'un compte : reçoit une partie des mouvements de réservation
+    pour répartir les écritures concurrentes sur plusieurs lignes.
+    Les variations sont reportées périodiquement sur Account (voir ledger.py).
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='shards')
+    shard = models.PositiveSmallIntegerField()
+    reserved_delta = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('account', 'shard')
+
+    def __str__(self):
+        return f"{self.account_id}#{self.shard}"
+
+
 class BulkTransfer(models.Model):
     """
     Représente un transfert groupé contenant plusieurs transferts individuels.
@@ -41,6 +65,17 @@ class BulkTransfer(models.Model):
     currency = models.CharField(max_length=8, default='XOF')
     state = models.CharField(max_length=32, default='PENDING')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Compteurs agrégés maintenus par les chemins de règlement (évite les COUNT à la lecture)
+    transfers_count = models.IntegerField(default=0)
+    completed_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    FINAL_STATES = ('COMPLETED', 'FAILED', 'PARTIALLY_COMPLETED')
+
+    def pending_count(self):
+        """Retourne le nombre de transferts individuels non encore terminés."""
+        return self.transfers_count - self.completed_count - self.failed_count
 
     def __str__(self):
         return f"{self.bulk_id} - {self.state}"
@@ -49,7 +84,8 @@ class BulkTransfer(models.Model):
 class IndividualTransfer(models.Model):
     """
     Représente un transfert individuel au sein d'un bulk transfer.
-    États possibles: PENDING, COMPLETED, FAILED
+    États possibles: PENDING, COMPLETED, FAILED, EXPIRED (resté PENDING au-delà
+    de RESERVATION_TTL_SECONDS, réservation libérée ; compté comme échec)
     """
     transfer_id = models.CharField(max_length=128, unique=True)
     bulk = models.ForeignKey(BulkTransfer, on_delete=models.CASCADE, related_name='individuals', null=True, blank=True)
@@ -63,6 +99,124 @@ class IndividualTransfer(models.Model):
     condition = models.CharField(max_length=256, blank=True, null=True)
     fulfilment = models.CharField(max_length=256, blank=True, null=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Horodatage des étapes : en file (created_at), envoi (dispatched_at, renseigné une fois l'envoi
+    # accepté par le scheme adapter), réponse du scheme adapter (responded_at), règlement (completed_at)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    responded_at = models.DateTimeField(null=True, blank=True)
+    payee_fsp = models.CharField(max_length=32, blank=True)  # FSP du bénéficiaire, selon la réponse du scheme adapter
+    trace_context = models.JSONField(default=dict, blank=True)  # contexte de trace de l'envoi, repris au callback
+    # Dernière tentative d'envoi réservée (0 : jamais envoyé). Un envoi réserve sa tentative par une mise
+    # à jour conditionnelle avant d'appeler le scheme adapter : un seul worker envoie chaque tentative
+    dispatch_attempt = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Recherche des transferts PENDING les plus anciens (expiration des réservations)
+        indexes = [models.Index(fields=['status', 'created_at'])]
 
     def __str__(self):
         return f"{self.transfer_id} - {self.status}"
+
+
+class JournalEntry(models.Model):
+    """
+    Écriture du journal en partie double, en insertion seule.
+    Chaque transfert réglé produit une paire DEBIT (payeur, montant négatif) /
+    CREDIT (bénéficiaire, montant positif). snapshotted passe à True quand
+    l'écriture est intégrée au BalanceSnapshot de son compte (seul champ modifié).
+    """
+    ENTRY_TYPES = (('DEBIT', 'Débit'), ('CREDIT', 'Crédit'))
+
+    transfer = models.ForeignKey(IndividualTransfer, on_delete=models.PROTECT, related_name='journal_entries')
+    account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name='journal_entries')
+    entry_type = models.CharField(max_length=8, choices=ENTRY_TYPES)
+    amount = models.BigIntegerField()  # signé, en unités mineures
+    created_at = models.DateTimeField(auto_now_add=True)
+    snapshotted = models.BooleanField(default=False)
+
+    class Meta:
+        # Une seule paire par transfert : rejouer un règlement est sans effet
+        unique_together = ('transfer', 'entry_type')
+        indexes = [
+            models.Index(fields=['account', 'id']),
+            # Queue du journal : écritures pas encore intégrées au snapshot
+            models.Index(fields=['account'], condition=models.Q(snapshotted=False), name='bulk_journal_unsnapshotted'),
+        ]
+
+    def __str__(self):
+        return f"{self.entry_type} {self.amount} {self.account_id} ({self.transfer_id})"
+
+
+class BalanceSnapshot(models.Model):
+    """
+    Solde matérialisé d'un compte : somme des écritures du journal marquées
+    snapshotted. Le solde courant est Account.balance + snapshot + écritures
+    non encore intégrées (la « queue » du journal).
+    """
+    account = models.OneToOneField(Account, on_delete=models.CASCADE, related_name='balance_snapshot')
+    balance = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.account_id}: {self.balance}"
+
+
+class CallbackInbox(models.Model):
+    """
+    File durable des callbacks de transfert reçus du SDK scheme adapter.
+    Le callback est acquitté dès son insertion ; un consommateur Celery
+    l'applique ensuite par micro-lots (voir inbox.py).
+    Issues possibles: APPLIED, DUPLICATE, UNKNOWN, IGNORED, ERROR (callback invalide)
+    """
+    transfer_id = models.CharField(max_length=128)
+    payload = models.JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    outcome = models.CharField(max_length=16, blank=True)
+    trace_context = models.JSONField(default=dict, blank=True)  # contexte de trace de la requête reçue
+
+    class Meta:
+        indexes = [models.Index(fields=['processed_at', 'id'])]
+
+    def __str__(self):
+        return f"{self.transfer_id} - {self.outcome or 'PENDING'}"
+
+
+class DeadLetter(models.Model):
+    """
+    Transfert dont l'envoi au scheme adapter a définitivement échoué (erreur
+    permanente ou tentatives épuisées). Le transfert reste PENDING avec sa
+    réservation jusqu'à sa remise en file par un administrateur (ou son
+    expiration).
+    """
+    transfer = models.OneToOneField(IndividualTransfer, on_delete=models.CASCADE, related_name='dead_letter')
+    reason = models.TextField()
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    requeued_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.transfer_id} - {self.reason[:50]}"
+
+
+class OutboxMessage(models.Model):
+    """
+    Tâche Celery à publier, écrite dans la même transaction que les données
+    qui la motivent : elle n'est publiée que si la transaction est validée, et
+    l'est forcément ensuite, même si le broker était indisponible à ce moment.
+    Le relais (commande relay_outbox) publie les messages par lots.
+    """
+    task = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    headers = models.JSONField(default=dict, blank=True)  # en-têtes du message (contexte de trace)
+
+    class Meta:
+        indexes = [models.Index(fields=['published_at', 'id'])]
+
+    def __str__(self):
+        return f"{self.task}{tuple(self.args)} - {'PUBLISHED' if self.published_at else 'PENDING'}"
@@ -0,0 +1,155 @@
+"""
+Outbox transactionnel pour la publication des tâches Celery.
+
+Les chemins d'écriture n'appellent pas le broker : ils inscrivent la tâche
+dans OutboxMessage, dans la même transaction que les données qui la
+motivent (enqueue_task). Un processus relais (commande relay_outbox) publie
+les messages en attente par lots. Une tâche est donc publiée si et seulement
+si sa transaction a été validée, sans jamais ralentir la requête d'origine,
+même broker indisponible.
+
+La livraison est « au moins une fois » : un relais interrompu entre la
+publication et la validation republie le lot, et les deux exemplaires d'une
+tâche peuvent s'exécuter en même temps. Les tâches publiées par l'outbox
+doivent le supporter : orchestrate_bulk prend un bail exclusif sur le bulk
+(bulk_orchestration_lease) et réserve chaque envoi de transfert par une mise
+à jour conditionnelle (dispatch_attempt).
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.monitoring.tracing import inject_context
+
+from .events import get_redis
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+WAKE_KEY = 'outbox:wake'
+
+
+def enqueue_task(task, *args, **kwargs):
+    """
+    Inscrit une tâche Celery dans l'outbox. À appeler dans la transaction
+    métier : le message disparaît avec elle en cas d'annulation. Le contexte
+    de trace courant est conservé et transmis à la tâche.
+
+    Args:
+        task: Tâche Celery ou nom complet de la tâche
+        args, kwargs: Arguments de la tâche (sérialisables en JSON)
+    """
+    OutboxMessage.objects.create(
+        task=getattr(task, 'name', task), args=list(args), kwargs=kwargs,
+        headers=inject_context()
+    )
+    transaction.on_commit(wake_relay)
+
+
+def wake_relay():
+    """Réveille le relais sans attendre son prochain passage (sans effet si Redis est indisponible)."""
+    try:
+        pipe = get_redis().pipeline()
+        pipe.rpush(WAKE_KEY, 1)
+        pipe.ltrim(WAKE_KEY, -1, -1)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"Réveil du relais outbox impossible: {e}")
+
+
+def wait_for_wake(timeout):
+    """Attend un réveil du relais pendant au plus timeout secondes."""
+    try:
+        get_redis().blpop(WAKE_KEY, timeout=max(1, int(timeout)))
+    except Exception:
+        time.sleep(timeout)
+
+
+def relay_batch(batch_size=None):
+    """
+    Publie un lot de messages en attente, dans l'ordre d'inscription.
+    Plusieurs relais peuvent tourner en parallèle : chaque lot est réservé avec
+    skip_locked. À la première erreur du broker, le reste du lot est laissé
+    pour le passage suivant.
+
+    Returns:
+        tuple: (publiés, échec) — nombre de messages publiés, et True si le
+            broker a refusé un message
+    """
+    from gateway.celery import app
+
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(published_at__isnull=True)
+            .order_by('id')[:batch_size]
+        )
+        if not messages:
+            return 0, False
+
+        published, failed = [], False
+        now = timezone.now()
+        # Une seule connexion au broker pour tout le lot
+        with app.producer_or_acquire() as producer:
+            for message in messages:
+                message.attempts += 1
+                try:
+                    app.send_task(
+                        message.task, args=message.args, kwargs=message.kwargs,
+                        headers=message.headers, producer=producer, retry=False
+                    )
+                except Exception as e:
+                    message.last_error = str(e)
+                    failed = True
+                    logger.warning(f"Publication de {message.task} (outbox {message.pk}) impossible: {e}")
+                    break
+                message.published_at = now
+                message.last_error = ''
+                published.append(message)
+
+        attempted = published + ([message] if failed else [])
+        OutboxMessage.objects.bulk_update(attempted, ['published_at', 'attempts', 'last_error'], batch_size=500)
+    return len(published), failed
+
+
+def purge_published(retention_seconds=None):
+    """Supprime les messages publiés depuis plus de OUTBOX_RETENTION_SECONDS."""
+    retention_seconds = retention_seconds or settings.OUTBOX_RETENTION_SECONDS
+    cutoff = timezone.now() - timedelta(seconds=retention_seconds)
+    deleted, _ = OutboxMessage.objects.filter(published_at__lt=cutoff).delete()
+    return deleted
+
+
+def run_relay(batch_size=None, poll_seconds=None, once=False):
+    """
+    Boucle du relais : publie les lots tant qu'il en reste, puis attend un
+    réveil (ou poll_seconds au plus). Après un échec du broker, l'attente
+    double jusqu'à OUTBOX_MAX_BACKOFF_SECONDS. Avec once, s'arrête dès que
+    la file est vide (ou au premier échec).
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    poll_seconds = poll_seconds or settings.OUTBOX_POLL_SECONDS
+    backoff = poll_seconds
+    last_purge = 0
+    while True:
+        published, failed = relay_batch(batch_size)
+        if failed:
+            if once:
+                return
+            time.sleep(backoff)
+            backoff = min(backoff * 2, settings.OUTBOX_MAX_BACKOFF_SECONDS)
+            continue
+        backoff = poll_seconds
+        if published == batch_size:
+            continue
+        if once:
+            return
+        if time.monotonic() - last_purge > settings.OUTBOX_RETENTION_SECONDS / 10:
+            purge_published()
+            last_purge = time.monotonic()
+        wait_for_wake(poll_seconds)
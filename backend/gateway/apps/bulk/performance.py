@@ -0,0 +1,166 @@
+"""
+Rapport de performance d'un bulk transfer, pour la planification de capacité.
+
+Chaque transfert individuel porte l'horodatage de ses étapes : mise en file
+(created_at), envoi au scheme adapter (dispatched_at), réponse du scheme
+adapter (responded_at) et règlement (completed_at). Le rapport en tire :
+- la chronologie du bulk (premier / dernier envoi, premier / dernier règlement) ;
+- le débit (transferts envoyés et réglés par seconde), global et par
+  intervalle de temps ;
+- les percentiles de latence de chaque étape ;
+- les FSP bénéficiaires les plus lents.
+
+Les horodatages sont lus en une requête (values_list) et agrégés en Python :
+les percentiles ne sont pas calculables en SQL de façon portable
+(SQLite / PostgreSQL).
+"""
+import math
+from collections import defaultdict
+
+PERCENTILES = (50, 90, 95, 99)
+# Nombre d'intervalles visé pour la chronologie du débit
+TIMELINE_BUCKETS = 60
+
+STAGES = {
+    # étape: (début, fin) — indices dans les lignes lues par bulk_performance
+    'queue_wait': (0, 1),      # en file → envoi
+    'adapter_response': (1, 2),  # envoi → réponse du scheme adapter
+    'settlement': (2, 3),      # réponse → règlement (callback)
+    'end_to_end': (0, 3),      # en file → règlement
+}
+
+
+def percentiles(values):
+    """Percentiles (rang le plus proche), minimum, maximum et moyenne de durées en secondes, en ms."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    summary = {'count': len(ordered)}
+    for p in PERCENTILES:
+        rank = max(1, math.ceil(p / 100 * len(ordered)))
+        summary[f"p{p}_ms"] = round(ordered[rank - 1] * 1000, 1)
+    summary['min_ms'] = round(ordered[0] * 1000, 1)
+    summary['max_ms'] = round(ordered[-1] * 1000, 1)
+    summary['mean_ms'] = round(sum(ordered) / len(ordered) * 1000, 1)
+    return summary
+
+
+def _elapsed(start, end):
+    return (end - start).total_seconds() if start and end else None
+
+
+def _bucket_seconds(start, end):
+    """Largeur d'intervalle (entière, en secondes) donnant au plus TIMELINE_BUCKETS intervalles."""
+    span = max(_elapsed(start, end) or 0, 1)
+    return max(1, math.ceil(span / TIMELINE_BUCKETS))
+
+
+def throughput_timeline(dispatched, settled, start, bucket_seconds):
+    """Transferts envoyés et réglés par intervalle de bucket_seconds depuis start."""
+    buckets = defaultdict(lambda: [0, 0])
+    for index, moments in enumerate((dispatched, settled)):
+        for moment in moments:
+            buckets[int(_elapsed(start, moment) // bucket_seconds)][index] += 1
+    return [
+        {
+            'offset_seconds': bucket * bucket_seconds,
+            'dispatched': counts[0],
+            'settled': counts[1],
+            'dispatched_per_second': round(counts[0] / bucket_seconds, 2),
+            'settled_per_second': round(counts[1] / bucket_seconds, 2),
+        }
+        for bucket, counts in sorted(buckets.items())
+    ]
+
+
+def _rate(count, start, end):
+    elapsed = _elapsed(start, end)
+    return round(count / elapsed, 2) if count and elapsed else None
+
+
+def bulk_performance(bulk, fsp_limit=10):
+    """
+    Construit le rapport de performance d'un bulk.
+
+    Args:
+        bulk: Instance BulkTransfer
+        fsp_limit: Nombre de FSP bénéficiaires retenus (les plus lents d'abord)
+
+    Returns:
+        dict: Rapport sérialisable en JSON
+    """
+    rows = list(bulk.individuals.values_list(
+        'created_at', 'dispatched_at', 'responded_at', 'completed_at', 'status', 'payee_fsp'
+    ))
+
+    status_counts = defaultdict(int)
+    stage_durations = {stage: [] for stage in STAGES}
+    per_fsp = defaultdict(lambda: {'durations': [], 'settled': 0, 'failed': 0})
+    dispatched, settled = [], []
+    for row in rows:
+        status = row[4]
+        status_counts[status] += 1
+        if row[1]:
+            dispatched.append(row[1])
+        completed = status == 'COMPLETED' and row[3] is not None
+        if completed:
+            settled.append(row[3])
+        for stage, (start, end) in STAGES.items():
+            # Les étapes menant au règlement ne comptent que les transferts réglés
+            if end == 3 and not completed:
+                continue
+            duration = _elapsed(row[start], row[end])
+            if duration is not None:
+                stage_durations[stage].append(duration)
+
+        fsp = per_fsp[row[5] or 'unknown']
+        if completed:
+            fsp['settled'] += 1
+            duration = _elapsed(row[1], row[3])
+            if duration is not None:
+                fsp['durations'].append(duration)
+        elif status != 'PENDING':
+            fsp['failed'] += 1
+
+    start = bulk.created_at
+    end = max(settled + dispatched, default=None)
+    if bulk.finished_at and (end is None or bulk.finished_at > end):
+        end = bulk.finished_at
+    bucket_seconds = _bucket_seconds(start, end)
+
+    fsps = []
+    for name, fsp in per_fsp.items():
+        latency = percentiles(fsp['durations'])
+        fsps.append({
+            'payee_fsp': name,
+            'settled': fsp['settled'],
+            'failed': fsp['failed'],
+            # Envoi → règlement : temps passé hors de la gateway (scheme adapter, hub, FSP)
+            'latency': latency,
+        })
+    fsps.sort(key=lambda f: f['latency']['p95_ms'] if f['latency'] else -1, reverse=True)
+
+    return {
+        'bulkTransferId': bulk.bulk_id,
+        'state': bulk.state,
+        'transfers': len(rows),
+        'statuses': dict(status_counts),
+        'timeline': {
+            'created_at': start.isoformat() if start else None,
+            'first_dispatched_at': min(dispatched).isoformat() if dispatched else None,
+            'last_dispatched_at': max(dispatched).isoformat() if dispatched else None,
+            'first_settled_at': min(settled).isoformat() if settled else None,
+            'last_settled_at': max(settled).isoformat() if settled else None,
+            'finished_at': bulk.finished_at.isoformat() if bulk.finished_at else None,
+            'duration_seconds': _elapsed(start, end),
+        },
+        'throughput': {
+            'dispatched_per_second': _rate(len(dispatched), min(dispatched, default=None), max(dispatched, default=None)),
+            'settled_per_second': _rate(len(settled), min(settled, default=None), max(settled, default=None)),
+            'overall_per_second': _rate(len(settled), start, end),
+            'bucket_seconds': bucket_seconds,
+            'buckets': throughput_timeline(dispatched, settled, start, bucket_seconds) if start else [],
+        },
+        'latency': {stage: percentiles(durations) for stage, durations in stage_durations.items()},
+        'slowest_payee_fsps': fsps[:fsp_limit],
+    }
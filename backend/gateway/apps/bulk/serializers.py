@@ -68,6 +68,17 @@ class BulkCallbackRequestSerializer(serializers.Serializer):
     individualTransferResults = IndividualTransferResultSerializer(many=True)
 
 
+class IndividualTransferOutcomeSerializer(serializers.Serializer):
+    transferId = serializers.CharField()
+    outcome = serializers.ChoiceField(choices=['APPLIED', 'DUPLICATE', 'UNKNOWN', 'IGNORED'])
+
+
+class BulkCallbackResponseSerializer(serializers.Serializer):
+    bulkTransferId = serializers.CharField()
+    state = serializers.CharField()
+    individualTransferResults = IndividualTransferOutcomeSerializer(many=True)
+
+
 class PartyResponseSerializer(serializers.Serializer):
     partyIdInfo = serializers.DictField()
     accounts = serializers.ListField(child=serializers.DictField())
@@ -0,0 +1,288 @@
+"""
+Services métier des bulk transfers : compteurs agrégés et finalisation.
+
+Les chemins de règlement (orchestration, callbacks) enregistrent ici les
+issues des transferts individuels ; les callbacks sont réglés par lots
+(settle_transfers) et les transferts restés sans réponse expirent
+(expire_stale_transfers). Les compteurs du BulkTransfer sont mis à
+jour avec des expressions F(), l'état final est posé une seule fois, et un
+instantané de progression est publié pour les flux SSE et le long-poll.
+"""
+import base64
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .events import publish_bulk_event
+from .ledger import adjust_reserved, journal_transfers
+from .models import Account, BulkTransfer, DeadLetter, IndividualTransfer
+
+SETTLED_STATES = ('COMMITTED', 'COMPLETED')
+
+
+def final_state(completed, failed):
+    """Détermine l'état final d'un bulk dont tous les transferts sont terminés."""
+    if failed == 0:
+        return 'COMPLETED'
+    if completed == 0:
+        return 'FAILED'
+    return 'PARTIALLY_COMPLETED'
+
+
+def bulk_snapshot(bulk):
+    """
+    Construit l'instantané de progression diffusé aux clients à partir des compteurs.
+    Tant que le bulk n'est pas terminé, l'état exposé est PROCESSING.
+    """
+    total = bulk.transfers_count
+    completed = bulk.completed_count
+    failed = bulk.failed_count
+    return {
+        'bulkTransferId': bulk.bulk_id,
+        'state': bulk.state if bulk.state in BulkTransfer.FINAL_STATES else 'PROCESSING',
+        'total': total,
+        'completed': completed,
+        'failed': failed,
+        'pending': bulk.pending_count(),
+        'progress_percent': round((completed + failed) / total * 100, 2) if total > 0 else 0,
+    }
+
+
+def publish_snapshot(bulk):
+    """Publie l'instantané courant du bulk sur son canal et sur celui de son organisation."""
+    publish_bulk_event(
+        bulk.bulk_id,
+        'progress',
+        organization_id=bulk.payer_account.organization_id,
+        snapshot=bulk_snapshot(bulk),
+        finished=bulk.finished_at is not None,
+    )
+
+
+def record_outcomes(bulk, completed=0, failed=0):
+    """
+    Enregistre des transferts terminés pour un bulk et le finalise si besoin.
+
+    Args:
+        bulk: Instance BulkTransfer (ses compteurs sont rafraîchis en place)
+        completed: Nombre de transferts passés à COMPLETED
+        failed: Nombre de transferts passés à FAILED
+
+    Returns:
+        bool: True si cet appel a fait passer le bulk dans un état final
+    """
+    if completed or failed:
+        BulkTransfer.objects.filter(pk=bulk.pk).update(
+            completed_count=F('completed_count') + completed,
+            failed_count=F('failed_count') + failed,
+        )
+    bulk.refresh_from_db(fields=['state', 'transfers_count', 'completed_count', 'failed_count', 'finished_at'])
+
+    finished_now = False
+    if bulk.finished_at is None and bulk.pending_count() <= 0:
+        state = final_state(bulk.completed_count, bulk.failed_count)
+        now = timezone.now()
+        # Le filtre sur finished_at garantit qu'un seul chemin finalise le bulk
+        finished_now = BulkTransfer.objects.filter(pk=bulk.pk, finished_at__isnull=True).update(
+            state=state,
+            finished_at=now,
+        ) == 1
+        if finished_now:
+            bulk.state = state
+            bulk.finished_at = now
+
+    publish_snapshot(bulk)
+    return finished_now
+
+
+def _payee_accounts(transfers):
+    """
+    Retourne les comptes bénéficiaires des transferts, indexés par
+    (party_id_type, party_identifier), en créant ceux qui manquent (une requête
+    de lecture, une insertion groupée).
+    """
+    keys = {(t.payee_party_id_type, t.payee_party_identifier) for t in transfers}
+    accounts = {}
+    existing = Account.objects.filter(party_identifier__in={identifier for _, identifier in keys})
+    for account in existing:
+        key = (account.party_id_type, account.party_identifier)
+        if key in keys:
+            accounts.setdefault(key, account)
+
+    missing = keys - accounts.keys()
+    if missing:
+        Account.objects.bulk_create([
+            Account(
+                party_id_type=id_type,
+                party_identifier=identifier,
+                account_id=f"ACC-{uuid.uuid4().hex[:8]}",
+                balance=0
+            )
+            for id_type, identifier in missing
+        ])
+        for account in Account.objects.filter(party_identifier__in={identifier for _, identifier in missing}):
+            accounts.setdefault((account.party_id_type, account.party_identifier), account)
+    return accounts
+
+
+def settle_transfers(results, bulk=None):
+    """
+    Règle un lot de résultats de transferts en un nombre constant de requêtes.
+
+    Les transferts encore PENDING concernés sont verrouillés (select_for_update) :
+    un autre chemin de règlement concurrent attend la fin de la transaction puis
+    constate que le transfert n'est plus PENDING. Les transferts réglés sont
+    mis à jour par bulk_update, journalisés en une insertion groupée, et la
+    réservation du payeur comme les compteurs sont mis à jour une fois par bulk.
+    À appeler dans une transaction.
+
+    Args:
+        results: Liste de tuples (transfer_id, payload) ; le payload porte
+            currentState/transferState (COMPLETED par défaut) et fulfilment
+        bulk: Si fourni, seuls les transferts de ce bulk sont concernés
+
+    Returns:
+        list: Issue de chaque résultat, dans l'ordre : APPLIED, DUPLICATE
+            (déjà réglé), UNKNOWN (transfert inconnu) ou IGNORED (état non final)
+    """
+    transfer_ids = {transfer_id for transfer_id, _ in results}
+    scope = IndividualTransfer.objects.all() if bulk is None else IndividualTransfer.objects.filter(bulk=bulk)
+    transfers = {
+        t.transfer_id: t
+        for t in scope.select_for_update()
+        .filter(transfer_id__in=transfer_ids, status='PENDING')
+        .select_related('bulk')
+    }
+    known = set(
+        scope.filter(transfer_id__in=transfer_ids - transfers.keys()).values_list('transfer_id', flat=True)
+    )
+
+    now = timezone.now()
+    outcomes = []
+    settled = []
+    for transfer_id, payload in results:
+        it = transfers.get(transfer_id)
+        if it is None or it.status != 'PENDING':
+            # Déjà réglé (par un autre chemin ou plus haut dans ce lot) ou inconnu
+            outcomes.append('DUPLICATE' if it is not None or transfer_id in known else 'UNKNOWN')
+            continue
+        state = payload.get('currentState') or payload.get('transferState') or 'COMPLETED'
+        if state not in SETTLED_STATES:
+            outcomes.append('IGNORED')
+            continue
+        it.status = 'COMPLETED'
+        it.fulfilment = payload.get('fulfilment') or base64.b64encode(f"fulfil:{transfer_id}".encode()).decode()
+        it.completed_at = now
+        settled.append(it)
+        outcomes.append('APPLIED')
+
+    if not settled:
+        return outcomes
+
+    payees = _payee_accounts(settled)
+    for it in settled:
+        it.payee_account = payees[(it.payee_party_id_type, it.payee_party_identifier)]
+    IndividualTransfer.objects.bulk_update(
+        settled, ['status', 'fulfilment', 'completed_at', 'payee_account'], batch_size=500
+    )
+
+    by_bulk = defaultdict(list)
+    for it in settled:
+        if it.bulk is not None:
+            by_bulk[it.bulk_id].append(it)
+
+    # Débit payeur / crédit bénéficiaire : une insertion groupée pour tout le lot
+    journal_transfers(
+        (it.pk, it.bulk.payer_account_id, it.payee_account_id, it.amount)
+        for its in by_bulk.values() for it in its
+    )
+    # Une seule mise à jour de la réservation et des compteurs par bulk
+    for its in by_bulk.values():
+        owner = its[0].bulk
+        adjust_reserved(owner.payer_account_id, -sum(it.amount for it in its))
+        record_outcomes(owner, completed=len(its))
+    return outcomes
+
+
+def expire_stale_transfers(batch_size=None, max_batches=None):
+    """
+    Fait expirer les transferts restés PENDING au-delà de RESERVATION_TTL_SECONDS
+    et libère leurs réservations.
+
+    Les transferts sont trouvés par l'index (status, created_at), du plus ancien
+    au plus récent, et traités par lots de batch_size, au plus max_batches lots
+    par appel : le travail d'un passage est borné quelle que soit la taille de
+    la table. Par lot, la réservation du payeur et les compteurs sont mis à jour
+    une fois par bulk ; un transfert expiré compte comme échec.
+
+    Returns:
+        int: Nombre de transferts expirés
+    """
+    batch_size = batch_size or settings.RESERVATION_SWEEP_BATCH_SIZE
+    max_batches = max_batches or settings.RESERVATION_SWEEP_MAX_BATCHES
+    cutoff = timezone.now() - timedelta(seconds=settings.RESERVATION_TTL_SECONDS)
+    expired = 0
+    for _ in range(max_batches):
+        with transaction.atomic():
+            ids = list(
+                IndividualTransfer.objects.select_for_update(skip_locked=True)
+                .filter(status='PENDING', created_at__lt=cutoff, bulk__isnull=False)
+                .order_by('created_at')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            IndividualTransfer.objects.filter(pk__in=ids).update(status='EXPIRED', completed_at=timezone.now())
+
+            per_bulk = (
+                IndividualTransfer.objects.filter(pk__in=ids)
+                .values('bulk_id')
+                .annotate(count=Count('pk'), amount=Sum('amount'))
+            )
+            bulks = BulkTransfer.objects.select_related('payer_account').in_bulk(
+                [row['bulk_id'] for row in per_bulk]
+            )
+            for row in per_bulk:
+                bulk = bulks[row['bulk_id']]
+                adjust_reserved(bulk.payer_account_id, -row['amount'])
+                record_outcomes(bulk, failed=row['count'])
+        expired += len(ids)
+        if len(ids) < batch_size:
+            break
+    return expired
+
+
+def dead_letter_transfer(transfer, reason, attempts):
+    """Place un transfert dont l'envoi a définitivement échoué dans la file des lettres mortes."""
+    DeadLetter.objects.update_or_create(
+        transfer=transfer,
+        defaults={'reason': reason, 'attempts': attempts, 'requeued_at': None},
+    )
+
+
+def requeue_dead_letters(dead_letters):
+    """
+    Remet en file les transferts de lettres mortes encore PENDING : chacun
+    repart pour un cycle complet de tentatives, étalées par le backoff.
+
+    Args:
+        dead_letters: QuerySet de DeadLetter non encore remises en file
+
+    Returns:
+        tuple: (transfer_ids remis en file, transfer_ids ignorés car plus PENDING)
+    """
+    from .tasks import schedule_transfer_retry
+
+    rows = list(dead_letters.filter(requeued_at__isnull=True).values_list('pk', 'transfer_id', 'transfer__transfer_id', 'transfer__status'))
+    requeued = [row for row in rows if row[3] == 'PENDING']
+    DeadLetter.objects.filter(pk__in=[row[0] for row in requeued]).update(requeued_at=timezone.now())
+    # Nouveau cycle : les tentatives repartent de 1 (voir tasks.dispatch_transfer)
+    IndividualTransfer.objects.filter(pk__in=[row[1] for row in requeued], status='PENDING').update(dispatch_attempt=0)
+    for _, transfer_pk, _, _ in requeued:
+        schedule_transfer_retry(transfer_pk, 1)
+    return [row[2] for row in requeued], [row[2] for row in rows if row[3] != 'PENDING']
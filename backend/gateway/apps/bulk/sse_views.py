@@ -1,86 +1,239 @@
 """
 Server-Sent Events (SSE) endpoint for real-time bulk transfer status updates.
 """
+import asyncio
 import json
 import time
-from django.http import StreamingHttpResponse, JsonResponse
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse, JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from .models import BulkTransfer, IndividualTransfer
+from .events import (
+    subscribe_bulk, close_subscription, listen_channel, organization_channel,
+    current_bulk_seq, bulk_events_since,
+)
+from .services import bulk_snapshot
+from apps.accounts.authentication import authenticate_async
+from apps.monitoring.metrics import SSE_EVENTS, SSE_STREAMS
+from apps.monitoring.profiling import exclude_from_slow_log
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 
 
-def event_stream(bulk_id):
+def load_bulk_snapshot(bulk_id):
     """
-    Generator that yields SSE events for bulk transfer status.
-    Polls the database and sends updates when state changes.
-    Stops when bulk reaches a final state (COMPLETED, FAILED, PARTIALLY_COMPLETED).
+    Read the bulk's precomputed counters and return the SSE payload (one query).
+    Synchronous: called from the async stream through sync_to_async.
     """
-    last_state = None
-    last_completed_count = 0
-    
+    return bulk_snapshot(BulkTransfer.objects.get(bulk_id=bulk_id))
+
+
+async def next_event(pubsub, timeout):
+    """
+    Wait for the next message on the bulk channel without holding a thread.
+
+    Returns the decoded payload, None if the timeout expired, or an empty dict
+    when the caller has to resynchronise on the database (Redis unavailable).
+    """
+    if pubsub is None:
+        # Redis unavailable: degrade to the historical 1 second polling
+        await asyncio.sleep(1)
+        return {}
+
+    deadline = time.monotonic() + timeout
     while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
         try:
-            bulk = BulkTransfer.objects.get(bulk_id=bulk_id)
-            transfers = IndividualTransfer.objects.filter(bulk=bulk)
-            
-            completed = transfers.filter(status='COMPLETED').count()
-            failed = transfers.filter(status='FAILED').count()
-            pending = transfers.filter(status='PENDING').count()
-            total = transfers.count()
-            
-            # Determine bulk state
-            if pending == 0:
-                if failed == 0:
-                    current_state = 'COMPLETED'
-                elif completed == 0:
-                    current_state = 'FAILED'
-                else:
-                    current_state = 'PARTIALLY_COMPLETED'
-            else:
-                current_state = 'PROCESSING'
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+        except redis.RedisError:
+            # Connection lost: resynchronise on the database after a short pause
+            await asyncio.sleep(1)
+            return {}
+        if message and message['type'] == 'message':
+            return json.loads(message['data'])
+
+
+def asgi_required(request):
+    """
+    Error response when the request is not served through ASGI, else None.
+    The streams are async generators: under WSGI (runserver, gunicorn sync
+    workers) Django would collect them into a list before sending anything,
+    so a bulk stream would hang until the bulk finishes and the organization
+    stream forever.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        return None
+    return JsonResponse(
+        {'error': 'Le flux SSE nécessite le serveur ASGI (uvicorn gateway.asgi:application)'},
+        status=501
+    )
+
+
+def _format_event(seq, data):
+    """Format an SSE message, with its sequence ID when known."""
+    event_id = f"id: {seq}\n" if seq else ""
+    return f"{event_id}data: {json.dumps(data)}\n\n"
+
+
+class ProgressCoalescer:
+    """
+    Merge the progress snapshots of one subscriber into fewer SSE events.
+
+    A snapshot is sent once progress moved by at least `step_percent` since
+    the last sent one, or once `interval_ms` elapsed with a change pending
+    (0 disables that flush), and never more than `max_rate` times per second.
+    Only the latest pending snapshot is kept. The first snapshot and terminal
+    states are always sent immediately.
+    """
+
+    def __init__(self, max_rate, step_percent, interval_ms, clock=time.monotonic):
+        self.min_gap = 1 / max_rate if max_rate > 0 else 0
+        self.step = step_percent
+        self.interval = interval_ms / 1000
+        self.clock = clock
+        self.pending = None
+        self.sent = None
+        self.sent_at = None
+
+    @staticmethod
+    def _key(data):
+        return data['state'], data['completed'], data['failed']
+
+    def push(self, seq, data):
+        """Record a snapshot; it replaces any snapshot still pending."""
+        if self.pending is None and self.sent is not None and self._key(data) == self._key(self.sent):
+            return
+        self.pending = (seq, data)
+
+    def due_in(self):
+        """Seconds until the pending snapshot may be sent, or None if nothing can be sent."""
+        if self.pending is None:
+            return None
+        _, data = self.pending
+        if self.sent is None or data['state'] in BulkTransfer.FINAL_STATES:
+            return 0
+        due = self.sent_at + self.min_gap
+        if data['progress_percent'] - self.sent['progress_percent'] < self.step:
+            if not self.interval:
+                return None
+            due = max(due, self.sent_at + self.interval)
+        return max(0, due - self.clock())
+
+    def pop(self):
+        """Return the pending (seq, snapshot) if it is due, marking it as sent."""
+        if self.due_in() != 0:
+            return None
+        message, self.pending = self.pending, None
+        self.sent = message[1]
+        self.sent_at = self.clock()
+        return message
+
+
+async def event_stream(bulk_id, last_event_id=None, coalescer=None):
+    """
+    Async generator that yields SSE events for bulk transfer status.
+    Subscribes to the bulk's Redis channel: published events carry a progress
+    snapshot and a per-bulk sequence ID, sent as the SSE `id` field.
+    Stops when bulk reaches a final state (COMPLETED, FAILED, PARTIALLY_COMPLETED).
+
+    On reconnect (`last_event_id`), only the events missed since that ID are
+    replayed from the bulk's Redis event log; the database is read only when
+    the log no longer covers the gap. Heartbeats check the sequence counter
+    in Redis instead of the database.
+
+    Progress updates go through `coalescer` (a ProgressCoalescer), which
+    bounds the number of events sent on large bulks; terminal states are
+    sent as soon as they are known.
+
+    Served through ASGI, an idle stream costs a coroutine and a Redis
+    subscription instead of a blocked worker.
+    """
+    if coalescer is None:
+        coalescer = ProgressCoalescer(
+            settings.SSE_MAX_EVENTS_PER_SECOND,
+            settings.SSE_PROGRESS_STEP_PERCENT,
+            settings.SSE_PROGRESS_INTERVAL_MS,
+        )
+    last_seq = last_event_id or 0
+    heartbeat = settings.SSE_HEARTBEAT_SECONDS
+
+    # Subscribe before the first read so that no change can be missed in between
+    pubsub = await subscribe_bulk(bulk_id)
+    SSE_STREAMS.labels(stream='bulk').inc()
+    
+    try:
+        yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+        
+        batch = None
+        if last_event_id is not None:
+            batch = await bulk_events_since(bulk_id, last_event_id)
+        
+        while True:
+            if batch is None:
+                # No usable event log: start again from a database snapshot
+                seq = await current_bulk_seq(bulk_id)
+                batch = [{'seq': seq, 'snapshot': await sync_to_async(load_bulk_snapshot)(bulk_id)}]
+                # A stale client ID (expired log) must not hide the snapshot
+                last_seq = min(last_seq, seq - 1) if seq else last_seq
             
-            # Update bulk state if changed
-            if bulk.state != current_state:
-                bulk.state = current_state
-                bulk.save(update_fields=['state'])
+            for event in batch:
+                seq = event.get('seq', 0)
+                data = event.get('snapshot')
+                if data is None or (seq and seq <= last_seq):
+                    continue
+                last_seq = max(last_seq, seq)
+                coalescer.push(seq, data)
+                if data['state'] in BulkTransfer.FINAL_STATES:
+                    break
             
-            # Send update if state or progress changed
-            if current_state != last_state or completed != last_completed_count:
-                data = {
-                    'bulkTransferId': bulk_id,
-                    'state': current_state,
-                    'total': total,
-                    'completed': completed,
-                    'failed': failed,
-                    'pending': pending,
-                    'progress_percent': round((completed + failed) / total * 100, 2) if total > 0 else 0
-                }
-                
-                yield f"data: {json.dumps(data)}\n\n"
-                
-                last_state = current_state
-                last_completed_count = completed
+            message = coalescer.pop()
+            if message is not None:
+                seq, data = message
+                SSE_EVENTS.labels(stream='bulk').inc()
+                yield _format_event(seq, data)
                 
                 # Stop streaming if final state reached
-                if current_state in ['COMPLETED', 'FAILED', 'PARTIALLY_COMPLETED']:
+                if data['state'] in BulkTransfer.FINAL_STATES:
                     # Send final event
-                    yield f"event: done\ndata: {json.dumps({'message': 'Transfer completed', 'state': current_state})}\n\n"
-                    break
+                    yield f"event: done\ndata: {json.dumps({'message': 'Transfer completed', 'state': data['state']})}\n\n"
+                    return
             
-            # Poll every 1 second
-            time.sleep(1)
+            # Wait for a published change, or until the coalesced update is due
+            flush_in = coalescer.due_in()
+            timeout = heartbeat if flush_in is None else min(flush_in, heartbeat)
+            payload = await next_event(pubsub, timeout)
+            if payload is None and timeout < heartbeat:
+                batch = []
+            elif payload is None:
+                # On heartbeat keep the connection alive
+                yield ": heartbeat\n\n"
+                # Catch up from the event log if a message was missed
+                if await current_bulk_seq(bulk_id) > last_seq:
+                    batch = await bulk_events_since(bulk_id, last_seq)
+                else:
+                    batch = []
+            elif 'snapshot' in payload:
+                batch = [payload]
+            else:
+                batch = None
             
-        except BulkTransfer.DoesNotExist:
-            error_data = {'error': 'Bulk transfer not found', 'bulkTransferId': bulk_id}
-            yield f"event: error\ndata: {json.dumps(error_data)}\n\n"
-            break
-        except Exception as e:
-            error_data = {'error': str(e), 'bulkTransferId': bulk_id}
-            yield f"event: error\ndata: {json.dumps(error_data)}\n\n"
-            break
+    except BulkTransfer.DoesNotExist:
+        error_data = {'error': 'Bulk transfer not found', 'bulkTransferId': bulk_id}
+        yield f"event: error\ndata: {json.dumps(error_data)}\n\n"
+    except Exception as e:
+        error_data = {'error': str(e), 'bulkTransferId': bulk_id}
+        yield f"event: error\ndata: {json.dumps(error_data)}\n\n"
+    finally:
+        SSE_STREAMS.labels(stream='bulk').dec()
+        await close_subscription(pubsub)
 
 
 @csrf_exempt
@@ -91,9 +244,23 @@ def event_stream(bulk_id):
     
     **How it works:**
     - Opens a persistent HTTP connection
-    - Sends updates every time the transfer state changes
+    - Sends updates every time the transfer state changes (pushed through Redis pub/sub,
+      built from the bulk's precomputed counters)
+    - Sends a `: heartbeat` comment when nothing changed for a while
+    - Requires the ASGI server (see `scripts/start-web.sh`): the stream is an async generator
     - Automatically closes when transfer reaches final state (COMPLETED, FAILED, PARTIALLY_COMPLETED)
     - Updates include: state, total, completed, failed, pending counts, and progress percentage
+    - Each update carries a sequence `id`; on reconnect, EventSource sends it back in the
+      `Last-Event-ID` header and only the missed events are replayed (from a bounded
+      per-bulk log in Redis). `?lastEventId=` is accepted for clients that cannot set headers.
+    - Progress updates are coalesced: at most `max_rate` events per second, sent when
+      progress moved by `step_percent` or after `interval_ms` with a pending change.
+      Terminal states are always sent immediately.
+    
+    **Query Parameters:**
+    - `max_rate`: Maximum events per second (capped by the server setting)
+    - `step_percent`: Minimum progress change before an update is sent (0: every change)
+    - `interval_ms`: Send a pending update after this delay even below `step_percent` (0: never)
     
     **Frontend usage (JavaScript):**
     ```javascript
@@ -124,10 +291,16 @@ def event_stream(bulk_id):
     - `done`: Final state reached, connection will close
     - `error`: Error occurred, connection will close
     """,
+    manual_parameters=[
+        openapi.Parameter('max_rate', openapi.IN_QUERY, type=openapi.TYPE_NUMBER, required=False),
+        openapi.Parameter('step_percent', openapi.IN_QUERY, type=openapi.TYPE_NUMBER, required=False),
+        openapi.Parameter('interval_ms', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=False),
+    ],
     responses={
         200: 'text/event-stream - SSE stream',
         403: 'Accès interdit',
-        404: 'Bulk transfer not found'
+        404: 'Bulk transfer not found',
+        501: 'Served without ASGI'
     }
 )
 @api_view(['GET'])
@@ -136,10 +309,14 @@ def stream_bulk_status(request, bulk_id):
     """
     SSE endpoint for real-time bulk transfer status updates.
     """
+    not_asgi = asgi_required(request)
+    if not_asgi is not None:
+        return not_asgi
+    
     # Vérifier que le bulk existe et appartient à l'organisation
     try:
-        bulk = BulkTransfer.objects.select_related('payer_account__organization').get(bulk_id=bulk_id)
-        if bulk.payer_account.organization != request.user.organization:
+        bulk = BulkTransfer.objects.select_related('payer_account').get(bulk_id=bulk_id)
+        if bulk.payer_account.organization_id != request.user.organization_id:
             return JsonResponse(
                 {'error': 'Accès interdit'},
                 status=403
@@ -150,8 +327,31 @@ def stream_bulk_status(request, bulk_id):
             status=404
         )
     
+    # The view itself is short-lived; the async generator is streamed by the
+    # ASGI event loop so an open stream does not pin a worker
+    # EventSource sends the last received ID when it reconnects
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('lastEventId')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    # Clients may ask for coarser updates, never for more than the server maximum
+    def _float_param(name, default):
+        try:
+            return max(0.0, float(request.GET.get(name, default)))
+        except ValueError:
+            return default
+    
+    max_rate = _float_param('max_rate', settings.SSE_MAX_EVENTS_PER_SECOND)
+    coalescer = ProgressCoalescer(
+        min(max_rate, settings.SSE_MAX_EVENTS_PER_SECOND) or settings.SSE_MAX_EVENTS_PER_SECOND,
+        _float_param('step_percent', settings.SSE_PROGRESS_STEP_PERCENT),
+        _float_param('interval_ms', settings.SSE_PROGRESS_INTERVAL_MS),
+    )
+    
     response = StreamingHttpResponse(
-        event_stream(bulk_id),
+        event_stream(bulk_id, last_event_id, coalescer),
         content_type='text/event-stream'
     )
     response['Cache-Control'] = 'no-cache'
@@ -159,124 +359,309 @@ def stream_bulk_status(request, bulk_id):
     return response
 
 
+def load_active_snapshots(organization_id, bulk_ids=None):
+    """
+    Return the snapshots of the organization's unfinished bulks (one query).
+    Synchronous: called from the async stream through sync_to_async.
+    """
+    bulks = BulkTransfer.objects.filter(
+        payer_account__organization_id=organization_id,
+        finished_at__isnull=True
+    ).select_related('payer_account')
+    if bulk_ids:
+        bulks = bulks.filter(bulk_id__in=bulk_ids)
+    return [bulk_snapshot(bulk) for bulk in bulks.order_by('created_at')]
+
+
+def _format_snapshot(data):
+    """Format a multiplexed progress event, followed by `done` when the bulk is final."""
+    event = f"data: {json.dumps(data)}\n\n"
+    if data['state'] in BulkTransfer.FINAL_STATES:
+        done = {'bulkTransferId': data['bulkTransferId'], 'state': data['state']}
+        event += f"event: done\ndata: {json.dumps(done)}\n\n"
+    return event
+
+
+async def organization_event_stream(organization_id, bulk_ids=None, states=None):
+    """
+    Async generator multiplexing the progress events of every bulk of an organization.
+
+    All the streams of a process share a single Redis subscription per
+    organization (see events.ChannelHub). Events are filtered server-side on
+    `bulk_ids` and `states` before being sent. The stream never ends by
+    itself: the client closes it.
+    """
+    heartbeat = settings.SSE_HEARTBEAT_SECONDS
+
+    def wanted(data):
+        if bulk_ids and data['bulkTransferId'] not in bulk_ids:
+            return False
+        if states and data['state'] not in states:
+            return False
+        return True
+
+    async with listen_channel(organization_channel(organization_id)) as queue:
+        SSE_STREAMS.labels(stream='organization').inc()
+        try:
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                
+                if 'snapshot' not in payload:
+                    # Subscription active (initial state), re-established, or
+                    # subscriber too slow: read the active bulks from the database
+                    for data in await sync_to_async(load_active_snapshots)(organization_id, bulk_ids):
+                        if wanted(data):
+                            SSE_EVENTS.labels(stream='organization').inc()
+                            yield _format_snapshot(data)
+                elif wanted(payload['snapshot']):
+                    SSE_EVENTS.labels(stream='organization').inc()
+                    yield _format_snapshot(payload['snapshot'])
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            SSE_STREAMS.labels(stream='organization').dec()
+
+
 @csrf_exempt
 @swagger_auto_schema(
     method='get',
     operation_description="""
-    Wait for bulk transfer completion and return final result.
+    Stream the progress of every in-flight bulk transfer of the user's organization
+    over a single Server-Sent Events connection.
     
-    **Blocking endpoint:**
-    - Polls the database until transfer reaches final state
-    - Maximum wait time: 5 minutes (configurable via timeout parameter)
-    - Returns complete transfer details once done
-    
-    **Use case:**
-    - When frontend prefers a simple blocking call instead of polling or SSE
-    - For synchronous workflows that need to wait for completion
+    **How it works:**
+    - On connect, sends the current snapshot of each unfinished bulk of the organization
+    - Then pushes every progress change of any bulk of the organization, including
+      bulks created after the connection was opened
+    - Each `message` event carries a `bulkTransferId`; a `done` event follows when a bulk
+      reaches a final state (the stream itself stays open)
+    - Filters are applied server-side
     
     **Query Parameters:**
-    - `timeout`: Maximum wait time in seconds (default: 300, max: 600)
+    - `bulk_id`: Only stream these bulks (repeatable or comma-separated)
+    - `state`: Only send events whose state matches (PROCESSING, COMPLETED, FAILED,
+      PARTIALLY_COMPLETED; repeatable or comma-separated)
     """,
     manual_parameters=[
-        openapi.Parameter(
-            'timeout',
-            openapi.IN_QUERY,
-            description="Maximum wait time in seconds (default: 300, max: 600)",
-            type=openapi.TYPE_INTEGER,
-            required=False
-        )
+        openapi.Parameter('bulk_id', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('state', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=False),
     ],
     responses={
-        200: 'Transfer completed successfully',
-        408: 'Request timeout - transfer still processing',
-        404: 'Bulk transfer not found'
+        200: 'text/event-stream - SSE stream',
+        403: 'Aucune organisation associée',
+        501: 'Served without ASGI'
     }
 )
 @api_view(['GET'])
-def wait_for_completion(request, bulk_id):
+@permission_classes([IsAuthenticated])
+def stream_organization_events(request):
+    """
+    Multiplexed SSE endpoint for all the bulk transfers of the user's organization.
+    """
+    not_asgi = asgi_required(request)
+    if not_asgi is not None:
+        return not_asgi
+    
+    if request.user.organization_id is None:
+        return JsonResponse(
+            {'error': 'Aucune organisation associée à cet utilisateur'},
+            status=403
+        )
+    
+    def _param_set(name):
+        values = set()
+        for raw in request.GET.getlist(name):
+            values.update(v.strip() for v in raw.split(',') if v.strip())
+        return values or None
+    
+    response = StreamingHttpResponse(
+        organization_event_stream(
+            request.user.organization_id,
+            bulk_ids=_param_set('bulk_id'),
+            states=_param_set('state'),
+        ),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable nginx buffering
+    return response
+
+
+def documented_by(view_class):
     """
-    Blocking endpoint that waits for bulk transfer completion.
-    Returns final result once all transfers are processed.
+    Expose a plain (async) view in the API docs with the schema of view_class,
+    a DRF view used for documentation only: DRF cannot serve async views, and
+    drf_yasg only lists DRF views. Place it above the other decorators.
     """
+    def decorator(view):
+        view.cls = view_class
+        view.initkwargs = {}
+        return view
+    return decorator
+
+
+class WaitForCompletionSchema(APIView):
+    """API docs of wait_for_completion (never routed)."""
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="""
+        Wait for bulk transfer completion and return final result.
+        
+        **Long-poll endpoint:**
+        - Wakes up as soon as the bulk is finalized
+        - Maximum wait time: 5 minutes (configurable via timeout parameter)
+        - Returns complete transfer details once done
+        
+        **Use case:**
+        - When frontend prefers a simple blocking call instead of polling or SSE
+        - For synchronous workflows that need to wait for completion
+        """,
+        manual_parameters=[
+            openapi.Parameter(
+                'timeout',
+                openapi.IN_QUERY,
+                description="Maximum wait time in seconds (default: 300, max: 600)",
+                type=openapi.TYPE_INTEGER,
+                required=False
+            )
+        ],
+        responses={
+            200: 'Transfer completed successfully',
+            401: 'Authentication credentials were not provided',
+            403: 'Bulk transfer of another organization',
+            404: 'Bulk transfer not found',
+            408: 'Request timeout - transfer still processing'
+        }
+    )
+    def get(self, request, bulk_id):
+        raise NotImplementedError
+
+
+def _load_bulk(bulk_id):
+    """Return the bulk with its payer account and organization (raises BulkTransfer.DoesNotExist)."""
+    return BulkTransfer.objects.select_related('payer_account__organization').get(bulk_id=bulk_id)
+
+
+def _completion_payload(bulk_id):
+    """
+    Build the final response of a finished bulk from its precomputed counters.
+    Synchronous: called from the async long-poll through sync_to_async.
+    """
+    bulk = _load_bulk(bulk_id)
+    transfers = IndividualTransfer.objects.filter(bulk=bulk).values(
+        'transfer_id', 'amount', 'currency', 'status', 'fulfilment', 'completed_at'
+    )
+    
+    transfer_list = []
+    for t in transfers:
+        transfer_list.append({
+            'transferId': t['transfer_id'],
+            'amount': float(t['amount']),
+            'currency': t['currency'],
+            'status': t['status'],
+            'fulfilment': t['fulfilment'] or '',
+            'completed_at': t['completed_at'].isoformat() if t['completed_at'] else None
+        })
+    
+    return {
+        'bulkTransferId': bulk_id,
+        'state': bulk.state,
+        'total_amount': float(bulk.total_amount),
+        'currency': bulk.currency,
+        'payer_account': bulk.payer_account.account_id,
+        'total_transactions': bulk.transfers_count,
+        'completed_count': bulk.completed_count,
+        'failed_count': bulk.failed_count,
+        'pending_count': 0,
+        'created_at': bulk.created_at.isoformat(),
+        'completed_at': bulk.finished_at.isoformat() if bulk.finished_at else None,
+        'individualTransfers': transfer_list
+    }
+
+
+@documented_by(WaitForCompletionSchema)
+@exclude_from_slow_log
+@csrf_exempt
+async def wait_for_completion(request, bulk_id):
+    """
+    Wait for bulk transfer completion and return final result.
+    
+    **Long-poll endpoint (async, served through ASGI):**
+    - Subscribes to the bulk's completion notification and wakes up as soon
+      as the bulk is finalized; no database work is done while waiting
+    - Maximum wait time: 5 minutes (configurable via timeout parameter)
+    - Returns complete transfer details once done, built from the bulk's
+      precomputed counters
+    
+    **Use case:**
+    - When frontend prefers a simple blocking call instead of polling or SSE
+    - For synchronous workflows that need to wait for completion
+    
+    **Query Parameters:**
+    - `timeout`: Maximum wait time in seconds (default: 300, max: 600)
+    
+    **Responses:** 200 once completed, 401/403 on authentication or
+    organization mismatch, 404 if the bulk is unknown, 408 on timeout.
+    """
+    if request.method != 'GET':
+        return HttpResponse(status=405)
+    
+    user = await authenticate_async(request)
+    if user is None:
+        return JsonResponse({'detail': "Informations d'authentification non fournies."}, status=401)
+    
     timeout = int(request.GET.get('timeout', 300))  # Default 5 minutes
     timeout = min(timeout, 600)  # Max 10 minutes
+    deadline = time.monotonic() + timeout
     
-    start_time = time.time()
-    poll_interval = 2  # Check every 2 seconds
-    
+    # Subscribe before reading the bulk so that the completion cannot be missed
+    pubsub = await subscribe_bulk(bulk_id)
     try:
-        while True:
-            bulk = BulkTransfer.objects.get(bulk_id=bulk_id)
-            transfers = IndividualTransfer.objects.filter(bulk=bulk)
-            
-            completed = transfers.filter(status='COMPLETED').count()
-            failed = transfers.filter(status='FAILED').count()
-            pending = transfers.filter(status='PENDING').count()
-            total = transfers.count()
-            
-            # Check if all transfers are done
-            if pending == 0:
-                # Determine final state
-                if failed == 0:
-                    final_state = 'COMPLETED'
-                elif completed == 0:
-                    final_state = 'FAILED'
-                else:
-                    final_state = 'PARTIALLY_COMPLETED'
-                
-                # Update bulk state
-                bulk.state = final_state
-                bulk.save(update_fields=['state'])
-                
-                # Return full details
-                transfer_list = []
-                for t in transfers:
-                    transfer_list.append({
-                        'transferId': t.transfer_id,
-                        'amount': float(t.amount),
-                        'currency': t.currency,
-                        'status': t.state,
-                        'fulfilment': t.fulfilment or '',
-                        'error_code': t.error_code or None,
-                        'error_description': t.error_description or None,
-                        'completed_at': t.completed_at.isoformat() if t.completed_at else None
-                    })
-                
-                return JsonResponse({
-                    'bulkTransferId': bulk_id,
-                    'state': final_state,
-                    'total_amount': float(bulk.total_amount),
-                    'currency': bulk.currency,
-                    'payer_account': bulk.payer_account.account_id,
-                    'total_transactions': total,
-                    'completed_count': completed,
-                    'failed_count': failed,
-                    'pending_count': 0,
-                    'created_at': bulk.created_at.isoformat(),
-                    'completed_at': bulk.created_at.isoformat(),
-                    'individualTransfers': transfer_list
-                })
-            
-            # Check timeout
-            elapsed = time.time() - start_time
-            if elapsed >= timeout:
+        bulk = await sync_to_async(_load_bulk)(bulk_id)
+        if bulk.payer_account.organization_id != user.organization_id:
+            return JsonResponse({'error': 'Accès interdit'}, status=403)
+        
+        finished = bulk.finished_at is not None
+        progress = bulk_snapshot(bulk)
+        
+        while not finished:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
                 return JsonResponse({
                     'error': 'Request timeout',
                     'message': f'Transfer still processing after {timeout} seconds',
                     'bulkTransferId': bulk_id,
                     'current_progress': {
-                        'completed': completed,
-                        'failed': failed,
-                        'pending': pending,
-                        'total': total
+                        'completed': progress['completed'],
+                        'failed': progress['failed'],
+                        'pending': progress['pending'],
+                        'total': progress['total']
                     }
                 }, status=408)
             
-            # Wait before next poll
-            time.sleep(poll_interval)
+            payload = await next_event(pubsub, remaining)
+            if payload is None:
+                continue
+            if 'snapshot' in payload:
+                progress = payload['snapshot']
+                finished = payload.get('finished', False)
+            else:
+                # Redis unavailable: fall back to reading the bulk row
+                bulk = await sync_to_async(_load_bulk)(bulk_id)
+                progress = bulk_snapshot(bulk)
+                finished = bulk.finished_at is not None
+        
+        return JsonResponse(await sync_to_async(_completion_payload)(bulk_id))
             
     except BulkTransfer.DoesNotExist:
         return JsonResponse({
             'error': 'Bulk transfer not found',
             'bulkTransferId': bulk_id
         }, status=404)
+    finally:
+        await close_subscription(pubsub)
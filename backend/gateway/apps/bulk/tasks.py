@@ -1,15 +1,18 @@
-from celery import shared_task
+import random
+
 import requests
-import time
-import base64
-import uuid
+from celery import shared_task
 from django.utils import timezone
 from django.db import transaction
-from django.db.models import F
 from .models import BulkTransfer, IndividualTransfer, Account
+from .services import publish_snapshot, record_outcomes, expire_stale_transfers, dead_letter_transfer
+from .ledger import adjust_reserved, journal_transfers, fold_all_accounts, snapshot_balances
+from .inbox import process_inbox
 from django.conf import settings
-
-SCHEME_ADAPTER_URL = getattr(settings, 'SCHEME_ADAPTER_URL', 'http://scheme-adapter:4000')
+from apps.sdk_adapter import client as adapter
+from apps.sdk_adapter.resilience import bulk_orchestration_lease, organization_bulkhead
+from apps.monitoring.metrics import ORCHESTRATION_SECONDS, TRANSFER_DISPATCHES, observe
+from apps.monitoring.tracing import inject_context, set_attributes, start_span
 
 
 @shared_task(bind=True, default_retry_delay=5, max_retries=3)
@@ -23,96 +26,109 @@ def orchestrate_bulk(self, bulk_id):
     3. Call POST /transfers to the hub for each transfer
     4. Receive callbacks from the hub
     5. Call our backend callback endpoint to finalize
+
+    Resilience:
+    - One run at a time per bulk: the outbox delivers at least once, so the
+      task may be published twice. A run that finds the bulk's lease taken
+      returns without sending anything.
+    - At most ADAPTER_BULKHEAD_PER_ORGANIZATION orchestrations run at once per
+      organization; extra ones are rescheduled so one organization's payroll
+      cannot hold every worker.
+    - Adapter calls go through a circuit breaker shared by all workers. When it
+      is open the orchestration stops and reschedules itself for when the
+      breaker may close again. Only transfers never attempted are sent, so a
+      rescheduled run resumes where the previous one stopped; those with a
+      retry scheduled are left to retry_transfer.
     """
     import logging
     logger = logging.getLogger(__name__)
     
+    set_attributes(bulk_id=bulk_id)
     try:
-        bulk = BulkTransfer.objects.select_related('payer_account').prefetch_related('individuals').get(bulk_id=bulk_id)
+        bulk = BulkTransfer.objects.select_related('payer_account').get(bulk_id=bulk_id)
     except BulkTransfer.DoesNotExist:
         return {'error': 'bulk not found'}
 
+    with observe(ORCHESTRATION_SECONDS, status='error') as labels:
+        lease = bulk_orchestration_lease(bulk_id)
+        lease_token = lease.acquire()
+        if lease_token is None:
+            logger.info(f"Bulk {bulk_id} skipped: already being orchestrated")
+            labels['status'] = 'skipped'
+            return {'status': 'skipped', 'bulk_id': bulk_id, 'reason': 'running'}
+
+        try:
+            bulkhead = organization_bulkhead(bulk.payer_account.organization_id)
+            token = bulkhead.acquire()
+            if token is None:
+                orchestrate_bulk.apply_async((bulk_id,), countdown=settings.ADAPTER_BULKHEAD_RETRY_SECONDS)
+                logger.info(f"Bulk {bulk_id} rescheduled: organization bulkhead full")
+                labels['status'] = 'rescheduled'
+                return {'status': 'rescheduled', 'bulk_id': bulk_id, 'reason': 'bulkhead'}
+
+            try:
+                result = _dispatch_transfers(bulk, [(lease, lease_token), (bulkhead, token)], logger)
+            finally:
+                bulkhead.release(token)
+        finally:
+            lease.release(lease_token)
+        labels['status'] = result['status']
+        return result
+
+
+def _dispatch_transfers(bulk, leases, logger):
+    """Send the bulk's pending, never attempted transfers to the adapter (see orchestrate_bulk)."""
     # For each individual transfer, call the SDK adapter's outbound API
     # The SDK adapter expects a simplified transfer request and handles the Mojaloop flow
     success_count = 0
     error_count = 0
     
-    for it in bulk.individuals.all():
-        transfer_request = {
-            'homeTransactionId': it.transfer_id,
-            'from': {
-                'idType': bulk.payer_account.party_id_type,
-                'idValue': bulk.payer_account.party_identifier
-            },
-            'to': {
-                'idType': it.payee_party_id_type,
-                'idValue': it.payee_party_identifier
-            },
-            'amountType': 'SEND',
-            'currency': it.currency,
-            'amount': str(it.amount),
-            'transactionType': 'TRANSFER'
-        }
-        
+    transfers = IndividualTransfer.objects.filter(
+        bulk=bulk, status='PENDING', dispatched_at__isnull=True, dispatch_attempt=0, dead_letter__isnull=True
+    ).order_by('pk')
+    
+    for it in transfers.iterator():
         try:
-            response = requests.post(
-                f"{SCHEME_ADAPTER_URL}/transfers",
-                json=transfer_request,
-                timeout=30
-            )
-            
-            if response.status_code in (200, 201, 202):
-                # SDK adapter returns the transfer state in the response
-                result = response.json()
-                transfer_state = result.get('currentState', '')
-                
-                if transfer_state == 'COMPLETED':
-                    # Finalize the transfer: credit payee, debit payer
-                    with transaction.atomic():
-                        # Find or create payee account
-                        payee, _ = Account.objects.get_or_create(
-                            party_id_type=it.payee_party_id_type,
-                            party_identifier=it.payee_party_identifier,
-                            defaults={'balance': 0, 'account_id': f"{it.payee_party_id_type}-{it.payee_party_identifier}"}
-                        )
-                        
-                        # Credit payee
-                        payee.balance += it.amount
-                        payee.save()
-                        
-                        # Debit payer reserved (atomic update)
-                        Account.objects.filter(pk=bulk.payer_account.pk).update(
-                            reserved=F('reserved') - it.amount
-                        )
-                        
-                        # Mark transfer COMPLETED
-                        it.status = 'COMPLETED'
-                        it.fulfilment = result.get('fulfilment', '')
-                        it.completed_at = timezone.now()
-                        it.save()
-                        
-                    success_count += 1
-                    logger.info(f"Transfer {it.transfer_id} COMPLETED")
-                else:
-                    # Transfer failed or still processing
-                    error_count += 1
-                    logger.warning(f"Transfer {it.transfer_id} in state {transfer_state}")
-            else:
-                error_count += 1
-                logger.error(f"Transfer {it.transfer_id} failed with status {response.status_code}: {response.text}")
-        except Exception as e:
+            outcome, reason = dispatch_transfer(bulk, it)
+        except adapter.CircuitOpen as e:
+            TRANSFER_DISPATCHES.labels(outcome='CIRCUIT_OPEN').inc()
+            # Adapter known to be down: stop here and resume once the breaker may close
+            orchestrate_bulk.apply_async((bulk.bulk_id,), countdown=e.retry_after)
+            logger.warning(f"Bulk {bulk.bulk_id} paused after {success_count} transfers: {e}")
+            return {
+                'status': 'paused',
+                'bulk_id': bulk.bulk_id,
+                'success_count': success_count,
+                'error_count': error_count,
+                'retry_after': e.retry_after
+            }
+        
+        TRANSFER_DISPATCHES.labels(outcome=outcome).inc()
+        if outcome == 'SKIPPED':
+            # Claimed meanwhile by a concurrent run or a retry
+            continue
+        if outcome in ('COMPLETED', 'DISPATCHED'):
+            success_count += 1
+        else:
             error_count += 1
-            logger.error(f"Transfer {it.transfer_id} exception: {str(e)}")
+            logger.warning(f"Transfer {it.transfer_id} not dispatched: {reason}")
+            if outcome == 'RETRY':
+                schedule_transfer_retry(it.pk, 1)
+            else:
+                dead_letter_transfer(it, reason, attempts=1)
+        
+        for lease, token in leases:
+            lease.renew(token)
 
     # Mark bulk as IN_PROGRESS - callbacks will update individual transfers
-    bulk.state = 'IN_PROGRESS'
-    bulk.save()
+    # (unless the settlements above or the callbacks already finalized it)
+    BulkTransfer.objects.filter(pk=bulk.pk, finished_at__isnull=True).update(state='IN_PROGRESS')
+    bulk.refresh_from_db()
+    publish_snapshot(bulk)
     
     # Check if all transfers are completed
-    if success_count == bulk.individuals.count():
-        bulk.state = 'COMPLETED'
-        bulk.save()
-        logger.info(f"Bulk {bulk.bulk_id} COMPLETED - {success_count}/{bulk.individuals.count()} transfers successful")
+    if bulk.state == 'COMPLETED':
+        logger.info(f"Bulk {bulk.bulk_id} COMPLETED - {bulk.completed_count}/{bulk.transfers_count} transfers successful")
     elif error_count > 0:
         logger.warning(f"Bulk {bulk.bulk_id} partial completion - {success_count} succeeded, {error_count} failed")
 
@@ -122,3 +138,184 @@ def orchestrate_bulk(self, bulk_id):
         'success_count': success_count,
         'error_count': error_count
     }
+
+
+# HTTP statuses worth retrying; other 4xx responses are permanent rejections
+TRANSIENT_STATUS_CODES = (408, 425, 429)
+
+
+def dispatch_transfer(bulk, it, attempt=1):
+    """
+    Send one individual transfer to the SDK adapter, in a `transfer.dispatch`
+    span whose context is stored on the transfer so that its callback joins
+    the same trace.
+
+    The attempt is first claimed with a conditional UPDATE on dispatch_attempt,
+    so a transfer picked up by two workers at once (a resumed orchestration and
+    its pending retry, or a task delivered twice) is sent by one of them only.
+    A worker dying between the claim and the adapter's answer leaves the
+    transfer unsent rather than sending it twice; its reservation expires.
+
+    Returns:
+        tuple: (outcome, reason) where outcome is
+            COMPLETED: the adapter settled it synchronously (settled here),
+            DISPATCHED: accepted, the callback will settle it,
+            RETRY: transient failure (network, timeout, 5xx, 429),
+            REJECTED: permanent failure (other 4xx),
+            SKIPPED: attempt already claimed elsewhere, or transfer settled, nothing was sent
+
+    Raises:
+        CircuitOpen: the adapter is known to be down, nothing was sent (the claim is released)
+    """
+    claimed = IndividualTransfer.objects.filter(
+        pk=it.pk, status='PENDING', dispatched_at__isnull=True, dispatch_attempt__lt=attempt
+    ).update(dispatch_attempt=attempt)
+    if not claimed:
+        return 'SKIPPED', f"attempt {attempt} already claimed"
+
+    with start_span('transfer.dispatch', bulk_id=bulk.bulk_id, transfer_id=it.transfer_id, attempt=attempt) as span:
+        try:
+            outcome, reason = _send_transfer(bulk, it)
+        except adapter.CircuitOpen:
+            IndividualTransfer.objects.filter(pk=it.pk, dispatch_attempt=attempt).update(dispatch_attempt=attempt - 1)
+            raise
+        span.set_attribute('outcome', outcome)
+        return outcome, reason
+
+
+def _send_transfer(bulk, it):
+    """Call the adapter for one transfer and settle it if it completed synchronously (see dispatch_transfer)."""
+    transfer_request = {
+        'homeTransactionId': it.transfer_id,
+        'from': {
+            'idType': bulk.payer_account.party_id_type,
+            'idValue': bulk.payer_account.party_identifier
+        },
+        'to': {
+            'idType': it.payee_party_id_type,
+            'idValue': it.payee_party_identifier
+        },
+        'amountType': 'SEND',
+        'currency': it.currency,
+        'amount': str(it.amount),
+        'transactionType': 'TRANSFER'
+    }
+    
+    sent_at = timezone.now()
+    try:
+        response = adapter.transfer(transfer_request)
+    except requests.RequestException as e:
+        return 'RETRY', f"{type(e).__name__}: {e}"
+    
+    if response.status_code >= 500 or response.status_code in TRANSIENT_STATUS_CODES:
+        return 'RETRY', f"HTTP {response.status_code}: {response.text[:500]}"
+    if response.status_code not in (200, 201, 202):
+        return 'REJECTED', f"HTTP {response.status_code}: {response.text[:500]}"
+    
+    # SDK adapter returns the transfer state in the response, and the payee FSP once the party is resolved
+    result = response.json()
+    IndividualTransfer.objects.filter(pk=it.pk).update(
+        dispatched_at=sent_at,
+        responded_at=timezone.now(),
+        payee_fsp=((result.get('to') or {}).get('fspId') or '')[:32],
+        trace_context=inject_context()
+    )
+    
+    if result.get('currentState', '') != 'COMPLETED':
+        # Still processing: the callback will finalize it
+        return 'DISPATCHED', None
+    
+    # Finalize the transfer: credit payee, debit payer
+    with transaction.atomic():
+        # Find or create payee account
+        payee, _ = Account.objects.get_or_create(
+            party_id_type=it.payee_party_id_type,
+            party_identifier=it.payee_party_identifier,
+            defaults={'balance': 0, 'account_id': f"{it.payee_party_id_type}-{it.payee_party_identifier}"}
+        )
+        
+        # Mark transfer COMPLETED, unless a callback already settled it
+        claimed = IndividualTransfer.objects.filter(pk=it.pk, status='PENDING').update(
+            status='COMPLETED',
+            payee_account=payee,
+            fulfilment=result.get('fulfilment', ''),
+            completed_at=timezone.now()
+        )
+        
+        if claimed:
+            # Debit payer / credit payee in the journal (insert only)
+            journal_transfers([(it.pk, bulk.payer_account_id, payee.pk, it.amount)])
+            
+            # Release the reservation (sharded counters, no lock on the payer row)
+            adjust_reserved(bulk.payer_account_id, -it.amount)
+            
+            record_outcomes(bulk, completed=1)
+    
+    return 'COMPLETED', None
+
+
+def retry_delay(attempt):
+    """Exponential backoff with jitter (half fixed, half random) for the given attempt (1-based)."""
+    delay = min(settings.TRANSFER_RETRY_MAX_SECONDS, settings.TRANSFER_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def schedule_transfer_retry(transfer_pk, attempt):
+    """Enqueue the given dispatch attempt of a transfer after its backoff delay."""
+    retry_transfer.apply_async((transfer_pk, attempt), countdown=retry_delay(attempt))
+
+
+@shared_task
+def retry_transfer(transfer_pk, attempt):
+    """Retry dispatching one transfer; dead-letter it once TRANSFER_RETRY_MAX_ATTEMPTS is reached."""
+    import logging
+    logger = logging.getLogger(__name__)
+    
+    it = IndividualTransfer.objects.select_related('bulk__payer_account').filter(pk=transfer_pk).first()
+    if it is None or it.bulk is None or it.status != 'PENDING' or it.dispatched_at is not None:
+        return {'status': 'skipped', 'transfer_pk': transfer_pk}
+    set_attributes(bulk_id=it.bulk.bulk_id, transfer_id=it.transfer_id, attempt=attempt)
+    
+    try:
+        outcome, reason = dispatch_transfer(it.bulk, it, attempt)
+    except adapter.CircuitOpen as e:
+        TRANSFER_DISPATCHES.labels(outcome='CIRCUIT_OPEN').inc()
+        # Not an attempt: try again once the breaker may close
+        retry_transfer.apply_async((transfer_pk, attempt), countdown=e.retry_after)
+        return {'status': 'paused', 'transfer_id': it.transfer_id, 'retry_after': e.retry_after}
+    
+    TRANSFER_DISPATCHES.labels(outcome=outcome).inc()
+    if outcome == 'SKIPPED':
+        return {'status': 'skipped', 'transfer_pk': transfer_pk}
+    if outcome == 'RETRY' and attempt < settings.TRANSFER_RETRY_MAX_ATTEMPTS:
+        logger.warning(f"Transfer {it.transfer_id} attempt {attempt} failed: {reason}")
+        schedule_transfer_retry(transfer_pk, attempt + 1)
+    elif outcome in ('RETRY', 'REJECTED'):
+        logger.error(f"Transfer {it.transfer_id} dead-lettered after {attempt} attempts: {reason}")
+        dead_letter_transfer(it, reason, attempts=attempt)
+        outcome = 'DEAD_LETTERED'
+    return {'status': outcome.lower(), 'transfer_id': it.transfer_id, 'attempt': attempt}
+
+
+@shared_task
+def fold_account_shards():
+    """Periodically fold the accounts' sub-counters into their Account row (celery beat)."""
+    return {'folded_accounts': fold_all_accounts()}
+
+
+@shared_task
+def snapshot_account_balances():
+    """Periodically advance the balance snapshots over the journal (celery beat)."""
+    return {'advanced_accounts': snapshot_balances()}
+
+
+@shared_task
+def process_callback_inbox():
+    """Apply the pending transfer callbacks in micro-batches (nudged by the callback view, and by celery beat)."""
+    return {'processed': process_inbox()}
+
+
+@shared_task
+def expire_stale_reservations():
+    """Periodically expire transfers left PENDING too long and release their reservations (celery beat)."""
+    return {'expired': expire_stale_transfers()}
@@ -8,11 +8,17 @@ urlpatterns = [
     path('bulk-transfers/history', views.list_bulk_transfers, name='list_bulk_transfers'),
     path('bulk-transfers/<str:bulk_id>/status', views.bulk_status, name='bulk_status'),
     path('bulk-transfers/<str:bulk_id>/details', views.get_bulk_transfer_details, name='get_bulk_transfer_details'),
+    path('bulk-transfers/<str:bulk_id>/performance', views.bulk_performance_report, name='bulk_performance_report'),
     
     # Endpoints de monitoring temps réel
+    path('bulk-transfers/stream', sse_views.stream_organization_events, name='stream_organization_events'),
     path('bulk-transfers/<str:bulk_id>/stream', sse_views.stream_bulk_status, name='stream_bulk_status'),
     path('bulk-transfers/<str:bulk_id>/wait', sse_views.wait_for_completion, name='wait_for_completion'),
     
+    # Administration des transferts en échec d'envoi
+    path('admin/dead-letters', views.list_dead_letters, name='list_dead_letters'),
+    path('admin/dead-letters/requeue', views.requeue_dead_letter_transfers, name='requeue_dead_letters'),
+    
     # Callback du SDK adapter (REQUIS - appelé quand les transferts se terminent)
     path('transfers/<str:transfer_id>', views.transfer_callback, name='transfer_callback'),
 ]
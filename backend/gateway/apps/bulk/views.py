@@ -3,24 +3,49 @@ import io
 import uuid
 import base64
 import json
+from collections import Counter
+from functools import wraps
 from datetime import datetime
 from django.http import JsonResponse, HttpResponseBadRequest, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.db import transaction
+from django.db.models import F
 from django.shortcuts import get_object_or_404
-from .models import Account, BulkTransfer, IndividualTransfer
-import requests
-from django.conf import settings
+from .models import Account, BulkTransfer, DeadLetter, IndividualTransfer
+from .services import publish_snapshot, settle_transfers, requeue_dead_letters
+from .ledger import AccountUpdateConflict, reserve_funds, update_account
+from .inbox import enqueue_callback
+from .outbox import enqueue_task
+from .performance import bulk_performance
+from .tasks import orchestrate_bulk
 from rest_framework.decorators import api_view, parser_classes, permission_classes
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework import status
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from . import serializers as sers
 from apps.accounts.permissions import IsGestionnaire, IsSameOrganization
+from apps.monitoring.queries import query_budget
+from apps.monitoring.tracing import set_attributes
+from apps.monitoring.metrics import (
+    CALLBACK_OUTCOMES, CALLBACKS_RECEIVED, UPLOAD_ROWS, UPLOAD_STAGE_SECONDS, UPLOADS, StageTimer,
+)
+
+UPLOAD_OUTCOMES = {200: 'accepted', 403: 'forbidden', 409: 'conflict'}
 
-SCHEME_ADAPTER_URL = getattr(settings, 'SCHEME_ADAPTER_URL', 'http://mojaloop-connector-load-test:4001')
+
+def _track_upload(view):
+    """Count the uploads per outcome and measure their total duration."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        timer = StageTimer(UPLOAD_STAGE_SECONDS)
+        response = view(request, *args, **kwargs)
+        timer.total()
+        UPLOADS.labels(outcome=UPLOAD_OUTCOMES.get(response.status_code, 'rejected')).inc()
+        return response
+    return wrapper
 
 
 def parse_csv_file(file_bytes):
@@ -82,6 +107,7 @@ def parse_csv_file(file_bytes):
 @api_view(['POST'])
 @parser_classes([MultiPartParser, FormParser])
 @permission_classes([IsAuthenticated, IsGestionnaire])
+@_track_upload
 def create_bulk_transfers(request):
     if request.method != 'POST':
         return HttpResponse(status=405)
@@ -92,7 +118,7 @@ def create_bulk_transfers(request):
     # Si pas de payer_account fourni, utiliser le premier compte de l'organisation
     if not payer_account_id:
         payer_account = Account.objects.filter(
-            organization=request.user.organization
+            organization_id=request.user.organization_id
         ).first()
         if not payer_account:
             return HttpResponseBadRequest(
@@ -108,7 +134,7 @@ def create_bulk_transfers(request):
             )
         
         # Vérifier que le compte appartient à l'organisation de l'utilisateur
-        if payer_account.organization != request.user.organization:
+        if payer_account.organization_id != request.user.organization_id:
             return HttpResponse(
                 json.dumps({'error': 'Accès interdit à ce compte'}),
                 status=403,
@@ -119,6 +145,7 @@ def create_bulk_transfers(request):
     if not file:
         return HttpResponseBadRequest(json.dumps({'error': 'file is required'}), content_type='application/json')
 
+    timer = StageTimer(UPLOAD_STAGE_SECONDS)
     rows = parse_csv_file(file.read())
 
     # If the uploaded CSV is in `payment_list` format (type_id,valeur_id,devise,montant,...)
@@ -142,6 +169,8 @@ def create_bulk_transfers(request):
                 })
             rows = normalized
 
+    timer.lap('parse')
+
     # validate rows and detect duplicate transferIds in the uploaded CSV
     individual_objs = []
     total = 0
@@ -169,22 +198,24 @@ def create_bulk_transfers(request):
             'partyIdentifier': r.get('partyIdentifier'),
         })
 
+    # early rejection; the authoritative check is made by the reservation below
     if payer_account.available() < total:
         return HttpResponseBadRequest(json.dumps({'error': 'insufficient funds'}), content_type='application/json')
 
-    bulk_id = f"bulk-{uuid.uuid4().hex[:12]}"
+    # ensure none of the provided transferIds already exist in DB (avoid UNIQUE constraint failures)
+    existing_ids = list(IndividualTransfer.objects.filter(transfer_id__in=list(seen_ids)).values_list('transfer_id', flat=True))
+    if existing_ids:
+        return HttpResponseBadRequest(json.dumps({'error': f"transferId(s) already exist: {existing_ids}"}), content_type='application/json')
 
-    with transaction.atomic():
-        # Reserve funds
-        payer_account.reserved += total
-        payer_account.save()
+    timer.lap('validate')
 
-        # ensure none of the provided transferIds already exist in DB (avoid UNIQUE constraint failures)
-        existing_ids = list(IndividualTransfer.objects.filter(transfer_id__in=list(seen_ids)).values_list('transfer_id', flat=True))
-        if existing_ids:
-            return HttpResponseBadRequest(json.dumps({'error': f"transferId(s) already exist: {existing_ids}"}), content_type='application/json')
+    bulk_id = f"bulk-{uuid.uuid4().hex[:12]}"
 
-        bulk = BulkTransfer.objects.create(bulk_id=bulk_id, payer_account=payer_account, total_amount=total, currency=currency)
+    with transaction.atomic():
+        bulk = BulkTransfer.objects.create(
+            bulk_id=bulk_id, payer_account=payer_account, total_amount=total, currency=currency,
+            transfers_count=len(individual_objs)
+        )
         
         # Utiliser bulk_create pour de meilleures performances avec les grands CSV
         individual_transfers = [
@@ -200,36 +231,34 @@ def create_bulk_transfers(request):
         ]
         IndividualTransfer.objects.bulk_create(individual_transfers, batch_size=500)
 
-    # Enqueue orchestration task (Celery) to perform discovery/quotes/execution asynchronously
-    try:
-        from .tasks import orchestrate_bulk
-        orchestrate_bulk.delay(bulk.bulk_id)
-    except Exception:
-        # fallback: best-effort immediate forward (if Celery is not available)
-        try:
-            payload = {
-                'bulkTransferId': bulk.bulk_id,
-                'bulkQuoteId': f"quote-{uuid.uuid4().hex[:8]}",
-                'payerFsp': payer_account.account_id,
-                'individualTransfers': [
-                    {
-                        'transferId': it.transfer_id,
-                        'transferAmount': {'amount': str(it.amount), 'currency': it.currency},
-                        'payee': {'partyIdInfo': {'partyIdType': it.payee_party_id_type, 'partyIdentifier': it.payee_party_identifier}}
-                    } for it in bulk.individuals.all()
-                ]
-            }
-            requests.post(f"{SCHEME_ADAPTER_URL}/bulkTransfers", json=payload, timeout=5)
-            bulk.state = 'IN_PROGRESS'
-            bulk.save()
-        except Exception:
-            pass
+        # Orchestration (discovery/quotes/execution) published by the outbox relay
+        # once this transaction commits: never lost, never blocking the upload
+        enqueue_task(orchestrate_bulk, bulk.bulk_id)
+
+        timer.lap('insert')
 
+        # Reserve funds last: the payer row is written (optimistic, version-checked)
+        # just before the commit, so its row lock is held as briefly as possible
+        try:
+            reserved = reserve_funds(payer_account.pk, total)
+        except AccountUpdateConflict:
+            transaction.set_rollback(True)
+            return JsonResponse({'error': 'payer account busy, retry later'}, status=409)
+        if not reserved:
+            transaction.set_rollback(True)
+            return HttpResponseBadRequest(json.dumps({'error': 'insufficient funds'}), content_type='application/json')
+        timer.lap('reserve')
+
+        # Annoncer le nouveau bulk aux flux multiplexés de l'organisation
+        publish_snapshot(bulk)
+
+    UPLOAD_ROWS.inc(len(individual_transfers))
+    set_attributes(bulk_id=bulk.bulk_id, transfers_count=len(individual_transfers))
     return JsonResponse({'bulkTransferId': bulk.bulk_id, 'state': bulk.state})
 
 
 @csrf_exempt
-@swagger_auto_schema(methods=['put', 'post'], request_body=sers.BulkCallbackRequestSerializer, responses={200: sers.BulkTransferCreateResponseSerializer})
+@swagger_auto_schema(methods=['put', 'post'], request_body=sers.BulkCallbackRequestSerializer, responses={200: sers.BulkCallbackResponseSerializer})
 @api_view(['PUT', 'POST'])
 def bulk_callback(request, bulk_id):
     if request.method not in ('PUT', 'POST'):
@@ -240,49 +269,33 @@ def bulk_callback(request, bulk_id):
     except Exception:
         return HttpResponseBadRequest(json.dumps({'error': 'invalid json'}), content_type='application/json')
 
-    # idempotent: if already completed, return current state
     bulk = BulkTransfer.objects.filter(bulk_id=bulk_id).first()
     if not bulk:
         return HttpResponseBadRequest(json.dumps({'error': 'bulk not found'}), content_type='application/json')
 
-    if bulk.state == 'COMPLETED':
-        return JsonResponse({'bulkTransferId': bulk.bulk_id, 'state': bulk.state})
-
-    # finalize debiting payer and credit payees based on provided individualTransferResults
-    results = data.get('individualTransferResults', [])
+    # settle all the provided individualTransferResults at once (idempotent per transfer):
+    # the bulk state follows from its counters once no transfer is pending
+    results = [
+        (r.get('transferId'), r)
+        for r in data.get('individualTransferResults', [])
+        if r.get('transferId')
+    ]
 
+    CALLBACKS_RECEIVED.inc(len(results))
     with transaction.atomic():
-        total_debit = 0
-        for r in results:
-            tid = r.get('transferId')
-            fulfilment = r.get('fulfilment')
-            it = IndividualTransfer.objects.filter(transfer_id=tid, bulk=bulk).first()
-            if not it:
-                continue
-            if it.status == 'COMPLETED':
-                continue
-            # credit payee account if present
-            payee = Account.objects.filter(party_id_type=it.payee_party_id_type, party_identifier=it.payee_party_identifier).first()
-            if payee:
-                payee.balance += it.amount
-                payee.save()
-                it.payee_account = payee
-            it.status = 'COMPLETED'
-            it.fulfilment = fulfilment
-            it.completed_at = datetime.utcnow()
-            it.save()
-            total_debit += it.amount
+        outcomes = settle_transfers(results, bulk=bulk)
+    for outcome in outcomes:
+        CALLBACK_OUTCOMES.labels(outcome=outcome).inc()
 
-        # debit payer: reduce reserved and balance
-        payer = bulk.payer_account
-        payer.reserved = max(0, payer.reserved - total_debit)
-        payer.balance = max(0, payer.balance - total_debit)
-        payer.save()
-
-        bulk.state = data.get('bulkTransferState', 'COMPLETED')
-        bulk.save()
-
-    return JsonResponse({'bulkTransferId': bulk.bulk_id, 'state': bulk.state})
+    bulk.refresh_from_db(fields=['state'])
+    return JsonResponse({
+        'bulkTransferId': bulk.bulk_id,
+        'state': bulk.state,
+        'individualTransferResults': [
+            {'transferId': transfer_id, 'outcome': outcome}
+            for (transfer_id, _), outcome in zip(results, outcomes)
+        ]
+    })
 
 
 @swagger_auto_schema(method='get', responses={200: sers.PartyResponseSerializer})
@@ -366,18 +379,21 @@ def post_transfers(request):
                 results.append({'transferId': transferId, 'fulfilment': it.fulfilment})
                 continue
 
+            fulfilment = base64.b64encode(f"fulfil:{transferId}".encode()).decode()
+
+            if it and it.bulk_id:
+                # transfer of a bulk: settled like a callback (journal, payer reservation, bulk counters)
+                settle_transfers([(transferId, {'fulfilment': fulfilment})])
+                it.refresh_from_db(fields=['fulfilment'])
+                results.append({'transferId': transferId, 'fulfilment': it.fulfilment or fulfilment})
+                continue
+
             # find or create account for payee
             payee = Account.objects.filter(party_id_type=partyType, party_identifier=partyIdentifier).first()
             if not payee:
                 # create a new account record (unfunded)
                 payee = Account.objects.create(party_id_type=partyType, party_identifier=partyIdentifier, account_id=f"ACC-{uuid.uuid4().hex[:8]}", balance=0)
 
-            # credit account
-            payee.balance += amount
-            payee.save()
-
-            fulfilment = base64.b64encode(f"fulfil:{transferId}".encode()).decode()
-
             if it:
                 it.status = 'COMPLETED'
                 it.payee_account = payee
@@ -399,11 +415,19 @@ def post_transfers(request):
                     completed_at=datetime.utcnow(),
                 )
 
+            # credit account: no payer leg to journal, so an atomic F() increment, never a save of the row
+            try:
+                update_account(payee.pk, lambda account: {'balance': F('balance') + amount})
+            except AccountUpdateConflict:
+                transaction.set_rollback(True)
+                return JsonResponse({'error': 'payee account busy, retry later'}, status=409)
+
             results.append({'transferId': transferId, 'fulfilment': fulfilment})
 
     return JsonResponse({'individualTransferResults': results})
 
 
+@query_budget(1)
 @csrf_exempt
 @swagger_auto_schema(
     methods=['put'],
@@ -414,11 +438,11 @@ def post_transfers(request):
     **When:** After receiving transfer fulfillment from the hub
     
     **Process:**
-    1. Validates transfer exists and is not already completed (idempotent)
-    2. Credits payee account with transfer amount
-    3. Debits payer reserved amount atomically
-    4. Marks transfer as COMPLETED
-    5. Auto-completes bulk if all transfers done
+    1. Stores the callback in a durable inbox and acknowledges it (202)
+    2. A Celery consumer applies pending callbacks in micro-batches:
+       marks transfers COMPLETED (idempotent), journals the payer debit and payee
+       credit, releases the payer reservation once per bulk
+    3. Auto-completes bulk if all transfers done
     
     **Note:** This is an internal callback endpoint used by the SDK adapter.
     In production, this should be protected and only accessible from trusted sources.
@@ -431,8 +455,8 @@ def post_transfers(request):
         }
     ),
     responses={
-        200: openapi.Response(
-            description='Transfer callback processed successfully',
+        202: openapi.Response(
+            description='Transfer callback accepted for processing',
             schema=openapi.Schema(
                 type=openapi.TYPE_OBJECT,
                 properties={
@@ -441,7 +465,7 @@ def post_transfers(request):
                 }
             )
         ),
-        400: 'Invalid request or transfer not found',
+        400: 'Invalid JSON',
         405: 'Method not allowed'
     }
 )
@@ -450,6 +474,7 @@ def transfer_callback(request, transfer_id):
     """
     Callback endpoint for SDK scheme adapter to notify transfer completion.
     The adapter calls this when it receives a transfer fulfillment from the hub.
+    The callback is stored in the inbox and applied asynchronously (see inbox.py).
     """
     if request.method != 'PUT':
         return HttpResponse(status=405)
@@ -458,63 +483,18 @@ def transfer_callback(request, transfer_id):
         data = json.loads(request.body.decode('utf-8'))
     except Exception:
         return HttpResponseBadRequest(json.dumps({'error': 'invalid json'}), content_type='application/json')
+    if not isinstance(data, dict):
+        return HttpResponseBadRequest(json.dumps({'error': 'expected a JSON object'}), content_type='application/json')
 
-    # Find the individual transfer
-    it = IndividualTransfer.objects.filter(transfer_id=transfer_id).first()
-    if not it:
-        return HttpResponseBadRequest(json.dumps({'error': 'transfer not found'}), content_type='application/json')
-
-    # Idempotent - if already completed, return success
-    if it.status == 'COMPLETED':
-        return JsonResponse({'transferId': transfer_id, 'status': 'COMPLETED'})
-
-    # Extract transfer state from callback
-    transfer_state = data.get('currentState') or data.get('transferState') or 'COMPLETED'
-    
-    if transfer_state == 'COMMITTED' or transfer_state == 'COMPLETED':
-        with transaction.atomic():
-            # Credit payee account
-            payee = Account.objects.filter(
-                party_id_type=it.payee_party_id_type,
-                party_identifier=it.payee_party_identifier
-            ).first()
-            
-            if not payee:
-                # Create payee account if it doesn't exist
-                payee = Account.objects.create(
-                    party_id_type=it.payee_party_id_type,
-                    party_identifier=it.payee_party_identifier,
-                    account_id=f"ACC-{uuid.uuid4().hex[:8]}",
-                    balance=0
-                )
-            
-            payee.balance += it.amount
-            payee.save()
-            it.payee_account = payee
-            
-            # Debit payer account (reduce reserved and balance)
-            if it.bulk and it.bulk.payer_account:
-                payer = it.bulk.payer_account
-                payer.reserved = max(0, payer.reserved - it.amount)
-                payer.balance = max(0, payer.balance - it.amount)
-                payer.save()
-            
-            # Mark transfer as completed
-            it.status = 'COMPLETED'
-            it.fulfilment = data.get('fulfilment') or base64.b64encode(f"fulfil:{transfer_id}".encode()).decode()
-            it.completed_at = datetime.utcnow()
-            it.save()
-            
-            # Check if all transfers in bulk are completed
-            if it.bulk:
-                all_completed = not it.bulk.individuals.filter(status='PENDING').exists()
-                if all_completed:
-                    it.bulk.state = 'COMPLETED'
-                    it.bulk.save()
-
-    return JsonResponse({'transferId': transfer_id, 'status': it.status})
+    CALLBACKS_RECEIVED.inc()
+
+    # Acknowledge quickly: the callback is applied in micro-batches by the inbox consumer
+    enqueue_callback(transfer_id, data)
 
+    return JsonResponse({'transferId': transfer_id, 'status': 'ACCEPTED'}, status=202)
 
+
+@query_budget(2)
 @swagger_auto_schema(
     method='get',
     operation_description="""
@@ -562,34 +542,28 @@ def transfer_callback(request, transfer_id):
 @permission_classes([IsAuthenticated])
 def bulk_status(request, bulk_id):
     """Return the bulk status and the list of individual transfer states."""
-    bulk = BulkTransfer.objects.filter(bulk_id=bulk_id).first()
+    bulk = BulkTransfer.objects.select_related('payer_account').filter(bulk_id=bulk_id).first()
     if not bulk:
         return HttpResponse(status=404)
     
     # Vérifier que le bulk appartient à l'organisation de l'utilisateur
-    if bulk.payer_account.organization != request.user.organization:
+    if bulk.payer_account.organization_id != request.user.organization_id:
         return HttpResponse(
             json.dumps({'error': 'Accès interdit'}),
             status=403,
             content_type='application/json'
         )
 
-    # Récupérer tous les transferts individuels
-    all_individuals = bulk.individuals.all()
-    total_count = all_individuals.count()
-    completed_count = all_individuals.filter(status='COMPLETED').count()
-    failed_count = all_individuals.filter(status='FAILED').count()
+    # Compteurs maintenus par les chemins de règlement (pas de COUNT par état)
+    total_count = bulk.transfers_count
+    completed_count = bulk.completed_count
+    failed_count = bulk.failed_count
     
     # Calculer la progression
     progress_percent = (completed_count + failed_count) / total_count * 100 if total_count > 0 else 0
 
     individuals = []
-    for it in all_individuals:
-        # Récupérer les informations du bénéficiaire depuis le compte ou le CSV original
-        payee_name = None
-        if it.payee_account:
-            payee_name = it.payee_account.account_holder_name
-        
+    for it in bulk.individuals.order_by('id'):
         individuals.append({
             'transferId': it.transfer_id,
             'amount': it.amount,
@@ -599,7 +573,8 @@ def bulk_status(request, bulk_id):
             'completed_at': it.completed_at.isoformat() if it.completed_at else None,
             'payee_party_id_type': it.payee_party_id_type,
             'payee_party_identifier': it.payee_party_identifier,
-            'payee_name': payee_name,
+            # Account ne porte pas de nom de titulaire : le nom n'est connu que du scheme adapter
+            'payee_name': None,
             'error_message': getattr(it, 'error_description', None) or getattr(it, 'error_code', None),
         })
 
@@ -619,6 +594,7 @@ def bulk_status(request, bulk_id):
     return JsonResponse(data)
 
 
+@query_budget(2)
 @swagger_auto_schema(
     method='get',
     operation_description="""
@@ -629,7 +605,8 @@ def bulk_status(request, bulk_id):
     - SUPERVISEUR : Voit tous les transferts de son organisation (lecture seule)
     
     **Filtres disponibles:**
-    - `state`: Filtrer par état (PENDING, PROCESSING, COMPLETED, FAILED)
+    - `state`: Filtrer par état (PENDING, PROCESSING, COMPLETED, FAILED, PARTIALLY_COMPLETED) ;
+      les transferts individuels EXPIRED sont comptés dans `failed_count`
     - `start_date`: Date de début (format: YYYY-MM-DD)
     - `end_date`: Date de fin (format: YYYY-MM-DD)
     - `limit`: Nombre de résultats (défaut: 50, max: 200)
@@ -671,7 +648,7 @@ def list_bulk_transfers(request):
     
     # Filtrer par organisation de l'utilisateur
     queryset = BulkTransfer.objects.filter(
-        payer_account__organization=request.user.organization
+        payer_account__organization_id=request.user.organization_id
     ).select_related('payer_account', 'payer_account__organization')
     
     # Filtres optionnels
@@ -706,20 +683,15 @@ def list_bulk_transfers(request):
     # Serialiser les résultats
     bulk_list = []
     for bulk in results:
-        # Compter les transferts par état
-        transfers_count = bulk.individuals.count()
-        completed_count = bulk.individuals.filter(status='COMPLETED').count()
-        failed_count = bulk.individuals.filter(status='FAILED').count()
-        
         bulk_list.append({
             'id': bulk.id,
             'bulk_id': bulk.bulk_id,
             'state': bulk.state,
             'total_amount': bulk.total_amount,
             'currency': bulk.currency,
-            'transfers_count': transfers_count,
-            'completed_count': completed_count,
-            'failed_count': failed_count,
+            'transfers_count': bulk.transfers_count,
+            'completed_count': bulk.completed_count,
+            'failed_count': bulk.failed_count,
             'payer_account': bulk.payer_account.account_id if bulk.payer_account else None,
             'organization': bulk.payer_account.organization.name if bulk.payer_account and bulk.payer_account.organization else None,
             'created_at': bulk.created_at.isoformat() if bulk.created_at else None,
@@ -734,12 +706,15 @@ def list_bulk_transfers(request):
     })
 
 
+@query_budget(2)
 @swagger_auto_schema(
     method='get',
     operation_description="""
     Récupère les détails complets d'un transfert en masse spécifique.
     
     Inclut tous les transferts individuels avec leur état, montant, et destinataire.
+    Dans `statistics`, `failed` compte aussi les transferts EXPIRED (détaillés dans
+    `expired`), comme `failed_count` du bulk.
     
     **Permissions:**
     - Accessible uniquement aux utilisateurs de la même organisation
@@ -768,7 +743,7 @@ def get_bulk_transfer_details(request, bulk_id):
         )
     
     # Vérifier que l'utilisateur appartient à la même organisation
-    if bulk.payer_account and bulk.payer_account.organization != request.user.organization:
+    if bulk.payer_account and bulk.payer_account.organization_id != request.user.organization_id:
         return Response(
             {'error': 'Accès refusé : ce transfert appartient à une autre organisation'},
             status=status.HTTP_403_FORBIDDEN
@@ -778,7 +753,9 @@ def get_bulk_transfer_details(request, bulk_id):
     individual_transfers = bulk.individuals.all().order_by('id')
     
     transfers_data = []
+    status_counts = Counter()
     for transfer in individual_transfers:
+        status_counts[transfer.status] += 1
         transfers_data.append({
             'id': transfer.id,
             'transfer_id': transfer.transfer_id,
@@ -792,12 +769,14 @@ def get_bulk_transfer_details(request, bulk_id):
             'completed_at': transfer.completed_at.isoformat() if transfer.completed_at else None,
         })
     
-    # Statistiques
-    total_transfers = individual_transfers.count()
-    completed = individual_transfers.filter(status='COMPLETED').count()
-    failed = individual_transfers.filter(status='FAILED').count()
-    pending = individual_transfers.filter(status='PENDING').count()
-    processing = individual_transfers.filter(status='PROCESSING').count()
+    # Statistiques, comptées sur les transferts déjà chargés
+    total_transfers = len(transfers_data)
+    completed = status_counts['COMPLETED']
+    # Un transfert expiré compte comme échec, comme dans BulkTransfer.failed_count
+    expired = status_counts['EXPIRED']
+    failed = status_counts['FAILED'] + expired
+    pending = status_counts['PENDING']
+    processing = status_counts['PROCESSING']
     
     return Response({
         'bulk_id': bulk.bulk_id,
@@ -817,6 +796,7 @@ def get_bulk_transfer_details(request, bulk_id):
             'total': total_transfers,
             'completed': completed,
             'failed': failed,
+            'expired': expired,
             'pending': pending,
             'processing': processing,
             'success_rate': round((completed / total_transfers * 100) if total_transfers > 0 else 0, 2),
@@ -824,3 +804,129 @@ def get_bulk_transfer_details(request, bulk_id):
         'created_at': bulk.created_at.isoformat() if bulk.created_at else None,
         'individual_transfers': transfers_data,
     })
+
+
+@query_budget(2)
+@swagger_auto_schema(
+    method='get',
+    operation_description="""
+    Rapport de performance d'un transfert en masse, pour la planification de capacité.
+    
+    **Contenu:**
+    - `timeline` : création, premier / dernier envoi, premier / dernier règlement, fin
+    - `throughput` : transferts envoyés et réglés par seconde, global et par intervalle
+      (`bucket_seconds`, au plus 60 intervalles)
+    - `latency` : percentiles (p50, p90, p95, p99) par étape — attente en file
+      (`queue_wait`), réponse du scheme adapter (`adapter_response`), callback
+      (`settlement`), de bout en bout (`end_to_end`)
+    - `slowest_payee_fsps` : FSP bénéficiaires classés par p95 envoi → règlement
+    
+    **Paramètres:**
+    - `fsp_limit` : nombre de FSP retournés (défaut: 10, max: 100)
+    """,
+    manual_parameters=[
+        openapi.Parameter('fsp_limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=False),
+    ],
+    responses={
+        200: openapi.Response(description='Rapport de performance du transfert en masse'),
+        404: 'Transfert non trouvé',
+        403: 'Accès refusé (pas la même organisation)'
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def bulk_performance_report(request, bulk_id):
+    """Rapport de performance (débit, latences, FSP les plus lents) d'un transfert en masse."""
+    bulk = BulkTransfer.objects.select_related('payer_account').filter(bulk_id=bulk_id).first()
+    if not bulk:
+        return HttpResponse(json.dumps({'error': 'bulk not found'}), status=404, content_type='application/json')
+    if bulk.payer_account.organization_id != request.user.organization_id:
+        return HttpResponse(json.dumps({'error': 'Accès interdit'}), status=403, content_type='application/json')
+
+    try:
+        fsp_limit = min(int(request.GET.get('fsp_limit', 10)), 100)
+    except ValueError:
+        return HttpResponseBadRequest(json.dumps({'error': 'fsp_limit must be an integer'}), content_type='application/json')
+    return JsonResponse(bulk_performance(bulk, fsp_limit=fsp_limit))
+
+
+def _dead_letter_queryset(params):
+    """Filtre les lettres mortes non remises en file selon bulk_id et/ou transfer_ids."""
+    queryset = DeadLetter.objects.filter(requeued_at__isnull=True)
+    bulk_id = params.get('bulk_id')
+    if bulk_id:
+        queryset = queryset.filter(transfer__bulk__bulk_id=bulk_id)
+    transfer_ids = params.get('transfer_ids')
+    if transfer_ids:
+        queryset = queryset.filter(transfer__transfer_id__in=transfer_ids)
+    return queryset
+
+
+@query_budget(2)
+@swagger_auto_schema(
+    method='get',
+    operation_description="""
+    Liste les transferts en lettre morte (envoi au scheme adapter définitivement échoué)
+    non encore remis en file. Réservé aux administrateurs.
+    """,
+    manual_parameters=[
+        openapi.Parameter('bulk_id', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=False),
+    ],
+    responses={200: 'Liste des lettres mortes', 403: 'Permission refusée (admin requis)'}
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def list_dead_letters(request):
+    """Liste les lettres mortes en attente, les plus récentes d'abord."""
+    limit = min(int(request.GET.get('limit', 100)), 500)
+    queryset = _dead_letter_queryset({'bulk_id': request.GET.get('bulk_id')})
+    total = queryset.count()
+    rows = queryset.order_by('-created_at').values(
+        'transfer__transfer_id', 'transfer__bulk__bulk_id', 'transfer__status', 'reason', 'attempts', 'created_at'
+    )[:limit]
+    return Response({
+        'total': total,
+        'count': len(rows),
+        'results': [
+            {
+                'transferId': row['transfer__transfer_id'],
+                'bulkTransferId': row['transfer__bulk__bulk_id'],
+                'status': row['transfer__status'],
+                'reason': row['reason'],
+                'attempts': row['attempts'],
+                'created_at': row['created_at'].isoformat(),
+            }
+            for row in rows
+        ]
+    })
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_description="""
+    Remet en file les transferts en lettre morte : chacun repart pour un cycle complet
+    de tentatives (backoff exponentiel). Sans filtre, toutes les lettres mortes en attente
+    sont remises en file. Les transferts qui ne sont plus PENDING (expirés entre-temps)
+    sont ignorés. Réservé aux administrateurs.
+    """,
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'bulk_id': openapi.Schema(type=openapi.TYPE_STRING),
+            'transfer_ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING)),
+        }
+    ),
+    responses={200: 'Transferts remis en file', 403: 'Permission refusée (admin requis)'}
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def requeue_dead_letter_transfers(request):
+    """Remet en file des lettres mortes."""
+    requeued, skipped = requeue_dead_letters(_dead_letter_queryset(request.data))
+    return Response({
+        'requeued': len(requeued),
+        'transfer_ids': requeued,
+        'skipped': skipped,
+    })
+
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.monitoring'
+
+    def ready(self):
+        from .tracing import configure_tracing
+
+        configure_tracing()
+        # Métriques et traces des tâches, serveur d'export des workers Celery
+        from . import signals  # noqa: F401
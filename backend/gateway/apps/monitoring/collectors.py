@@ -0,0 +1,57 @@
+"""
+Métriques lues à la collecte : transferts en vol et profondeur des files.
+Calculées par le seul endpoint /metrics du web (une requête agrégée par
+file), pas par chaque processus.
+"""
+import logging
+
+from django.db.models import Count, Q
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+
+def _broker_queue_depth():
+    """Nombre de messages en attente dans la file Celery par défaut (None si le broker est injoignable)."""
+    from gateway.celery import app
+
+    try:
+        with app.connection_for_read() as conn:
+            queue = app.conf.task_default_queue
+            return conn.default_channel.queue_declare(queue=queue, passive=True).message_count
+    except Exception as e:
+        logger.debug(f"Profondeur de la file Celery indisponible: {e}")
+        return None
+
+
+class PipelineCollector:
+    """Transferts en vol et files d'attente du pipeline (outbox, callbacks, lettres mortes, broker)."""
+
+    def collect(self):
+        from apps.bulk.models import CallbackInbox, DeadLetter, IndividualTransfer, OutboxMessage
+
+        in_flight = GaugeMetricFamily(
+            'gateway_transfers_in_flight',
+            "Transferts PENDING, selon qu'ils ont été envoyés au scheme adapter ou non",
+            labels=['dispatched']
+        )
+        counts = IndividualTransfer.objects.filter(status='PENDING').aggregate(
+            dispatched=Count('pk', filter=Q(dispatched_at__isnull=False)),
+            waiting=Count('pk', filter=Q(dispatched_at__isnull=True)),
+        )
+        in_flight.add_metric(['true'], counts['dispatched'])
+        in_flight.add_metric(['false'], counts['waiting'])
+        yield in_flight
+
+        depth = GaugeMetricFamily(
+            'gateway_queue_depth',
+            "Messages en attente par file",
+            labels=['queue']
+        )
+        depth.add_metric(['outbox'], OutboxMessage.objects.filter(published_at__isnull=True).count())
+        depth.add_metric(['callback_inbox'], CallbackInbox.objects.filter(processed_at__isnull=True).count())
+        depth.add_metric(['dead_letter'], DeadLetter.objects.filter(requeued_at__isnull=True).count())
+        broker = _broker_queue_depth()
+        if broker is not None:
+            depth.add_metric(['celery'], broker)
+        yield depth
@@ -0,0 +1,149 @@
+"""
+Métriques Prometheus du pipeline de transferts.
+
+Chaque étape du pipeline (dépôt du CSV, orchestration, appels au scheme
+adapter, callbacks, flux SSE, tâches Celery) a son histogramme de durée et
+ses compteurs par issue. Les profondeurs de files et les transferts en vol
+sont lus à la collecte (voir collectors.py).
+
+Web (gunicorn) et workers Celery tournent en plusieurs processus : définir
+PROMETHEUS_MULTIPROC_DIR (répertoire vide au démarrage) pour que l'export
+agrège les métriques de tous les processus.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+
+# Étapes courtes (requêtes, lots) et longues (orchestration d'un bulk complet)
+FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SLOW_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+UPLOAD_STAGE_SECONDS = Histogram(
+    'gateway_bulk_upload_stage_seconds',
+    "Durée des étapes du dépôt d'un CSV (parse, validate, insert, reserve, total)",
+    ['stage'], buckets=FAST_BUCKETS
+)
+UPLOADS = Counter(
+    'gateway_bulk_uploads',
+    "Dépôts de CSV par issue (accepted, rejected, forbidden, conflict)",
+    ['outcome']
+)
+UPLOAD_ROWS = Counter(
+    'gateway_bulk_upload_rows',
+    "Transferts individuels insérés par les dépôts acceptés"
+)
+
+ORCHESTRATION_SECONDS = Histogram(
+    'gateway_orchestration_seconds',
+    "Durée d'une exécution de orchestrate_bulk, par statut",
+    ['status'], buckets=SLOW_BUCKETS
+)
+TRANSFER_DISPATCHES = Counter(
+    'gateway_transfer_dispatches',
+    "Envois de transferts au scheme adapter, par issue",
+    ['outcome']
+)
+ADAPTER_REQUEST_SECONDS = Histogram(
+    'gateway_adapter_request_seconds',
+    "Latence des appels au scheme adapter, par endpoint et issue",
+    ['endpoint', 'outcome'], buckets=FAST_BUCKETS
+)
+
+CALLBACKS_RECEIVED = Counter(
+    'gateway_callbacks_received',
+    "Callbacks de transfert reçus du scheme adapter"
+)
+CALLBACK_OUTCOMES = Counter(
+    'gateway_callback_outcomes',
+    "Callbacks appliqués, par issue (APPLIED, DUPLICATE, UNKNOWN, IGNORED, ERROR)",
+    ['outcome']
+)
+CALLBACK_BATCH_SECONDS = Histogram(
+    'gateway_callback_batch_apply_seconds',
+    "Durée d'application d'un micro-lot de callbacks",
+    buckets=FAST_BUCKETS
+)
+CALLBACK_LAG_SECONDS = Histogram(
+    'gateway_callback_lag_seconds',
+    "Délai entre la réception d'un callback et son application",
+    buckets=FAST_BUCKETS
+)
+
+SSE_STREAMS = Gauge(
+    'gateway_sse_streams',
+    "Flux SSE ouverts, par type (bulk, organization)",
+    ['stream'], multiprocess_mode='livesum'
+)
+SSE_EVENTS = Counter(
+    'gateway_sse_events_sent',
+    "Événements SSE envoyés, par type de flux",
+    ['stream']
+)
+
+CELERY_TASK_SECONDS = Histogram(
+    'gateway_celery_task_seconds',
+    "Durée des tâches Celery, par tâche et état final",
+    ['task', 'state'], buckets=SLOW_BUCKETS
+)
+
+EMAILS = Counter(
+    'gateway_emails',
+    "Emails de la file d'envoi, par issue (queued, sent, retried, failed)",
+    ['outcome']
+)
+
+# Relevés par vue de QueryBudgetMiddleware (développement)
+VIEW_DB_QUERIES = Histogram(
+    'gateway_view_db_queries',
+    "Requêtes SQL exécutées par requête HTTP, par vue",
+    ['view'], buckets=(1, 2, 3, 5, 10, 20, 50, 100, 500, 1000)
+)
+VIEW_DB_SECONDS = Histogram(
+    'gateway_view_db_seconds',
+    "Temps SQL cumulé par requête HTTP, par vue",
+    ['view'], buckets=FAST_BUCKETS
+)
+VIEW_QUERY_BUDGET_EXCEEDED = Counter(
+    'gateway_view_query_budget_exceeded',
+    "Requêtes HTTP ayant dépassé le budget de requêtes SQL de leur vue",
+    ['view']
+)
+
+
+@contextmanager
+def observe(histogram, **labels):
+    """Mesure la durée du bloc dans l'histogramme ; le bloc peut compléter les labels via le dict retourné."""
+    labels = dict(labels)
+    start = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        metric = histogram.labels(**labels) if labels else histogram
+        metric.observe(time.perf_counter() - start)
+
+
+class StageTimer:
+    """Chronomètre d'étapes successives : lap(stage) observe la durée écoulée depuis l'étape précédente."""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.histogram.labels(stage=stage).observe(now - self.last)
+        self.last = now
+
+    def total(self, stage='total'):
+        self.histogram.labels(stage=stage).observe(time.perf_counter() - self.start)
+
+
+def metrics_registry():
+    """Registre à exporter : agrégat des processus en mode multiprocessus, registre global sinon."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
@@ -0,0 +1,175 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from opentelemetry import trace
+
+from .metrics import VIEW_DB_QUERIES, VIEW_DB_SECONDS, VIEW_QUERY_BUDGET_EXCEEDED
+from .profiling import is_slow, profiling_requested, record_slow_request, save_profile, staff_user, start_profiler
+from .queries import record_queries, view_budget
+from .tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+
+class DualModeMiddleware:
+    """
+    Base of the middlewares below: they run in the handler's own mode. Under
+    ASGI the chain stays asynchronous, so an async view (long-poll, SSE) waits
+    on the event loop instead of holding a thread through async_to_sync.
+    Subclasses implement both handle(request) and __acall__(request).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+class TracingMiddleware(DualModeMiddleware):
+    """
+    Open a server span for every request, child of the caller's trace context
+    when the request carries a `traceparent` header. The span is named after
+    the matched route and carries the route's bulk_id / transfer_id.
+    """
+
+    def handle(self, request):
+        with self.open_span(request) as span:
+            response = self.get_response(request)
+            self.close_span(span, request, response)
+            return response
+
+    async def __acall__(self, request):
+        with self.open_span(request) as span:
+            response = await self.get_response(request)
+            self.close_span(span, request, response)
+            return response
+
+    def open_span(self, request):
+        carrier = {'traceparent': request.headers['traceparent']} if 'traceparent' in request.headers else None
+        if carrier and 'tracestate' in request.headers:
+            carrier['tracestate'] = request.headers['tracestate']
+        return start_span(
+            f"{request.method} {request.path}", carrier=carrier, kind=trace.SpanKind.SERVER,
+            **{'http.request.method': request.method, 'url.path': request.path}
+        )
+
+    def close_span(self, span, request, response):
+        match = request.resolver_match
+        if match is not None:
+            span.update_name(f"{request.method} {match.route}")
+            span.set_attribute('http.route', match.route)
+            for name in ('bulk_id', 'transfer_id'):
+                if name in match.kwargs:
+                    span.set_attribute(name, match.kwargs[name])
+        span.set_attribute('http.response.status_code', response.status_code)
+        if response.status_code >= 500:
+            span.set_status(trace.StatusCode.ERROR)
+
+
+class QueryBudgetMiddleware(DualModeMiddleware):
+    """
+    Count the SQL queries and database time of every request (development
+    only, see settings/dev.py). Both are exported per view in /metrics and
+    returned in the X-DB-Queries / X-DB-Time-Ms headers; a view going over
+    its declared query_budget logs a warning with its most repeated queries.
+    Queries run while a streaming response is consumed are not counted.
+    """
+
+    def handle(self, request):
+        with record_queries() as recorder:
+            response = self.get_response(request)
+        return self.report(request, response, recorder)
+
+    async def __acall__(self, request):
+        with record_queries() as recorder:
+            response = await self.get_response(request)
+        return self.report(request, response, recorder)
+
+    def report(self, request, response, recorder):
+        match = request.resolver_match
+        if match is None:
+            return response
+        view = match.func
+        name = f"{view.__module__}.{view.__name__}"
+        VIEW_DB_QUERIES.labels(view=name).observe(recorder.count)
+        VIEW_DB_SECONDS.labels(view=name).observe(recorder.duration)
+        response['X-DB-Queries'] = str(recorder.count)
+        response['X-DB-Time-Ms'] = f"{recorder.duration * 1000:.1f}"
+
+        budget = view_budget(view)
+        if budget is not None and recorder.count > budget:
+            VIEW_QUERY_BUDGET_EXCEEDED.labels(view=name).inc()
+            logger.warning(
+                f"{request.method} {request.path} ({name}): {recorder.count} queries, "
+                f"budget {budget}\n{recorder.summary()}"
+            )
+        return response
+
+
+class ProfilingMiddleware(DualModeMiddleware):
+    """
+    On-demand profiling and slow-request log (see profiling.py).
+
+    A staff user sending `X-Profile: 1` (or `?profile=1`) gets the request
+    run under the sampling profiler and the SQL recorder; the stored profile
+    id comes back in X-Profile-Id. `X-Profile: html` returns the flame graph
+    instead of the response. The flag is ignored for everyone else.
+
+    Every other request is timed and its SQL queries counted, without their
+    text; requests slower than SLOW_REQUEST_SECONDS go to the slow-request
+    log, except long-poll views (exclude_from_slow_log).
+    """
+
+    def handle(self, request):
+        mode = profiling_requested(request) if settings.PROFILING_ENABLED else None
+        user = staff_user(request) if mode else None
+        profiler = start_profiler() if user else None
+
+        started = time.perf_counter()
+        try:
+            with record_queries(keep_sql=profiler is not None) as recorder:
+                response = self.get_response(request)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+        return self.report(request, response, time.perf_counter() - started, recorder, profiler, mode, user)
+
+    async def __acall__(self, request):
+        mode = profiling_requested(request) if settings.PROFILING_ENABLED else None
+        user = await sync_to_async(staff_user)(request) if mode else None
+        # Started in the request's sync_to_async thread, where its synchronous view runs
+        profiler = await sync_to_async(start_profiler)() if user else None
+
+        started = time.perf_counter()
+        try:
+            with record_queries(keep_sql=profiler is not None) as recorder:
+                response = await self.get_response(request)
+        finally:
+            if profiler is not None:
+                await sync_to_async(profiler.stop)()
+        duration = time.perf_counter() - started
+
+        if profiler is None and not is_slow(request, duration):
+            return response
+        return await sync_to_async(self.report)(request, response, duration, recorder, profiler, mode, user)
+
+    def report(self, request, response, duration, recorder, profiler, mode, user):
+        if profiler is not None:
+            profile_id, html = save_profile(request, response, profiler, recorder, duration, user)
+            if mode == 'html':
+                response = HttpResponse(html, content_type='text/html; charset=utf-8')
+            response['X-Profile-Id'] = profile_id
+        elif is_slow(request, duration):
+            record_slow_request(request, response, duration, recorder)
+        return response
@@ -0,0 +1,181 @@
+"""
+Profilage à la demande des requêtes et journal des requêtes lentes.
+
+Un membre du staff déclenche le profilage d'une requête avec l'en-tête
+X-Profile (ou le paramètre ?profile=) : la requête s'exécute sous un
+profileur par échantillonnage (pyinstrument) et un relevé des requêtes SQL.
+Le profil est conservé dans Redis (PROFILING_TTL_SECONDS) et son identifiant
+renvoyé dans l'en-tête X-Profile-Id ; avec la valeur html, le flame graph
+remplace la réponse. Les profils se consultent sous /api/admin/profiles.
+
+Indépendamment, toute requête plus longue que SLOW_REQUEST_SECONDS est
+journalisée (logger gateway.slow_requests) et classée parmi les plus lentes
+(/api/admin/slow-requests), avec son nombre de requêtes SQL et son temps base
+de données ; le texte des requêtes n'est relevé que sous profilage. Les vues
+marquées exclude_from_slow_log (long-polls) n'y figurent pas.
+"""
+import json
+import logging
+import time
+import uuid
+import zlib
+
+from django.conf import settings
+
+from apps.bulk.events import get_redis
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger('gateway.slow_requests')
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = 'profile'
+PROFILE_KEY = 'profile:{profile_id}:{part}'
+PROFILE_INDEX_KEY = 'profiles'
+SLOW_REQUESTS_KEY = 'slow_requests'
+
+PROFILE_PARTS = ('html', 'speedscope', 'queries')
+
+
+def profiling_requested(request):
+    """Mode de profilage demandé par la requête ('store', 'html'), ou None."""
+    value = request.headers.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+    if not value or value.lower() in ('0', 'false', 'no'):
+        return None
+    return 'html' if value.lower() == 'html' else 'store'
+
+
+def staff_user(request):
+    """
+    Utilisateur staff à l'origine de la requête, ou None. L'API s'authentifie
+    par JWT dans les vues DRF : le jeton est vérifié ici, à la demande seulement.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        from apps.accounts.authentication import CachedJWTAuthentication
+
+        try:
+            authenticated = CachedJWTAuthentication().authenticate(request)
+        except Exception:
+            return None
+        user = authenticated[0] if authenticated else None
+    return user if user is not None and user.is_staff else None
+
+
+def exclude_from_slow_log(view):
+    """
+    Exclut une vue du journal des requêtes lentes : un long-poll dure par
+    construction jusqu'à son délai. À placer au-dessus des autres décorateurs
+    (csrf_exempt...) : l'attribut est lu sur la vue résolue par l'URL.
+    """
+    view.exclude_from_slow_log = True
+    return view
+
+
+def is_slow(request, duration):
+    """La requête va au journal des requêtes lentes (durée au-delà du seuil, vue non exclue)."""
+    if duration <= settings.SLOW_REQUEST_SECONDS:
+        return False
+    match = request.resolver_match
+    return not (match and getattr(match.func, 'exclude_from_slow_log', False))
+
+
+def start_profiler():
+    """Démarre un profileur par échantillonnage sur le thread courant."""
+    from pyinstrument import Profiler
+
+    profiler = Profiler(interval=settings.PROFILING_INTERVAL, async_mode='disabled')
+    profiler.start()
+    return profiler
+
+
+def _queries(recorder):
+    return [{'sql': sql, 'duration_ms': round(duration * 1000, 3)} for sql, duration in recorder.queries]
+
+
+def save_profile(request, response, profiler, recorder, duration, user):
+    """
+    Conserve le profil d'une requête (flame graph HTML, export speedscope,
+    requêtes SQL) dans Redis, compressé.
+
+    Returns:
+        tuple: (identifiant du profil, flame graph HTML)
+    """
+    from pyinstrument.renderers import SpeedscopeRenderer
+
+    session = profiler.last_session
+    html = profiler.output_html()
+    profile_id = uuid.uuid4().hex[:16]
+    summary = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 1),
+        'queries': recorder.count,
+        'db_ms': round(recorder.duration * 1000, 1),
+        'user': user.username,
+        'at': time.time(),
+    }
+    parts = {
+        'html': html,
+        'speedscope': SpeedscopeRenderer().render(session),
+        'queries': json.dumps({**summary, 'queries': _queries(recorder)}),
+    }
+    ttl = settings.PROFILING_TTL_SECONDS
+    try:
+        pipe = get_redis().pipeline()
+        for part, content in parts.items():
+            pipe.set(PROFILE_KEY.format(profile_id=profile_id, part=part), zlib.compress(content.encode()), ex=ttl)
+        pipe.lpush(PROFILE_INDEX_KEY, json.dumps(summary))
+        pipe.ltrim(PROFILE_INDEX_KEY, 0, settings.PROFILING_KEEP - 1)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Profil {profile_id} non conservé: {e}")
+    return profile_id, html
+
+
+def load_profile(profile_id, part):
+    """Contenu d'une partie d'un profil ('html', 'speedscope', 'queries'), ou None s'il a expiré."""
+    content = get_redis().get(PROFILE_KEY.format(profile_id=profile_id, part=part))
+    return zlib.decompress(content).decode() if content else None
+
+
+def recent_profiles():
+    """Résumés des derniers profils, du plus récent au plus ancien."""
+    return [json.loads(item) for item in get_redis().lrange(PROFILE_INDEX_KEY, 0, -1)]
+
+
+def record_slow_request(request, response, duration, recorder):
+    """
+    Journalise une requête lente et la classe parmi les SLOW_REQUEST_KEEP plus
+    lentes (ensemble trié Redis, score : durée).
+    """
+    match = request.resolver_match
+    sample = {
+        'method': request.method,
+        'path': request.get_full_path(),
+        'route': match.route if match else None,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 1),
+        'queries': recorder.count,
+        'db_ms': round(recorder.duration * 1000, 1),
+        'at': time.time(),
+    }
+    slow_logger.warning(
+        f"Requête lente {sample['method']} {sample['path']} : {sample['duration_ms']} ms, "
+        f"{sample['queries']} requêtes SQL ({sample['db_ms']} ms)"
+    )
+    try:
+        pipe = get_redis().pipeline()
+        pipe.zadd(SLOW_REQUESTS_KEY, {json.dumps(sample): duration})
+        pipe.zremrangebyrank(SLOW_REQUESTS_KEY, 0, -settings.SLOW_REQUEST_KEEP - 1)
+        pipe.execute()
+    except Exception as e:
+        logger.debug(f"Requête lente non classée: {e}")
+
+
+def slowest_requests(limit=None):
+    """Requêtes les plus lentes relevées, de la plus lente à la moins lente."""
+    end = (limit or settings.SLOW_REQUEST_KEEP) - 1
+    return [json.loads(item) for item in get_redis().zrevrange(SLOW_REQUESTS_KEY, 0, end)]
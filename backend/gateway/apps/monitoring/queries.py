@@ -0,0 +1,153 @@
+"""
+Budgets de requêtes SQL par vue.
+
+Une vue déclare le nombre maximal de requêtes qu'elle peut exécuter
+(query_budget). Ce budget ne dépend pas du volume de données : une vue qui
+le dépasse sur un gros bulk a une requête par ligne (N+1).
+
+- En développement, QueryBudgetMiddleware (voir middleware.py) compte les
+  requêtes et le temps SQL de chaque vue, les exporte dans /metrics et
+  journalise les dépassements.
+- Dans les tests, assert_query_budget exécute une requête HTTP et échoue si la
+  vue dépasse son budget déclaré ; assert_max_queries fait de même pour un
+  bloc de code quelconque.
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.urls import resolve
+
+# Relevés actifs dans le contexte courant. Une variable de contexte, et non un
+# wrapper par connexion : une vue synchrone servie en ASGI s'exécute dans un
+# autre thread (sync_to_async, qui recopie le contexte) que le middleware.
+_recorders = ContextVar('query_recorders', default=())
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Une vue ou un bloc de code a exécuté plus de requêtes que son budget."""
+
+    def __init__(self, label, budget, recorder):
+        self.label = label
+        self.budget = budget
+        self.recorder = recorder
+        super().__init__(
+            f"{label}: {recorder.count} requêtes SQL pour un budget de {budget}\n{recorder.summary()}"
+        )
+
+
+class QueryRecorder:
+    """
+    Relevé des requêtes exécutées (voir record_queries) : leur nombre et leur
+    durée totale, et avec keep_sql la liste des requêtes (sql, durée).
+    """
+
+    def __init__(self, keep_sql=True):
+        self.queries = [] if keep_sql else None
+        self.count = 0
+        self.duration = 0.0
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        if self.queries is not None:
+            self.queries.append((sql, duration))
+
+    def summary(self, limit=10):
+        """Requêtes les plus répétées, pour repérer un N+1 dans un message d'erreur ou un log."""
+        repeated = Counter(sql for sql, _ in self.queries).most_common(limit)
+        return '\n'.join(f"  {n} x {sql[:300]}" for sql, n in repeated)
+
+
+def _execute(execute, sql, params, many, context):
+    """Wrapper d'exécution de chaque connexion : transmet la requête aux relevés actifs."""
+    recorders = _recorders.get()
+    if not recorders:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        for recorder in recorders:
+            recorder.record(sql, duration)
+
+
+@receiver(connection_created, dispatch_uid='monitoring.queries')
+def install_wrapper(connection, **kwargs):
+    """Installe _execute sur une connexion, une seule fois."""
+    if _execute not in connection.execute_wrappers:
+        # En tête de liste : connection.execute_wrapper() retire le dernier wrapper ajouté
+        connection.execute_wrappers.insert(0, _execute)
+
+
+@contextmanager
+def record_queries(keep_sql=True):
+    """
+    Relève les requêtes exécutées dans le bloc, sur toutes les bases
+    configurées, y compris par du code synchrone appelé via sync_to_async.
+    Sans keep_sql, seuls leur nombre et leur durée totale sont relevés.
+    """
+    for connection in connections.all():
+        install_wrapper(connection)
+    recorder = QueryRecorder(keep_sql)
+    token = _recorders.set(_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _recorders.reset(token)
+
+
+def query_budget(queries):
+    """
+    Déclare le budget de requêtes SQL d'une vue, authentification comprise
+    (principal JWT déjà en cache, voir apps/accounts/authentication.py).
+    À placer au-dessus des autres décorateurs (csrf_exempt, api_view...) : le
+    budget est lu sur la vue résolue par l'URL.
+    """
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+def view_budget(view):
+    """Budget déclaré d'une vue (None si elle n'en déclare pas)."""
+    return getattr(view, 'query_budget', None)
+
+
+@contextmanager
+def assert_max_queries(budget, label='bloc'):
+    """Échoue (QueryBudgetExceeded) si le bloc exécute plus de budget requêtes."""
+    with record_queries() as recorder:
+        yield recorder
+    if recorder.count > budget:
+        raise QueryBudgetExceeded(label, budget, recorder)
+
+
+def assert_query_budget(client, method, path, **kwargs):
+    """
+    Exécute une requête avec un client de test Django et échoue si la vue
+    dépasse son budget déclaré. À appeler après avoir créé un volume de données
+    représentatif : c'est à ce volume que le budget est vérifié.
+
+    Args:
+        client: django.test.Client (authentifié si la vue l'exige)
+        method: Méthode HTTP ('get', 'put'...)
+        path: Chemin de la requête, sans query string
+        kwargs: Arguments du client (data, content_type, en-têtes...)
+
+    Returns:
+        La réponse, pour les assertions propres au test
+    """
+    view = resolve(path).func
+    budget = view_budget(view)
+    if budget is None:
+        raise AssertionError(f"{view.__module__}.{view.__name__} ne déclare pas de budget de requêtes")
+    with assert_max_queries(budget, label=f"{method.upper()} {path}"):
+        response = getattr(client, method.lower())(path, **kwargs)
+    return response
@@ -0,0 +1,83 @@
+"""
+Instrumentation des tâches Celery :
+- métriques : durée de chaque tâche par état final, et serveur HTTP d'export
+  (CELERY_METRICS_PORT) démarré par le processus principal du worker ;
+- traces : le contexte courant est ajouté aux en-têtes des messages publiés,
+  et chaque exécution ouvre un span enfant du contexte reçu.
+"""
+import logging
+import os
+import time
+
+from celery.signals import (
+    before_task_publish, task_postrun, task_prerun, worker_process_shutdown, worker_ready,
+)
+from django.conf import settings
+from opentelemetry import trace
+from prometheus_client import multiprocess, start_http_server
+
+from .metrics import CELERY_TASK_SECONDS, metrics_registry
+from .tracing import begin_span, end_span, inject_context
+
+logger = logging.getLogger(__name__)
+
+_started = {}
+_spans = {}
+
+TRACE_HEADERS = ('traceparent', 'tracestate')
+
+
+def _trace_carrier(request):
+    """Contexte de trace reçu dans les en-têtes du message."""
+    headers = getattr(request, 'headers', None) or {}
+    carrier = {}
+    for name in TRACE_HEADERS:
+        value = getattr(request, name, None) or headers.get(name)
+        if value:
+            carrier[name] = value
+    return carrier
+
+
+@before_task_publish.connect
+def _inject_trace_context(headers=None, **kwargs):
+    # Les messages publiés par l'outbox portent déjà le contexte de leur transaction
+    if headers is not None and 'traceparent' not in headers:
+        inject_context(headers)
+
+
+@task_prerun.connect
+def _task_started(task_id=None, task=None, **kwargs):
+    _started[task_id] = time.perf_counter()
+    if task is not None:
+        _spans[task_id] = begin_span(
+            f"celery {task.name}", carrier=_trace_carrier(task.request), kind=trace.SpanKind.CONSUMER,
+            **{'celery.task_name': task.name, 'celery.task_id': task_id}
+        )
+
+
+@task_postrun.connect
+def _task_finished(task_id=None, task=None, state=None, **kwargs):
+    start = _started.pop(task_id, None)
+    if start is not None and task is not None:
+        CELERY_TASK_SECONDS.labels(task=task.name, state=state or 'UNKNOWN').observe(time.perf_counter() - start)
+    span = _spans.pop(task_id, None)
+    if span is not None:
+        end_span(*span, **{'celery.state': state})
+
+
+@worker_ready.connect
+def _start_exporter(**kwargs):
+    port = settings.CELERY_METRICS_PORT
+    if not port:
+        return
+    try:
+        start_http_server(port, registry=metrics_registry())
+        logger.info(f"Export des métriques Celery sur le port {port}")
+    except OSError as e:
+        logger.warning(f"Serveur de métriques Celery non démarré: {e}")
+
+
+@worker_process_shutdown.connect
+def _mark_process_dead(pid=None, **kwargs):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,116 @@
+"""
+Traçage de bout en bout (OpenTelemetry) d'un transfert : dépôt du CSV,
+tâche d'orchestration, appel HTTP au scheme adapter, callback et règlement.
+
+Le contexte de trace (W3C traceparent) est propagé :
+- de la requête web aux tâches Celery par les en-têtes des messages (y
+  compris via l'outbox, qui conserve le contexte de la transaction) ;
+- aux appels du scheme adapter par les en-têtes HTTP ;
+- de l'envoi d'un transfert à son callback par IndividualTransfer.trace_context,
+  le callback asynchrone du scheme adapter ne transportant pas le contexte.
+
+Les spans portent les attributs bulk_id / transfer_id. L'export se fait en
+local (TRACING_EXPORTER : console, ou file en JSON lines dans TRACING_FILE).
+Sans TRACING_ENABLED, l'API OpenTelemetry reste sans effet (spans non
+enregistrés, contexte vide).
+"""
+import sys
+from contextlib import contextmanager
+
+from django.conf import settings
+from opentelemetry import context, propagate, trace
+
+TRACER_NAME = 'gateway'
+
+_enabled = False
+
+
+def configure_tracing():
+    """Installe le fournisseur de traces et l'exporteur local (une fois par processus)."""
+    global _enabled
+    if _enabled or not settings.TRACING_ENABLED:
+        return
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if settings.TRACING_EXPORTER == 'file':
+        exporter = ConsoleSpanExporter(
+            out=open(settings.TRACING_FILE, 'a', buffering=1),
+            formatter=lambda span: span.to_json(indent=None) + '\n',
+        )
+    else:
+        exporter = ConsoleSpanExporter(out=sys.stdout)
+    provider = TracerProvider(resource=Resource.create({'service.name': settings.TRACING_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _enabled = True
+
+
+def tracing_enabled():
+    return _enabled
+
+
+def get_tracer():
+    return trace.get_tracer(TRACER_NAME)
+
+
+def inject_context(carrier=None):
+    """Retourne (ou complète) un porteur contenant le contexte de trace courant."""
+    carrier = {} if carrier is None else carrier
+    propagate.inject(carrier)
+    return carrier
+
+
+def extract_context(carrier):
+    """Contexte de trace d'un porteur (dict d'en-têtes ; vide : contexte racine)."""
+    return propagate.extract(carrier or {})
+
+
+def _attributes(attributes):
+    return {k: v for k, v in attributes.items() if v is not None}
+
+
+@contextmanager
+def start_span(name, carrier=None, links=None, start_time=None, kind=trace.SpanKind.INTERNAL, **attributes):
+    """
+    Ouvre un span courant. Le parent est le contexte courant, ou celui de
+    carrier s'il est fourni. Les attributs None sont ignorés.
+    """
+    parent = extract_context(carrier) if carrier is not None else None
+    with get_tracer().start_as_current_span(
+        name, context=parent, kind=kind, links=links, start_time=start_time,
+        attributes=_attributes(attributes),
+    ) as span:
+        yield span
+
+
+def set_attributes(**attributes):
+    """Ajoute des attributs au span courant."""
+    trace.get_current_span().set_attributes(_attributes(attributes))
+
+
+def link_to(carrier):
+    """Lien vers le span d'un porteur (liste vide si le porteur est vide)."""
+    span_context = trace.get_current_span(extract_context(carrier)).get_span_context()
+    return [trace.Link(span_context)] if span_context.is_valid else []
+
+
+def begin_span(name, carrier=None, kind=trace.SpanKind.INTERNAL, **attributes):
+    """
+    Ouvre un span et le rend courant hors d'un bloc with (signaux Celery).
+
+    Returns:
+        tuple: (span, jeton) à passer à end_span
+    """
+    span = get_tracer().start_span(
+        name, context=extract_context(carrier), kind=kind, attributes=_attributes(attributes)
+    )
+    return span, context.attach(trace.set_span_in_context(span))
+
+
+def end_span(span, token, **attributes):
+    """Ferme un span ouvert par begin_span et restaure le contexte précédent."""
+    span.set_attributes(_attributes(attributes))
+    context.detach(token)
+    span.end()
@@ -0,0 +1,11 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('metrics', views.metrics, name='metrics'),
+    path('api/admin/profiles', views.list_profiles, name='list_profiles'),
+    path('api/admin/profiles/<str:profile_id>', views.get_profile, name='get_profile'),
+    path('api/admin/profiles/<str:profile_id>/speedscope', views.get_profile, {'part': 'speedscope'}, name='get_profile_speedscope'),
+    path('api/admin/profiles/<str:profile_id>/queries', views.get_profile, {'part': 'queries'}, name='get_profile_queries'),
+    path('api/admin/slow-requests', views.list_slow_requests, name='list_slow_requests'),
+]
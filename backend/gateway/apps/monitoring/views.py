@@ -0,0 +1,79 @@
+import hmac
+import json
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.registry import CollectorRegistry
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+
+from .collectors import PipelineCollector
+from .metrics import metrics_registry
+from .profiling import load_profile, recent_profiles, slowest_requests
+
+_pipeline_collector = PipelineCollector()
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint: the metrics of every web process, plus the
+    pipeline gauges (in-flight transfers, queue depths) read at scrape time.
+    Requires `Authorization: Bearer <METRICS_TOKEN>`. Without METRICS_TOKEN
+    the endpoint is refused, unless DEBUG is on (local development).
+    """
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=403)
+    elif not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return HttpResponse(status=401)
+
+    pipeline = CollectorRegistry(auto_describe=False)
+    pipeline.register(_pipeline_collector)
+    output = generate_latest(metrics_registry()) + generate_latest(pipeline)
+    return HttpResponse(output, content_type=CONTENT_TYPE_LATEST)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def list_profiles(request):
+    """Most recent on-demand profiles (see ProfilingMiddleware), newest first."""
+    return JsonResponse({'results': recent_profiles()})
+
+
+PROFILE_CONTENT_TYPES = {
+    'html': 'text/html; charset=utf-8',
+    'speedscope': 'application/json',
+    'queries': 'application/json',
+}
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def get_profile(request, profile_id, part='html'):
+    """
+    One stored profile: the flame graph (html), the speedscope export
+    (load it in https://www.speedscope.app) or the SQL queries with timings.
+    """
+    content = load_profile(profile_id, part)
+    if content is None:
+        return HttpResponse(json.dumps({'error': 'profile not found or expired'}), status=404, content_type='application/json')
+    response = HttpResponse(content, content_type=PROFILE_CONTENT_TYPES[part])
+    if part == 'speedscope':
+        response['Content-Disposition'] = f'attachment; filename="{profile_id}.speedscope.json"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def list_slow_requests(request):
+    """Slowest requests recorded by the slow-request log, slowest first (`limit`: 50 by default)."""
+    try:
+        limit = int(request.GET.get('limit', 50))
+        if limit < 1:
+            raise ValueError(limit)
+    except ValueError:
+        return HttpResponseBadRequest(json.dumps({'error': 'limit must be a positive integer'}), content_type='application/json')
+    limit = min(limit, settings.SLOW_REQUEST_KEEP)
+    return JsonResponse({'threshold_seconds': settings.SLOW_REQUEST_SECONDS, 'results': slowest_requests(limit)})
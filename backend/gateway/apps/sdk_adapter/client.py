@@ -1,31 +1,65 @@
-"""Client wrapper for calling the SDK container endpoints (squelette).
+"""Client wrapper for calling the SDK scheme adapter outbound API.
 
-The real implementation should encapsulate all HTTP calls to the `sdk` service
-and provide a clean API for the `transactions` services.
+Every call goes through the circuit breaker of its endpoint (state shared
+across workers through Redis, see resilience.py): when the adapter is down,
+calls fail fast with CircuitOpen instead of waiting for a timeout each.
+Each call is traced as a client span and carries the trace context in its
+`traceparent` header.
 """
+import time
+
 import requests
+from django.conf import settings
+from opentelemetry import trace
+
+from apps.monitoring.metrics import ADAPTER_REQUEST_SECONDS
+from apps.monitoring.tracing import inject_context, start_span
+
+from .resilience import CircuitBreaker, CircuitOpen  # noqa: F401 (re-exported for callers)
+
+
+def _timeout():
+    return (settings.ADAPTER_CONNECT_TIMEOUT, settings.ADAPTER_READ_TIMEOUT)
+
+
+def _call(endpoint, method, path, **kwargs):
+    """
+    Call the adapter through the endpoint's circuit breaker.
+    Network errors, timeouts and 5xx responses count as failures; other
+    responses are returned to the caller.
+    """
+    breaker = CircuitBreaker(f"adapter:{endpoint}")
+    breaker.check()
+    with start_span(f"adapter {method} {endpoint}", kind=trace.SpanKind.CLIENT, **{'http.request.method': method}) as span:
+        # Propagate the trace context to the adapter
+        kwargs['headers'] = inject_context(dict(kwargs.get('headers') or {}))
+        start = time.perf_counter()
+        try:
+            resp = requests.request(method, f"{settings.SCHEME_ADAPTER_URL}{path}", timeout=_timeout(), **kwargs)
+        except requests.RequestException as e:
+            ADAPTER_REQUEST_SECONDS.labels(endpoint=endpoint, outcome=type(e).__name__).observe(time.perf_counter() - start)
+            breaker.record_failure()
+            span.set_status(trace.StatusCode.ERROR, type(e).__name__)
+            raise
+        ADAPTER_REQUEST_SECONDS.labels(endpoint=endpoint, outcome=f"{resp.status_code // 100}xx").observe(time.perf_counter() - start)
+        span.set_attribute('http.response.status_code', resp.status_code)
+    if resp.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return resp
 
-SDK_BASE = 'http://sdk:4000'
 
 def lookup_party(id_type, id_value):
-    url = f"{SDK_BASE}/parties/{id_type}/{id_value}"
-    # placeholder: real code should handle headers, auth, JWS, retries
-    resp = requests.get(url)
+    resp = _call('parties', 'GET', f"/parties/{id_type}/{id_value}")
     return resp.json()
 
 
 def transfer(payload):
-    """Send a transfer request to the SDK service.
+    """Send a transfer request to the SDK scheme adapter.
 
-    payload: dict with keys 'amount','currency','payee',...
-    Returns parsed JSON response or raises on network errors.
+    payload: dict with keys 'amount','currency','to',...
+    Returns the HTTP response. Raises CircuitOpen when the adapter is known
+    to be unavailable, or requests exceptions on network errors.
     """
-    url = f"{SDK_BASE}/transfers"
-    try:
-        resp = requests.post(url, json=payload, timeout=10)
-        try:
-            return resp.json()
-        except Exception:
-            return {'status_code': resp.status_code, 'text': resp.text}
-    except Exception as e:
-        raise
+    return _call('transfers', 'POST', '/transfers', json=payload)
@@ -0,0 +1,158 @@
+"""
+Disjoncteur (circuit breaker) et cloisons (bulkheads) partagés via Redis.
+
+L'état est stocké dans Redis afin d'être commun à tous les workers Celery et
+processus web : dès qu'un endpoint du scheme adapter est déclaré indisponible,
+plus aucun worker ne l'appelle jusqu'à la fin de la période d'ouverture.
+Une indisponibilité de Redis n'empêche jamais les appels (fail-open).
+"""
+import logging
+import time
+import uuid
+
+import redis
+from django.conf import settings
+
+from apps.bulk.events import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpen(Exception):
+    """Le disjoncteur de l'endpoint est ouvert : l'appel n'a pas été tenté."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit {name} ouvert, nouvel essai dans {retry_after}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur d'un endpoint du scheme adapter.
+
+    - fermé : les appels passent ; CIRCUIT_FAILURE_THRESHOLD échecs dans une
+      fenêtre de CIRCUIT_FAILURE_WINDOW secondes l'ouvrent ;
+    - ouvert : aucun appel pendant CIRCUIT_OPEN_SECONDS ;
+    - semi-ouvert : à l'expiration, un seul appel de test est autorisé ; son
+      succès referme le disjoncteur, son échec le rouvre.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.failures_key = f"circuit:{name}:failures"
+        self.open_key = f"circuit:{name}:open"
+        self.probe_key = f"circuit:{name}:probe"
+
+    def retry_after(self):
+        """Secondes restantes avant la fin de l'ouverture (0 si fermé)."""
+        try:
+            return max(0, get_redis().ttl(self.open_key))
+        except redis.RedisError:
+            return 0
+
+    def allow(self):
+        """Indique si un appel peut être tenté maintenant."""
+        try:
+            client = get_redis()
+            if client.exists(self.open_key):
+                return False
+            if int(client.get(self.failures_key) or 0) < settings.CIRCUIT_FAILURE_THRESHOLD:
+                return True
+            # Semi-ouvert : un seul appel de test à la fois
+            return bool(client.set(self.probe_key, 1, nx=True, ex=settings.CIRCUIT_OPEN_SECONDS))
+        except redis.RedisError:
+            return True
+
+    def check(self):
+        """Lève CircuitOpen si l'appel ne peut pas être tenté."""
+        if not self.allow():
+            raise CircuitOpen(self.name, self.retry_after() or settings.CIRCUIT_OPEN_SECONDS)
+
+    def record_success(self):
+        try:
+            get_redis().delete(self.failures_key, self.probe_key)
+        except redis.RedisError:
+            pass
+
+    def record_failure(self):
+        try:
+            client = get_redis()
+            pipe = client.pipeline()
+            pipe.incr(self.failures_key)
+            pipe.expire(self.failures_key, settings.CIRCUIT_FAILURE_WINDOW, nx=True)
+            failures, _ = pipe.execute()
+            if failures >= settings.CIRCUIT_FAILURE_THRESHOLD:
+                # Ouverture (ou réouverture après un appel de test en échec) ; le compteur
+                # est conservé au-delà de l'ouverture pour passer ensuite en semi-ouvert
+                pipe = client.pipeline()
+                pipe.set(self.open_key, 1, ex=settings.CIRCUIT_OPEN_SECONDS)
+                pipe.expire(self.failures_key, settings.CIRCUIT_OPEN_SECONDS * 2)
+                pipe.delete(self.probe_key)
+                pipe.execute()
+                logger.warning(f"Circuit {self.name} ouvert après {failures} échecs")
+        except redis.RedisError:
+            pass
+
+
+class Bulkhead:
+    """
+    Cloison : limite le nombre d'occupants simultanés d'une ressource (par
+    exemple les orchestrations d'une même organisation), tous processus
+    confondus. Chaque place est un bail horodaté dans un ensemble trié Redis ;
+    un bail non libéré (worker tué) expire après lease_seconds.
+    """
+
+    def __init__(self, name, limit, lease_seconds):
+        self.key = f"bulkhead:{name}"
+        self.limit = limit
+        self.lease_seconds = lease_seconds
+
+    def acquire(self):
+        """Retourne un jeton si une place est libre, None sinon."""
+        token = uuid.uuid4().hex
+        now = time.time()
+        try:
+            pipe = get_redis().pipeline()
+            pipe.zremrangebyscore(self.key, '-inf', now - self.lease_seconds)
+            pipe.zadd(self.key, {token: now})
+            pipe.zrank(self.key, token)
+            pipe.expire(self.key, self.lease_seconds)
+            _, _, rank, _ = pipe.execute()
+            if rank < self.limit:
+                return token
+            get_redis().zrem(self.key, token)
+            return None
+        except redis.RedisError:
+            return token
+
+    def renew(self, token):
+        """Prolonge le bail d'un jeton détenu (traitements longs)."""
+        try:
+            get_redis().zadd(self.key, {token: time.time()}, xx=True)
+        except redis.RedisError:
+            pass
+
+    def release(self, token):
+        try:
+            get_redis().zrem(self.key, token)
+        except redis.RedisError:
+            pass
+
+
+def organization_bulkhead(organization_id):
+    """Cloison des orchestrations d'une organisation."""
+    return Bulkhead(
+        f"orchestration:{organization_id}",
+        settings.ADAPTER_BULKHEAD_PER_ORGANIZATION,
+        settings.ADAPTER_BULKHEAD_LEASE_SECONDS,
+    )
+
+
+def bulk_orchestration_lease(bulk_id):
+    """
+    Bail exclusif de l'orchestration d'un bulk : une tâche publiée deux fois
+    (livraison « au moins une fois » de l'outbox) ne l'orchestre qu'une fois
+    à la fois.
+    """
+    return Bulkhead(f"orchestration:bulk:{bulk_id}", 1, settings.ADAPTER_BULKHEAD_LEASE_SECONDS)
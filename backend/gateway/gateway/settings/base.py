@@ -33,16 +33,17 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'corsheaders',
     'rest_framework',
-    'rest_framework_simplejwt.token_blacklist',
     'drf_yasg',
     'apps.accounts',
     'apps.api',
     'apps.transactions',
     'apps.sdk_adapter',
     'apps.bulk',
+    'apps.monitoring',
 ]
 
 MIDDLEWARE = [
+    'apps.monitoring.middleware.TracingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -50,6 +51,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'apps.monitoring.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'gateway.urls'
@@ -94,6 +96,23 @@ STATIC_URL = '/static/'
 
 # URL du SDK Scheme Adapter Mojaloop (outbound API)
 SCHEME_ADAPTER_URL = os.environ.get('SCHEME_ADAPTER_URL', 'http://mojaloop-connector-load-test:4001')
+ADAPTER_CONNECT_TIMEOUT = float(os.environ.get('ADAPTER_CONNECT_TIMEOUT', '3'))
+ADAPTER_READ_TIMEOUT = float(os.environ.get('ADAPTER_READ_TIMEOUT', '30'))
+
+# Disjoncteur par endpoint du scheme adapter (état partagé dans Redis)
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_FAILURE_WINDOW = int(os.environ.get('CIRCUIT_FAILURE_WINDOW', '30'))
+CIRCUIT_OPEN_SECONDS = int(os.environ.get('CIRCUIT_OPEN_SECONDS', '30'))
+
+# Cloison : orchestrations simultanées par organisation
+ADAPTER_BULKHEAD_PER_ORGANIZATION = int(os.environ.get('ADAPTER_BULKHEAD_PER_ORGANIZATION', '2'))
+ADAPTER_BULKHEAD_LEASE_SECONDS = int(os.environ.get('ADAPTER_BULKHEAD_LEASE_SECONDS', '120'))
+ADAPTER_BULKHEAD_RETRY_SECONDS = int(os.environ.get('ADAPTER_BULKHEAD_RETRY_SECONDS', '15'))
+
+# Nouvelles tentatives d'envoi d'un transfert (backoff exponentiel avec gigue) avant lettre morte
+TRANSFER_RETRY_MAX_ATTEMPTS = int(os.environ.get('TRANSFER_RETRY_MAX_ATTEMPTS', '5'))
+TRANSFER_RETRY_BASE_SECONDS = float(os.environ.get('TRANSFER_RETRY_BASE_SECONDS', '5'))
+TRANSFER_RETRY_MAX_SECONDS = float(os.environ.get('TRANSFER_RETRY_MAX_SECONDS', '300'))
 
 # Configuration Celery avec Redis comme broker
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://redis:6379/0')
@@ -102,6 +121,90 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+# Tâches périodiques (celery beat)
+CELERY_BEAT_SCHEDULE = {
+    'fold-account-shards': {
+        'task': 'apps.bulk.tasks.fold_account_shards',
+        'schedule': float(os.environ.get('ACCOUNT_SHARD_FOLD_SECONDS', '30')),
+    },
+    'snapshot-account-balances': {
+        'task': 'apps.bulk.tasks.snapshot_account_balances',
+        'schedule': float(os.environ.get('BALANCE_SNAPSHOT_SECONDS', '60')),
+    },
+    'process-callback-inbox': {
+        'task': 'apps.bulk.tasks.process_callback_inbox',
+        'schedule': float(os.environ.get('CALLBACK_INBOX_SWEEP_SECONDS', '10')),
+    },
+    'expire-stale-reservations': {
+        'task': 'apps.bulk.tasks.expire_stale_reservations',
+        'schedule': float(os.environ.get('RESERVATION_SWEEP_SECONDS', '300')),
+    },
+    'send-queued-emails': {
+        'task': 'apps.accounts.tasks.send_queued_emails',
+        'schedule': float(os.environ.get('EMAIL_QUEUE_SWEEP_SECONDS', '30')),
+    },
+}
+
+# Nombre de sous-compteurs par compte pour répartir les écritures concurrentes
+ACCOUNT_SHARD_COUNT = int(os.environ.get('ACCOUNT_SHARD_COUNT', '8'))
+# Tentatives d'une mise à jour optimiste (version) de la ligne Account avant abandon
+ACCOUNT_UPDATE_RETRIES = int(os.environ.get('ACCOUNT_UPDATE_RETRIES', '5'))
+# Écritures du journal intégrées aux snapshots de solde par transaction
+BALANCE_SNAPSHOT_BATCH_SIZE = int(os.environ.get('BALANCE_SNAPSHOT_BATCH_SIZE', '5000'))
+# Callbacks de transfert : taille des micro-lots et délai de regroupement avant traitement
+CALLBACK_BATCH_SIZE = int(os.environ.get('CALLBACK_BATCH_SIZE', '200'))
+CALLBACK_NUDGE_SECONDS = int(os.environ.get('CALLBACK_NUDGE_SECONDS', '1'))
+# Expiration des transferts restés PENDING : délai, taille des lots et nombre de lots par passage
+RESERVATION_TTL_SECONDS = int(os.environ.get('RESERVATION_TTL_SECONDS', '86400'))
+RESERVATION_SWEEP_BATCH_SIZE = int(os.environ.get('RESERVATION_SWEEP_BATCH_SIZE', '500'))
+RESERVATION_SWEEP_MAX_BATCHES = int(os.environ.get('RESERVATION_SWEEP_MAX_BATCHES', '20'))
+
+# Outbox transactionnel des tâches Celery : taille des lots publiés par le relais,
+# attente maximale entre deux passages, attente maximale après un échec du broker
+# et durée de conservation des messages publiés
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '100'))
+OUTBOX_POLL_SECONDS = float(os.environ.get('OUTBOX_POLL_SECONDS', '1'))
+OUTBOX_MAX_BACKOFF_SECONDS = float(os.environ.get('OUTBOX_MAX_BACKOFF_SECONDS', '30'))
+OUTBOX_RETENTION_SECONDS = int(os.environ.get('OUTBOX_RETENTION_SECONDS', '86400'))
+
+# Redis pub/sub pour la diffusion temps réel des changements d'état (SSE)
+EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL', CELERY_BROKER_URL)
+# Intervalle maximal sans événement avant resynchronisation du flux SSE sur la base
+SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS', '15'))
+# Journal borné des derniers événements par bulk, pour la reprise via Last-Event-ID
+SSE_EVENT_LOG_SIZE = int(os.environ.get('SSE_EVENT_LOG_SIZE', '100'))
+SSE_EVENT_LOG_TTL = int(os.environ.get('SSE_EVENT_LOG_TTL', '86400'))
+# Délai de reconnexion suggéré aux clients EventSource (millisecondes)
+SSE_RETRY_MS = int(os.environ.get('SSE_RETRY_MS', '3000'))
+# Regroupement des événements de progression (gros bulks) : débit maximal par
+# abonné, pas de progression minimal (%) et délai d'envoi d'un changement en attente
+SSE_MAX_EVENTS_PER_SECOND = float(os.environ.get('SSE_MAX_EVENTS_PER_SECOND', '2'))
+SSE_PROGRESS_STEP_PERCENT = float(os.environ.get('SSE_PROGRESS_STEP_PERCENT', '1'))
+SSE_PROGRESS_INTERVAL_MS = int(os.environ.get('SSE_PROGRESS_INTERVAL_MS', '1000'))
+
+# Métriques Prometheus : jeton exigé par /metrics (vide = endpoint refusé, sauf en
+# DEBUG) et port d'export des workers Celery (0 = désactivé). En multiprocessus
+# (gunicorn, Celery prefork), définir PROMETHEUS_MULTIPROC_DIR.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+CELERY_METRICS_PORT = int(os.environ.get('CELERY_METRICS_PORT', '9808'))
+
+# Traces OpenTelemetry (upload → tâche → scheme adapter → callback), exportées en local :
+# console (sortie standard) ou file (JSON lines dans TRACING_FILE)
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'False') == 'True'
+TRACING_EXPORTER = os.environ.get('TRACING_EXPORTER', 'console')
+TRACING_FILE = os.environ.get('TRACING_FILE', str(BASE_DIR / 'traces.jsonl'))
+TRACING_SERVICE_NAME = os.environ.get('OTEL_SERVICE_NAME', 'gateway')
+
+# Cache des principaux JWT (utilisateur + organisation), invalidé à chaque modification
+AUTH_USER_CACHE_SECONDS = int(os.environ.get('AUTH_USER_CACHE_SECONDS', '60'))
+
+# Profilage à la demande (staff, en-tête X-Profile) et journal des requêtes lentes
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'True') == 'True'
+PROFILING_INTERVAL = float(os.environ.get('PROFILING_INTERVAL', '0.001'))  # période d'échantillonnage (s)
+PROFILING_TTL_SECONDS = int(os.environ.get('PROFILING_TTL_SECONDS', '86400'))
+PROFILING_KEEP = int(os.environ.get('PROFILING_KEEP', '100'))
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', '1.0'))
+SLOW_REQUEST_KEEP = int(os.environ.get('SLOW_REQUEST_KEEP', '100'))
 
 # Configuration Email
 EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
@@ -111,11 +214,21 @@ EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@pensionpay.com')
+EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', '30'))
+# File d'envoi des emails (apps/accounts/emails.py) : taille des lots envoyés sur une
+# connexion SMTP, délai de regroupement, tentatives et délai initial avant réessai, et
+# bail d'un envoi sur ses emails en cours (renouvelé à chaque email ; passé ce délai
+# sans nouvelles, ils sont remis dans la file)
+EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', '100'))
+EMAIL_NUDGE_SECONDS = int(os.environ.get('EMAIL_NUDGE_SECONDS', '1'))
+EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', '5'))
+EMAIL_RETRY_BASE_SECONDS = int(os.environ.get('EMAIL_RETRY_BASE_SECONDS', '30'))
+EMAIL_SENDER_LEASE_SECONDS = int(os.environ.get('EMAIL_SENDER_LEASE_SECONDS', '300'))
 
 # Configuration REST Framework: authentification JWT obligatoire
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.accounts.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -127,7 +240,8 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=8),  # Durée d'une journée de travail
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),  # Une semaine
     'ROTATE_REFRESH_TOKENS': True,
-    'BLACKLIST_AFTER_ROTATION': True,
+    'BLACKLIST_AFTER_ROTATION': True,  # Liste noire dans Redis (apps/accounts/tokens.py)
+    'TOKEN_REFRESH_SERIALIZER': 'apps.accounts.serializers.RotatingTokenRefreshSerializer',
     'UPDATE_LAST_LOGIN': True,
     
     'ALGORITHM': 'HS256',
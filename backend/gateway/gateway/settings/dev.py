@@ -2,6 +2,9 @@ from .base import *
 
 DEBUG = True
 
+# Requêtes SQL et temps base de données par vue, dépassements de budget (apps/monitoring/queries.py)
+MIDDLEWARE = MIDDLEWARE + ['apps.monitoring.middleware.QueryBudgetMiddleware']
+
 # CORS plus permissif en développement
 CORS_ALLOW_ALL_ORIGINS = True  # Accepter toutes les origines en dev
 CORS_ALLOW_CREDENTIALS = True
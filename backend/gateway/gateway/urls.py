@@ -19,6 +19,7 @@ urlpatterns = [
     path('api/auth/', include('apps.accounts.urls')),
     path('api/', include('apps.api.urls')),
     path('api/', include('apps.bulk.urls')),
+    path('', include('apps.monitoring.urls')),
 
     # Swagger / OpenAPI
     re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
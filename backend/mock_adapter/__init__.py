@@ -0,0 +1,8 @@
+"""
+In-process replacement for the SDK scheme adapter outbound API, for load tests.
+
+Serves /transfers, /bulkTransfers and /parties with configurable latency
+distributions, error, rejection and timeout rates, and fires the
+`PUT /api/transfers/<transferId>` callbacks back to the gateway after a
+configurable hub delay. Run it with `python -m mock_adapter --help`.
+"""
@@ -0,0 +1,116 @@
+"""
+Command line of the mock scheme adapter. Every option can also be set
+through its MOCK_* environment variable (e.g. --error-rate / MOCK_ERROR_RATE).
+
+    python -m mock_adapter --port 4001 --gateway-url http://localhost:8000 \
+        --latency lognormal:5,0.5 --callback-latency uniform:50,500 \
+        --error-rate 0.01 --timeout-rate 0.001 --workers 4
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+
+from aiohttp import web
+
+from .latency import Latency
+from .server import create_app
+
+
+def _env(name, default):
+    return os.environ.get(f"MOCK_{name.upper().replace('-', '_')}", default)
+
+
+def _latency(spec):
+    try:
+        Latency(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return spec
+
+
+def _rate(value):
+    rate = float(value)
+    if not 0 <= rate <= 1:
+        raise argparse.ArgumentTypeError(f"{value} is not a rate between 0 and 1")
+    return rate
+
+
+def _codes(value):
+    return [int(code) for code in str(value).split(',') if code.strip()]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m mock_adapter', description='Mock SDK scheme adapter for load tests')
+    option = parser.add_argument
+
+    option('--host', default=_env('host', '0.0.0.0'))
+    option('--port', type=int, default=int(_env('port', '4001')))
+    option('--workers', type=int, default=int(_env('workers', '1')),
+           help='server processes sharing the port (SO_REUSEPORT)')
+    option('--gateway-url', default=_env('gateway-url', 'http://localhost:8000'),
+           help='base URL the callbacks are sent to')
+    option('--callback-token', default=_env('callback-token', ''),
+           help='bearer token sent with the callbacks')
+
+    option('--latency', type=_latency, default=_env('latency', 'fixed:0'),
+           help='response latency distribution, in ms (fixed:MS, uniform:MIN,MAX, normal:MEAN,STDDEV, lognormal:MEDIAN,SIGMA, exp:MEAN)')
+    option('--callback-latency', type=_latency, default=_env('callback-latency', 'uniform:50,200'),
+           help='delay between an accepted transfer and its callback (hub time), in ms')
+
+    option('--error-rate', type=_rate, default=_rate(_env('error-rate', '0')),
+           help='share of requests answered with one of --error-codes')
+    option('--error-codes', type=_codes, default=_codes(_env('error-codes', '500,503')))
+    option('--reject-rate', type=_rate, default=_rate(_env('reject-rate', '0')),
+           help='share of requests rejected with a 400')
+    option('--timeout-rate', type=_rate, default=_rate(_env('timeout-rate', '0')),
+           help='share of requests that hang for --timeout-seconds')
+    option('--timeout-seconds', type=float, default=float(_env('timeout-seconds', '60')))
+
+    option('--sync-complete-rate', type=_rate, default=_rate(_env('sync-complete-rate', '0')),
+           help='share of accepted transfers answered COMPLETED synchronously (no callback)')
+    option('--payee-fsps', type=int, default=int(_env('payee-fsps', '3')),
+           help='number of mock payee FSPs returned in to.fspId')
+    option('--callback-error-rate', type=_rate, default=_rate(_env('callback-error-rate', '0')),
+           help='share of callbacks reporting ERROR_OCCURRED')
+    option('--callback-drop-rate', type=_rate, default=_rate(_env('callback-drop-rate', '0')),
+           help='share of callbacks never sent')
+    option('--callback-concurrency', type=int, default=int(_env('callback-concurrency', '256')),
+           help='callbacks in flight per process')
+    option('--callback-timeout', type=float, default=float(_env('callback-timeout', '10')))
+    option('--callback-retries', type=int, default=int(_env('callback-retries', '3')),
+           help='retries of a callback on a network error or a 5xx')
+
+    option('--seed', type=int, default=int(_env('seed', '0')) or None, help='random seed (reproducible fault sequences)')
+    option('--log-level', default=_env('log-level', 'INFO'))
+    return parser.parse_args(argv)
+
+
+def serve(config, worker=0):
+    logging.basicConfig(level=config.log_level, format=f"%(asctime)s [mock-adapter:{worker}] %(levelname)s %(message)s")
+    if config.seed is not None:
+        config.seed += worker
+    web.run_app(
+        create_app(config), host=config.host, port=config.port,
+        reuse_port=config.workers > 1, access_log=None, print=None,
+    )
+
+
+def main(argv=None):
+    config = parse_args(argv)
+    if config.workers <= 1:
+        serve(config)
+        return
+    workers = [multiprocessing.Process(target=serve, args=(config, i)) for i in range(config.workers)]
+    for process in workers:
+        process.start()
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    main()
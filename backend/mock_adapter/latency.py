@@ -0,0 +1,59 @@
+"""Latency distributions, parsed from `kind:params` specs in milliseconds."""
+import math
+import random
+
+SPECS = {
+    'fixed': 'fixed:MS',
+    'uniform': 'uniform:MIN,MAX',
+    'normal': 'normal:MEAN,STDDEV',
+    'lognormal': 'lognormal:MEDIAN,SIGMA',
+    'exp': 'exp:MEAN',
+}
+
+
+class Latency:
+    """
+    A latency distribution. `sample()` returns seconds, never negative.
+
+        fixed:5            always 5 ms
+        uniform:2,20       uniform between 2 and 20 ms
+        normal:10,3        normal, mean 10 ms, standard deviation 3 ms
+        lognormal:8,0.6    log-normal, median 8 ms, shape 0.6 (long tail)
+        exp:10             exponential, mean 10 ms
+    """
+
+    def __init__(self, spec, rng=random):
+        self.spec = spec
+        self.rng = rng
+        kind, _, params = spec.partition(':')
+        kind = kind.strip().lower()
+        if kind in ('', '0', 'none'):
+            kind, params = 'fixed', '0'
+        if kind not in SPECS:
+            raise ValueError(f"unknown latency distribution {spec!r}, expected one of: {', '.join(SPECS.values())}")
+        try:
+            values = [float(v) for v in params.split(',')] if params else []
+        except ValueError:
+            raise ValueError(f"invalid latency parameters in {spec!r} ({SPECS[kind]})")
+        expected = SPECS[kind].count(',') + 1
+        if len(values) != expected:
+            raise ValueError(f"latency {spec!r} expects {SPECS[kind]}")
+        self.kind = kind
+        self.values = values
+
+    def sample(self):
+        rng, v = self.rng, self.values
+        if self.kind == 'fixed':
+            ms = v[0]
+        elif self.kind == 'uniform':
+            ms = rng.uniform(v[0], v[1])
+        elif self.kind == 'normal':
+            ms = rng.gauss(v[0], v[1])
+        elif self.kind == 'lognormal':
+            ms = rng.lognormvariate(math.log(v[0]), v[1]) if v[0] > 0 else 0
+        else:
+            ms = rng.expovariate(1 / v[0]) if v[0] > 0 else 0
+        return max(0.0, ms) / 1000
+
+    def __repr__(self):
+        return f"Latency({self.spec!r})"
@@ -0,0 +1,206 @@
+"""
+aiohttp application mocking the SDK scheme adapter outbound API.
+
+Every request first waits for a sample of the response latency, then one
+fault may be injected, drawn in this order:
+- timeout: the request hangs for `timeout_seconds` (the gateway's read
+  timeout fires first), then gets a 504;
+- error: a 5xx/429 from `error_codes` (the gateway retries it);
+- reject: a 400 with Mojaloop errorInformation (the gateway dead-letters it).
+
+An accepted transfer is answered with COMPLETED (settled synchronously by
+the gateway) at `sync_complete_rate`, otherwise with a pending state. Its
+callback, `PUT {gateway_url}/api/transfers/<homeTransactionId>`, is then
+sent after a sample of the callback (hub) latency, unless dropped; at
+`callback_error_rate` it reports ERROR_OCCURRED instead of COMPLETED.
+"""
+import asyncio
+import base64
+import logging
+import random
+import uuid
+import zlib
+from collections import Counter
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector, web
+
+from .latency import Latency
+
+logger = logging.getLogger('mock_adapter')
+
+PENDING_STATE = 'WAITING_FOR_CALLBACK'
+
+
+class MockAdapter:
+    """Fault model, callback sender and counters of one server process."""
+
+    def __init__(self, config, rng=None):
+        self.config = config
+        self.rng = rng or random.Random(config.seed)
+        self.latency = Latency(config.latency, self.rng)
+        self.callback_latency = Latency(config.callback_latency, self.rng)
+        self.stats = Counter()
+        self.session = None
+        self._callbacks = set()
+        self._callback_slots = None
+
+    async def start(self, app):
+        self.session = ClientSession(
+            connector=TCPConnector(limit=self.config.callback_concurrency),
+            timeout=ClientTimeout(total=self.config.callback_timeout),
+        )
+        self._callback_slots = asyncio.Semaphore(self.config.callback_concurrency)
+
+    async def stop(self, app):
+        for task in list(self._callbacks):
+            task.cancel()
+        await asyncio.gather(*self._callbacks, return_exceptions=True)
+        await self.session.close()
+
+    @property
+    def pending_callbacks(self):
+        return len(self._callbacks)
+
+    def chance(self, rate):
+        return rate > 0 and self.rng.random() < rate
+
+    async def respond(self, endpoint, accept):
+        """Apply the latency and fault model to a request, or build its response with `accept()`."""
+        self.stats[f"{endpoint}.requests"] += 1
+        await asyncio.sleep(self.latency.sample())
+        if self.chance(self.config.timeout_rate):
+            self.stats[f"{endpoint}.timeouts"] += 1
+            await asyncio.sleep(self.config.timeout_seconds)
+            return web.json_response({'errorInformation': {'errorCode': '2004', 'errorDescription': 'Server timed out'}}, status=504)
+        if self.chance(self.config.error_rate):
+            self.stats[f"{endpoint}.errors"] += 1
+            status = self.rng.choice(self.config.error_codes)
+            return web.json_response({'errorInformation': {'errorCode': '2001', 'errorDescription': 'Internal server error'}}, status=status)
+        if self.chance(self.config.reject_rate):
+            self.stats[f"{endpoint}.rejected"] += 1
+            return web.json_response({'errorInformation': {'errorCode': '3100', 'errorDescription': 'Generic validation error'}}, status=400)
+        self.stats[f"{endpoint}.accepted"] += 1
+        return accept()
+
+    def schedule_callback(self, transfer_id):
+        """Send the transfer's callback later, unless it is dropped."""
+        if self.chance(self.config.callback_drop_rate):
+            self.stats['callbacks.dropped'] += 1
+            return
+        task = asyncio.create_task(self._send_callback(transfer_id))
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+
+    async def _send_callback(self, transfer_id):
+        await asyncio.sleep(self.callback_latency.sample())
+        if self.chance(self.config.callback_error_rate):
+            body = {
+                'currentState': 'ERROR_OCCURRED',
+                'errorInformation': {'errorCode': '5100', 'errorDescription': 'Payee rejected the transfer'},
+            }
+        else:
+            body = {
+                'transferId': transfer_id,
+                'currentState': 'COMPLETED',
+                'fulfilment': base64.urlsafe_b64encode(uuid.uuid4().bytes * 2).decode().rstrip('='),
+            }
+        url = f"{self.config.gateway_url}/api/transfers/{transfer_id}"
+        headers = {'Authorization': f"Bearer {self.config.callback_token}"} if self.config.callback_token else {}
+        async with self._callback_slots:
+            for attempt in range(self.config.callback_retries + 1):
+                try:
+                    async with self.session.put(url, json=body, headers=headers) as resp:
+                        if resp.status < 500:
+                            self.stats[f"callbacks.{resp.status}"] += 1
+                            return
+                except (ClientError, asyncio.TimeoutError) as e:
+                    logger.debug(f"Callback {transfer_id} attempt {attempt + 1} failed: {e}")
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        self.stats['callbacks.failed'] += 1
+        logger.warning(f"Callback {transfer_id} failed after {self.config.callback_retries + 1} attempts")
+
+    def payee_fsp(self, party):
+        """FSP of a payee: one of `payee_fsps` mock FSPs, stable per identifier."""
+        identifier = str((party or {}).get('idValue', ''))
+        return f"payeefsp{zlib.crc32(identifier.encode()) % self.config.payee_fsps + 1}"
+
+    def accept_transfer(self, transfer_id, body):
+        """Response of an accepted transfer; schedules its callback unless settled synchronously."""
+        response = {
+            'transferId': transfer_id,
+            'homeTransactionId': transfer_id,
+            'from': body.get('from'),
+            'to': {**(body.get('to') or {}), 'fspId': self.payee_fsp(body.get('to'))},
+            'amount': body.get('amount'),
+            'currency': body.get('currency'),
+        }
+        if self.chance(self.config.sync_complete_rate):
+            response.update(currentState='COMPLETED', fulfilment=base64.b64encode(f"fulfil:{transfer_id}".encode()).decode())
+        else:
+            response['currentState'] = PENDING_STATE
+            self.schedule_callback(transfer_id)
+        return response
+
+
+async def post_transfers(request):
+    mock = request.app['mock']
+    body = await request.json()
+    transfer_id = body.get('homeTransactionId') or body.get('transferId') or str(uuid.uuid4())
+    return await mock.respond('transfers', lambda: web.json_response(mock.accept_transfer(transfer_id, body)))
+
+
+async def post_bulk_transfers(request):
+    mock = request.app['mock']
+    body = await request.json()
+    bulk_id = body.get('bulkTransferId') or str(uuid.uuid4())
+
+    def accept():
+        individuals = body.get('individualTransfers', [])
+        for it in individuals:
+            if it.get('transferId'):
+                mock.schedule_callback(it['transferId'])
+        return web.json_response({'bulkTransferId': bulk_id, 'currentState': 'ACCEPTED', 'count': len(individuals)}, status=202)
+
+    return await mock.respond('bulkTransfers', accept)
+
+
+async def get_party(request):
+    mock = request.app['mock']
+    id_type, id_value = request.match_info['id_type'], request.match_info['id_value']
+
+    def accept():
+        return web.json_response({
+            'party': {
+                'body': {
+                    'partyIdInfo': {'partyIdType': id_type, 'partyIdentifier': id_value, 'fspId': mock.payee_fsp({'idValue': id_value})},
+                    'name': 'Mock User',
+                    'personalInfo': {'complexName': {'firstName': 'Mock', 'lastName': 'User'}},
+                },
+            },
+            'currentState': 'COMPLETED',
+        })
+
+    return await mock.respond('parties', accept)
+
+
+async def get_stats(request):
+    """Counters of this process (one per worker with --workers)."""
+    mock = request.app['mock']
+    return web.json_response({'pendingCallbacks': mock.pending_callbacks, **mock.stats})
+
+
+async def health(request):
+    return web.json_response({'status': 'ok'})
+
+
+def create_app(config):
+    app = web.Application(client_max_size=64 * 1024 ** 2)
+    mock = app['mock'] = MockAdapter(config)
+    app.on_startup.append(mock.start)
+    app.on_cleanup.append(mock.stop)
+    app.router.add_post('/transfers', post_transfers)
+    app.router.add_post('/bulkTransfers', post_bulk_transfers)
+    app.router.add_get('/parties/{id_type}/{id_value}', get_party)
+    app.router.add_get('/stats', get_stats)
+    app.router.add_get('/', health)
+    return app
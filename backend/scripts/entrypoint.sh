@@ -22,5 +22,10 @@ else:
     print('Superuser already exists')
 PYTHON
 
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    echo "==> Resetting Prometheus multiprocess directory..."
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "==> Starting application..."
 exec "$@"
@@ -0,0 +1,5 @@
+#!/usr/bin/env bash
+set -e
+
+./scripts/wait-for-db.sh db
+exec celery -A gateway beat -l info
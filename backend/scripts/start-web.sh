@@ -3,4 +3,7 @@ set -e
 
 ./scripts/wait-for-db.sh db
 python gateway/manage.py migrate --noinput
-exec gunicorn gateway.wsgi:application --bind 0.0.0.0:8000
+# Serveur ASGI (uvicorn) obligatoire : les flux SSE sont des générateurs
+# asynchrones, qu'un serveur WSGI accumulerait jusqu'à leur fin avant d'envoyer
+# quoi que ce soit.
+exec gunicorn gateway.asgi:application --bind 0.0.0.0:8000 -k uvicorn.workers.UvicornWorker
@@ -148,7 +148,7 @@ export default function CreateUser() {
                                         {success.email_sent && (
                                             <p className="flex items-center gap-2">
                                                 <Mail className="w-4 h-4" />
-                                                Email envoyé avec les identifiants
+                                                Email de bienvenue envoyé
                                             </p>
                                         )}
                                     </div>